@@ -0,0 +1,34 @@
+# rag-service/app/api/health.py
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app.services.model_registry import registry
+from app.services.lexical_index import get_lexical_index
+from app.api.search import answer_service, search_service
+from app.vectorstore.partition_router import PartitionedVectorRepository
+
+router = APIRouter(prefix="/health", tags=["health"])
+
+@router.get("/live")
+async def live():
+    return {"status": "ok"}
+
+@router.get("/ready")
+async def ready():
+    # 503 until the model registry has finished warming up.
+    readiness = registry.readiness()
+    return JSONResponse(status_code=200 if readiness["ready"] else 503, content=readiness)
+
+@router.get("/metrics")
+async def metrics():
+    lexical_index = get_lexical_index(create=False)
+    return {
+        "embedding_batcher": registry.get_embedding_batcher().metrics(),
+        "lexical_index": lexical_index.stats() if lexical_index is not None else None,
+        "search_cache": search_service.cache.stats() if search_service.cache is not None else None,
+        "answer_cache": answer_service.cache.stats() if answer_service.cache is not None else None,
+        "hydration": search_service.hydrator.stats(),
+        "llm": answer_service.llm.stats() if hasattr(answer_service.llm, "stats") else None,
+        "reranker": search_service.reranker.stats() if search_service.reranker is not None else None,
+        "vector_partitions": search_service.vector_repo.stats() if isinstance(search_service.vector_repo, PartitionedVectorRepository) else None,
+    }
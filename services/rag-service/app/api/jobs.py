@@ -0,0 +1,23 @@
+# rag-service/app/api/jobs.py
+
+from uuid import UUID
+from fastapi import APIRouter, Depends, HTTPException
+from app.utils.config import API_ROUTES
+from app.db.session import get_queue_db
+from app.repositories.ingestion_job_repository import IngestionJobRepository
+from app.services.job_queue_service import job_to_dict
+from sqlalchemy.orm import Session
+
+router = APIRouter(tags=["jobs"])
+
+@router.get(API_ROUTES['GET_JOB_STATUS'])
+async def job_status(job_id: UUID, db: Session = Depends(get_queue_db)):
+    job = IngestionJobRepository(db).get_by_id(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_to_dict(job)
+
+@router.get(API_ROUTES['GET_DOCUMENT_JOBS'])
+async def document_jobs(document_id: UUID, db: Session = Depends(get_queue_db)):
+    jobs = IngestionJobRepository(db).list_by_document_id(document_id)
+    return {"jobs": [job_to_dict(j) for j in jobs]}
@@ -1,14 +1,45 @@
-from fastapi import APIRouter
-from pydantic import BaseModel
+import os
+from typing import List, Optional
 
-from ..services.ocr_service import run_ocr
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, Field
+
+from ..services.ocr_pool import get_api_ocr_pool, ocr_jobs
+from ..services.upload_service import UPLOAD_DIR
 
 router = APIRouter()
 
 class OCRRequest(BaseModel):
-    file_key: str
+    file_key: str = Field(..., description="Stored name of an uploaded file (the file_key returned by the upload endpoints)")
+    lang: str = "en"
+    # 1-based inclusive page ranges, e.g. [[1, 10], [25, 30]]. Defaults to every page.
+    page_ranges: Optional[List[List[int]]] = None
+
+def _resolve_file(file_key: str) -> str:
+    # Only files under the upload directory can be OCR'd.
+    file_path = os.path.join(UPLOAD_DIR, os.path.basename(file_key))
+    if not os.path.exists(file_path):
+        raise HTTPException(status_code=404, detail="File not found")
+    return file_path
 
 @router.post("/ocr")
 async def ocr_endpoint(request: OCRRequest):
-    text = await run_ocr(request.file_key)
-    return {"text": text}
+    pool = get_api_ocr_pool()
+    if pool is None:
+        raise HTTPException(status_code=503, detail="OCR endpoint is disabled (OCR_API_POOL_WORKERS=0)")
+
+    page_ranges = None
+    if request.page_ranges:
+        if any(len(r) != 2 or r[0] < 1 or r[1] < r[0] for r in request.page_ranges):
+            raise HTTPException(status_code=422, detail="page_ranges must be [first, last] pairs with 1 <= first <= last")
+        page_ranges = [(r[0], r[1]) for r in request.page_ranges]
+
+    job = ocr_jobs.submit(pool, _resolve_file(request.file_key), lang=request.lang, page_ranges=page_ranges)
+    return job.to_dict()
+
+@router.get("/ocr/{job_id}")
+async def ocr_job_status(job_id: str):
+    job = ocr_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="OCR job not found")
+    return job.to_dict(include_result=True)
@@ -1,12 +1,29 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
 from app.utils.config import API_ROUTES
 from app.utils.config import settings
 from app.services.search_service import SearchService
-from app.services.embedding_service import EmbeddingService
-from app.services.llm_service import LLMService
-from app.vectorstore.chroma_repo import ChromaVectorRepository
+from app.services.llm_client import CircuitOpenError, LLMTimeoutError, is_retryable
+from app.services.llm_service import EmptyResponseError, get_llm_service
+from app.services.answer_cache import AnswerCache, AnswerService
+from app.services.model_registry import registry
+from app.services.lexical_index import get_lexical_index
+from app.services.search_cache import SearchResultCache
+from app.services.chunk_hydration import get_hydrator
+from app.services.context_packer import get_context_packer
+from app.utils.cancellation import ClientDisconnected, ClosingStreamingResponse, cancel_on_disconnect
+from app.utils.executors import get_executor
+from app.utils.mock.mock_user import get_current_user
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Any, AsyncIterator, List, Literal, Optional, Union
+from contextlib import aclosing
+from functools import partial
+import asyncio
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
 
 # Router configuration with English tags
 router = APIRouter(prefix=API_ROUTES['SEARCH_DOCUMENT'], tags=["search"])
@@ -16,99 +33,352 @@ router = APIRouter(prefix=API_ROUTES['SEARCH_DOCUMENT'], tags=["search"])
 class SearchRequest(BaseModel):
     query: str = Field(..., min_length=1, description="The search query text entered by the user")
     # You can change the default top_k here if you want to increase context by default
-    top_k: int = Field(8, ge=1, le=50, description="Number of relevant chunks to retrieve for context")
+    top_k: Optional[int] = Field(None, ge=1, le=50, description="Number of relevant chunks to retrieve for context; defaults to 8, or RERANK_TOP_K when reranking")
     document_id: Optional[str] = Field(None, description="Optional filter to search within a specific document")
+    mode: Optional[Literal["vector", "hybrid"]] = Field(None, description="Retrieval mode; defaults to SEARCH_MODE (hybrid = BM25 + vector, fused by RRF)")
+    rerank: Optional[bool] = Field(None, description="Rerank RERANK_CANDIDATES candidates with the local cross-encoder and keep the best top_k; defaults to RERANK_ENABLED")
 
 class SearchHitResponse(BaseModel):
     chunk_id: str
-    distance: float
+    distance: Optional[float] = Field(None, description="Cosine distance to the query; unset for a hybrid hit found by BM25 alone (see score)")
     text: str
     document_id: str
     chunk_index: int
     start_offset: Optional[int] = None
     end_offset: Optional[int] = None
     metadata: dict
+    score: Optional[float] = None
+    rerank_score: Optional[float] = None
+    spans: List[dict] = Field(default_factory=list, description="(page, bbox) of every OCR line the chunk covers, in reading order")
 
 class SearchResponse(BaseModel):
     answer: str = Field(..., description="The comprehensive answer generated by the LLM based on retrieved context")
     hits: List[SearchHitResponse] = Field(..., description="The list of raw document chunks used to generate the answer")
 
-# --- Service Initialization ---
+class BatchSearchRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1, max_length=settings.SEARCH_BATCH_MAX_QUERIES, description="Query texts, searched together")
+    top_k: Optional[int] = Field(None, ge=1, le=50, description="Number of relevant chunks to retrieve per query; defaults to 8, or RERANK_TOP_K when reranking")
+    document_id: Optional[str] = Field(None, description="Optional filter to search within a specific document")
+    mode: Optional[Literal["vector", "hybrid"]] = Field(None, description="Retrieval mode; defaults to SEARCH_MODE")
+    rerank: Optional[bool] = Field(None, description="Rerank with the local cross-encoder; defaults to RERANK_ENABLED")
+    generate_answers: bool = Field(False, description="Also generate an LLM answer per query (off for retrieval evaluation)")
 
-# Initialize embedding service for vectorizing queries
-embedding_service = EmbeddingService(
-    model_name=settings.LLM_MODEL_DEV,
-    normalize=True,
-    batch_size=32,
-    device=None,
-)
+class BatchSearchResult(BaseModel):
+    query: str
+    answer: Optional[str] = Field(None, description="Generated answer; null unless generate_answers was set")
+    hits: List[SearchHitResponse]
 
-# Initialize vector repository (ChromaDB)
-vector_repo = ChromaVectorRepository(
-    persist_dir=settings.VECTOR_DB_URL,
-    collection_name="rag_chunks",
-)
+class BatchSearchResponse(BaseModel):
+    results: List[BatchSearchResult] = Field(..., description="One result per query, in request order")
 
-# Core search logic service
+# --- Service Initialization ---
+
+# Embedding model and vector index are shared through the process-wide registry,
+# which the FastAPI lifespan (app/main.py) warms up before traffic arrives.
 search_service = SearchService(
-    embedding_service=embedding_service,
-    vector_repo=vector_repo,
+    embedding_service=registry.get_embedder(),
+    vector_repo=registry.get_vector_repo(),
+    lexical_index=get_lexical_index(),
+    embedding_batcher=registry.get_embedding_batcher(),
+    cache=SearchResultCache(
+        max_embeddings=settings.SEARCH_CACHE_MAX_EMBEDDINGS,
+        max_results=settings.SEARCH_CACHE_MAX_RESULTS,
+    ) if settings.SEARCH_CACHE_ENABLED else None,
+    hydrator=get_hydrator(),
+    reranker=registry.get_reranker(),
 )
 
-# LLM service for answer generation (Gemini)
-llm_service = LLMService()
+# LLM answer generation (Gemini), behind the answer cache
+answer_service = AnswerService(
+    get_llm_service(),
+    cache=AnswerCache(
+        max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+        ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+        similarity_threshold=settings.ANSWER_CACHE_SIMILARITY,
+    ) if settings.ANSWER_CACHE_ENABLED else None,
+)
 
 # --- API Endpoints ---
 
 @router.post("", response_model=SearchResponse)
-async def search(request: SearchRequest):
+async def search(request: SearchRequest, http_request: Request):
     """
     Perform semantic search and generate a natural language answer:
     1. Retrieve the most relevant text chunks from the vector database.
     2. Feed the retrieved chunks as context into the Gemini LLM.
     3. Return both the generated answer and the source chunks for transparency.
+
+    Nothing here blocks the event loop, and the work is cancelled if the client disconnects.
+    """
+    try:
+        return await cancel_on_disconnect(
+            http_request,
+            _search(request),
+            poll_seconds=settings.SEARCH_DISCONNECT_POLL_SECONDS,
+        )
+    except ClientDisconnected:
+        # 499: client closed request (nobody is left to read it)
+        return Response(status_code=499)
+    except Exception as e:
+        logger.exception("Search API error")
+        raise _http_error(e)
+
+
+@router.post("/batch", response_model=BatchSearchResponse)
+async def search_batch(request: BatchSearchRequest, http_request: Request):
+    """
+    Search many queries in one call (evaluation jobs, bulk integrations).
+    All queries share one embedding batch, one vector-store query and one chunk hydration
+    query; LLM answers are only generated when generate_answers is set.
+
+    Retrieval runs on the "batch" executor, apart from the pools interactive /search
+    depends on, and the work is cancelled if the client disconnects.
+    """
+    try:
+        return await cancel_on_disconnect(
+            http_request,
+            _search_batch(request),
+            poll_seconds=settings.SEARCH_DISCONNECT_POLL_SECONDS,
+        )
+    except ClientDisconnected:
+        return Response(status_code=499)
+    except Exception as e:
+        logger.exception("Batch search API error")
+        raise _http_error(e)
+
+
+async def _search_batch(request: BatchSearchRequest) -> BatchSearchResponse:
+    loop = asyncio.get_running_loop()
+    cancelled = threading.Event()
+    try:
+        hit_lists = await loop.run_in_executor(
+            get_executor("batch"),
+            partial(
+                search_service.search_many,
+                queries=request.queries,
+                top_k=_top_k(request),
+                document_id=request.document_id,
+                mode=request.mode or settings.SEARCH_MODE,
+                user_id=_user_id(),
+                rerank=_rerank(request),
+                cancelled=cancelled,
+            ),
+        )
+    except asyncio.CancelledError:
+        # A running executor job cannot be interrupted: make it stop at its next stage.
+        cancelled.set()
+        raise
+
+    answers: List[Optional[str]] = [None] * len(hit_lists)
+    if request.generate_answers:
+        semaphore = asyncio.Semaphore(max(settings.SEARCH_BATCH_ANSWER_CONCURRENCY, 1))
+
+        async def answer(query: str, hits) -> Optional[str]:
+            if not hits:
+                return "I'm sorry, but no relevant information was found in the document to answer your question."
+            async with semaphore:
+                return await answer_service.get_answer(
+                    query=query,
+                    chunk_ids=[hit.chunk_id for hit in hits],
+                    chunks=await _context(hits),
+                    document_ids=[hit.document_id for hit in hits],
+                )
+
+        answers = await asyncio.gather(*(answer(q, hits) for q, hits in zip(request.queries, hit_lists)))
+
+    return BatchSearchResponse(
+        results=[
+            BatchSearchResult(query=q, answer=a, hits=[_hit_response(hit) for hit in hits])
+            for q, a, hits in zip(request.queries, answers, hit_lists)
+        ]
+    )
+
+
+@router.post("/stream")
+async def search_stream(request: SearchRequest):
+    """
+    Streaming variant of search, as Server-Sent Events:
+    - event "hits": the retrieved chunks (same shape as SearchResponse.hits), sent as soon
+      as retrieval finishes, before generation starts
+    - event "token": {"text": ...} for every piece of the answer as the LLM produces it
+    - event "done": {"timings_ms": {...}, "cached": bool}
+    - event "error": {"status": ..., "detail": ...} if retrieval or generation fails
+      mid-stream, with the status code the non-streaming endpoint would have returned
+
+    When the client disconnects, the response generator is closed right away, which closes
+    the LLM stream; a partial answer is not cached.
     """
+    return ClosingStreamingResponse(
+        _search_events(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _search_events(request: SearchRequest) -> AsyncIterator[str]:
+    start = time.perf_counter()
+    timings = {}
     try:
-        # Step 1: Vector-based semantic retrieval
-        # Note: 'top_k' is passed from the request, but defaults to 8 now for better context
-        hits = search_service.search(
-            query=request.query, 
-            top_k=request.top_k, 
-            document_id=request.document_id
+        hits = await search_service.asearch(
+            query=request.query,
+            top_k=_top_k(request),
+            document_id=request.document_id,
+            mode=request.mode or settings.SEARCH_MODE,
+            user_id=_user_id(),
+            rerank=_rerank(request),
         )
+        timings["retrieval"] = round((time.perf_counter() - start) * 1000, 1)
+        yield _sse("hits", [_hit_response(hit).model_dump() for hit in hits])
 
-        # Handle cases where no relevant documents are found
         if not hits:
-            return SearchResponse(
-                answer="I'm sorry, but no relevant information was found in the document to answer your question.",
-                hits=[]
+            yield _sse("token", {"text": "I'm sorry, but no relevant information was found in the document to answer your question."})
+            timings["total"] = round((time.perf_counter() - start) * 1000, 1)
+            yield _sse("done", {"timings_ms": timings, "cached": False})
+            return
+
+        cache = answer_service.cache
+        chunk_ids = [hit.chunk_id for hit in hits]
+        query_embedding = None
+        if cache is not None and cache.similarity_threshold is not None:
+            query_embedding = await search_service.embed_query(request.query)
+
+        cached = answer_service.lookup(request.query, chunk_ids, query_embedding)
+        if cached is not None:
+            pieces = _single(cached)
+        else:
+            pieces = answer_service.stream_answer(
+                query=request.query,
+                chunk_ids=chunk_ids,
+                chunks=await _context(hits),
+                document_ids=[hit.document_id for hit in hits],
+                query_embedding=query_embedding,
             )
 
-        # Step 2: Extract text content from hits for LLM context
-        context_texts = [hit.text for hit in hits]
+        async with aclosing(pieces):
+            async for piece in pieces:
+                if "first_token" not in timings:
+                    timings["first_token"] = round((time.perf_counter() - start) * 1000, 1)
+                yield _sse("token", {"text": piece})
+
+        timings["total"] = round((time.perf_counter() - start) * 1000, 1)
+        yield _sse("done", {"timings_ms": timings, "cached": cached is not None})
+    except asyncio.CancelledError:
+        # Client went away: nothing left to send to
+        raise
+    except Exception as e:
+        logger.exception("Search stream error")
+        error = _http_error(e)
+        yield _sse("error", {"status": error.status_code, "detail": error.detail})
+
+
+def _http_error(error: Exception) -> HTTPException:
+    """
+    Status for a failed search: the LLM being unavailable (breaker open, transient
+    provider errors) is a 503, running out of time a 504, an unusable model
+    response a 502; anything else is a 500.
+    """
+    if isinstance(error, LLMTimeoutError):
+        return HTTPException(status_code=504, detail="The answer could not be generated in time. Please try again later.")
+    if isinstance(error, CircuitOpenError) or is_retryable(error):
+        return HTTPException(status_code=503, detail="The answer service is temporarily unavailable. Please try again later.")
+    if isinstance(error, EmptyResponseError):
+        return HTTPException(status_code=502, detail="The model did not return a usable answer.")
+    return HTTPException(status_code=500, detail="An internal error occurred during the search process.")
+
+
+async def _single(text: str) -> AsyncIterator[str]:
+    yield text
+
+
+def _user_id() -> str:
+    # Searches are always scoped to the caller's documents (vector metadata stores the owner as a string).
+    return str(get_current_user())
 
-        # Step 3: Generate the final answer using the LLM service
-        answer = await llm_service.get_answer(query=request.query, chunks=context_texts)
 
-        # Step 4: Assemble and return the final response
+def _rerank(request: Union[SearchRequest, BatchSearchRequest]) -> bool:
+    return settings.RERANK_ENABLED if request.rerank is None else request.rerank
+
+
+def _top_k(request: Union[SearchRequest, BatchSearchRequest]) -> int:
+    # Reranked hits are precise enough to send fewer of them to the LLM.
+    if request.top_k is not None:
+        return request.top_k
+    return settings.RERANK_TOP_K if _rerank(request) else 8
+
+
+async def _context(hits) -> List[str]:
+    if not settings.CONTEXT_PACKING_ENABLED:
+        return [hit.text for hit in hits]
+    # A tokenizer batch and a pairwise near-duplicate scan: CPU work, kept off the event loop.
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor("context"), _pack_texts, hits)
+
+
+def _pack_texts(hits) -> List[str]:
+    return get_context_packer().pack_texts(hits)
+
+
+def _hit_response(hit) -> SearchHitResponse:
+    return SearchHitResponse(
+        chunk_id=hit.chunk_id,
+        distance=hit.distance,
+        text=hit.text,
+        document_id=hit.document_id,
+        chunk_index=hit.chunk_index,
+        start_offset=hit.start_offset,
+        end_offset=hit.end_offset,
+        metadata=hit.metadata,
+        score=hit.score,
+        rerank_score=hit.rerank_score,
+        spans=hit.spans,
+    )
+
+
+async def _search(request: SearchRequest) -> SearchResponse:
+    # Step 1: Vector-based semantic retrieval
+    # Note: 'top_k' is passed from the request, but defaults to 8 now for better context
+    # Repeat queries are served from the search cache; otherwise query embeddings of
+    # concurrent requests are encoded together in one batch
+    hits = await search_service.asearch(
+        query=request.query, 
+        top_k=_top_k(request),
+        document_id=request.document_id,
+        mode=request.mode or settings.SEARCH_MODE,
+        user_id=_user_id(),
+        rerank=_rerank(request),
+    )
+
+    # Handle cases where no relevant documents are found
+    if not hits:
         return SearchResponse(
-            answer=answer,
-            hits=[
-                SearchHitResponse(
-                    chunk_id=hit.chunk_id,
-                    distance=hit.distance,
-                    text=hit.text,
-                    document_id=hit.document_id,
-                    chunk_index=hit.chunk_index,
-                    start_offset=hit.start_offset,
-                    end_offset=hit.end_offset,
-                    metadata=hit.metadata
-                )
-                for hit in hits
-            ]
+            answer="I'm sorry, but no relevant information was found in the document to answer your question.",
+            hits=[]
         )
 
-    except Exception as e:
-        # Log the error and return a 500 status code
-        print(f"Search API Error: {str(e)}")
-        raise HTTPException(status_code=500, detail="An internal error occurred during the search process.")
\ No newline at end of file
+    # Step 2: Pack the hits into LLM context (overlapping / adjacent chunks merged, token-budgeted)
+    context_texts = await _context(hits)
+
+    # Step 3: Generate the final answer (repeat questions over the same chunks hit the cache)
+    cache = answer_service.cache
+    query_embedding = None
+    if cache is not None and cache.similarity_threshold is not None:
+        # Already cached by the search that just ran
+        query_embedding = await search_service.embed_query(request.query)
+    answer = await answer_service.get_answer(
+        query=request.query,
+        chunk_ids=[hit.chunk_id for hit in hits],
+        chunks=context_texts,
+        document_ids=[hit.document_id for hit in hits],
+        query_embedding=query_embedding,
+    )
+
+    # Step 4: Assemble and return the final response
+    return SearchResponse(
+        answer=answer,
+        hits=[_hit_response(hit) for hit in hits],
+    )
+
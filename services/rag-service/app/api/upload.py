@@ -1,32 +1,79 @@
 # rag-service/app/api/upload.py
 
+import asyncio
+import logging
+from typing import List
 from uuid import UUID
-from fastapi import APIRouter, Depends, UploadFile, BackgroundTasks
-from app.utils.config import API_ROUTES
-from app.services.upload_service import save_uploaded_file
-from app.pipelines.document_pipeline import process_document_pipeline
-from app.db.session import get_db
+from fastapi import APIRouter, Depends, HTTPException, UploadFile
+from app.utils.config import API_ROUTES, settings
+from app.services.upload_service import save_uploaded_file, save_uploaded_files
+from app.services.job_queue_service import enqueue_documents
+from app.db.session import get_db, session_scope
+from app.repositories.document_repository import DocumentRepository
 from sqlalchemy.orm import Session
+from app.utils.executors import get_executor
 from app.utils.mock.mock_user import get_current_user
 
+logger = logging.getLogger(__name__)
+
 # APIRouter allows splitting API endpoints into modular components.
 router = APIRouter()
 
+
+def _mark_documents_failed(document_ids: List[UUID], error_message: str) -> None:
+    with session_scope() as db:
+        DocumentRepository(db).mark_failed(document_ids, error_message)
+
+
+async def _enqueue(document_ids: List[UUID], lang: str) -> List[dict]:
+    """
+    Enqueue ingestion jobs for documents that are already committed. The queue may live in
+    another database, so this cannot share their transaction: if it fails, the documents
+    are marked failed instead of being left PENDING with no job to process them.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(get_executor("upload"), enqueue_documents, document_ids, lang)
+    except Exception as e:
+        logger.exception("Failed to enqueue ingestion of %s", document_ids)
+        await loop.run_in_executor(
+            get_executor("upload"), _mark_documents_failed, document_ids, f"Failed to enqueue ingestion: {e}"
+        )
+        raise HTTPException(status_code=503, detail="Failed to enqueue ingestion: " + str(e))
+
 @router.post(API_ROUTES['UPLOAD_DOCUMENT'])
 async def upload_file(
     file: UploadFile,
-    background_tasks: BackgroundTasks,
     db: Session= Depends(get_db),
     source: str = "upload"
 ):
     mock_user_id = get_current_user()
-    result = save_uploaded_file(file,db,mock_user_id,source)
+    result = await save_uploaded_file(file,db,mock_user_id,source)
     document_id=result["document_id"]
     # TODO:Determine source file language dynamically (currently hardcoded to "en")
 
-    # Since a UUID is a reference type, it is not JSON-serializable by default.
-    # Converting to string ensures compatibility with task queues (like Celery/Redis) 
-    # if we scale to a distributed architecture later.
-    background_tasks.add_task(process_document_pipeline, str(document_id), "en")
+    # Processing runs in the ingestion worker (app/workers/ingestion_worker.py), not in this process.
+    # The job is persisted, so it survives restarts and is retried with backoff on failure.
+    job = (await _enqueue([document_id], "en"))[0]
+    result["job_id"] = job["job_id"]
     return result
-    
\ No newline at end of file
+
+@router.post(API_ROUTES['UPLOAD_DOCUMENTS'])
+async def upload_files(
+    files: List[UploadFile],
+    db: Session= Depends(get_db),
+    source: str = "upload"
+):
+    """
+    Multi-file upload: files are streamed concurrently, their documents inserted in one
+    commit and their ingestion jobs enqueued in one queue transaction.
+    """
+    if len(files) > settings.UPLOAD_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"At most {settings.UPLOAD_MAX_FILES} files per upload")
+    mock_user_id = get_current_user()
+    results = await save_uploaded_files(files,db,mock_user_id,source)
+
+    jobs = await _enqueue([r["document_id"] for r in results], "en")
+    for result, job in zip(results, jobs):
+        result["job_id"] = job["job_id"]
+    return {"documents": results}
@@ -1,4 +1,6 @@
 from app.db.models.document import Document
 from app.db.models.ocr_result import OCRResult
 from app.db.models.user import User
-from app.db.models.chunk import Chunk
\ No newline at end of file
+from app.db.models.chunk import Chunk
+from app.db.models.ingestion_job import IngestionJob
+from app.db.models.ocr_page_cache import OCRPageCache
\ No newline at end of file
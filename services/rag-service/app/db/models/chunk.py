@@ -22,5 +22,9 @@ class Chunk(Base):
     end_offset = Column(Integer, nullable=True)
     token_count = Column(Integer, nullable=True)
     text = Column(Text, nullable=True)
+    # SHA-256 of the chunk text; lets re-indexing keep unchanged chunks and their vectors.
+    content_hash = Column(String(64), nullable=True, index=True)
     embedding_id = Column(String(255), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Set on every rewrite (re-embedding, moved offsets), so document signatures see in-place changes.
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -16,6 +16,7 @@ class Document(Base):
     file_path = Column(String, nullable=False)
     mime_type = Column(String(100))
     file_size_bytes = Column(Integer)
+    content_hash = Column(String(64), nullable=True, index=True)  # SHA-256 of the file content
     status = Column(String(50), nullable=False)  # uploaded | processing | ready | failed
     error_message = Column(String)
     source = Column(String(50), nullable=False)  # upload | api | url
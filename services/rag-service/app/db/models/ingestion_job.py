@@ -0,0 +1,33 @@
+# app/db/models/ingestion_job.py
+
+from sqlalchemy import Column, String, Integer, DateTime, Text, JSON
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+import uuid
+from app.db.base import Base
+
+class IngestionJob(Base):
+    """
+    A durable unit of ingestion work, consumed by the worker process (app/workers).
+
+    The table deliberately has no foreign key to documents, so the queue can live
+    in a separate database (e.g. a local SQLite file for tests).
+    """
+    __tablename__ = "ingestion_jobs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    document_id = Column(UUID(as_uuid=True), nullable=False, index=True)
+    stage = Column(String(50), nullable=False, index=True)  # ingest
+    payload = Column(JSON, nullable=True)  # stage arguments, e.g. {"lang": "en"}
+    status = Column(String(50), nullable=False, index=True)  # PENDING | RUNNING | SUCCEEDED | FAILED
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    # A PENDING job becomes claimable once available_at has passed (used for retry backoff).
+    available_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    # Visibility timeout: a RUNNING job whose lease expired is claimable again.
+    locked_until = Column(DateTime(timezone=True), nullable=True)
+    locked_by = Column(String(255), nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
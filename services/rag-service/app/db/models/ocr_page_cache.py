@@ -0,0 +1,28 @@
+# app/db/models/ocr_page_cache.py
+
+from sqlalchemy import Column, String, Integer, DateTime, JSON, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+import uuid
+from app.db.base import Base
+
+class OCRPageCache(Base):
+    """
+    Content-addressed OCR cache, one row per page.
+    Keyed by (content_hash, lang, engine_version) so identical files are never OCR'd twice,
+    and partially processed documents resume from the first missing page.
+    """
+    __tablename__ = "ocr_page_cache"
+    __table_args__ = (
+        UniqueConstraint("content_hash", "lang", "engine_version", "page_no", name="uq_ocr_page_cache_key"),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    content_hash = Column(String(64), nullable=False, index=True)  # SHA-256 of the file
+    lang = Column(String(20), nullable=False)
+    engine_version = Column(String(255), nullable=False)
+    page_no = Column(Integer, nullable=False)
+    lines = Column(JSON, nullable=False)  # [{text, page, bbox, y_center}, ...]
+    size_bytes = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_accessed_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
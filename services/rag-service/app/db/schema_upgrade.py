@@ -0,0 +1,65 @@
+# app/db/schema_upgrade.py
+
+from __future__ import annotations
+
+import logging
+from typing import List, Tuple
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+
+logger = logging.getLogger(__name__)
+
+# Columns added after the schema in docs/db_schema.md was first deployed:
+# (table, column, Postgres type, SQLite type). There are no migrations, so databases
+# created before get them from upgrade_schema.
+ADDED_COLUMNS: List[Tuple[str, str, str, str]] = [
+    ("documents", "content_hash", "VARCHAR(64)", "VARCHAR(64)"),
+    ("chunks", "content_hash", "VARCHAR(64)", "VARCHAR(64)"),
+    # SQLite cannot add a column with a non-constant default: existing rows keep NULL there.
+    ("chunks", "updated_at", "TIMESTAMPTZ NOT NULL DEFAULT NOW()", "DATETIME"),
+]
+
+# (index, table, column)
+ADDED_INDEXES: List[Tuple[str, str, str]] = [
+    ("ix_documents_content_hash", "documents", "content_hash"),
+    ("ix_chunks_content_hash", "chunks", "content_hash"),
+]
+
+
+def upgrade_schema(engine: Engine) -> List[str]:
+    """
+    Add the ADDED_COLUMNS / ADDED_INDEXES an existing database lacks (the ALTER TABLE steps
+    of docs/db_schema.md). Idempotent, and safe when several processes start at once;
+    tables that do not exist are left alone. Returns the "table.column" names added.
+    """
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    postgres = engine.dialect.name == "postgresql"
+    added: List[str] = []
+
+    for table, column, pg_type, sqlite_type in ADDED_COLUMNS:
+        if table not in tables or column in {c["name"] for c in inspector.get_columns(table)}:
+            continue
+        if postgres:
+            ddl = f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} {pg_type}"
+        else:
+            ddl = f"ALTER TABLE {table} ADD COLUMN {column} {sqlite_type}"
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(ddl))
+        except OperationalError as e:
+            # Another process added it between the check and the ALTER.
+            if "duplicate column" not in str(e).lower():
+                raise
+            continue
+        logger.info("Added column %s.%s", table, column)
+        added.append(f"{table}.{column}")
+
+    for index, table, column in ADDED_INDEXES:
+        if table in tables:
+            with engine.begin() as conn:
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS {index} ON {table} ({column})"))
+
+    return added
@@ -1,14 +1,19 @@
 # app/db/session.py
 
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker
 import os
 from dotenv import load_dotenv
 from pathlib import Path
-from contextlib import contextmanager
+from contextlib import asynccontextmanager, contextmanager
+from typing import TYPE_CHECKING, Any, Optional
 from app.utils.config import get_dotenv_path
 from app.utils.config import settings
 
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncEngine
+
 DOTENV_PATH = get_dotenv_path()
 
 load_dotenv(dotenv_path=DOTENV_PATH)
@@ -19,6 +24,64 @@ engine = create_engine(SQLALCHEMY_DATABASE_URL, pool_size=10, max_overflow=20)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# The ingestion job queue shares the main database unless JOB_QUEUE_DATABASE_URL is set
+# (a local SQLite file can stand in for Postgres when testing the worker).
+JOB_QUEUE_DATABASE_URL = settings.JOB_QUEUE_DATABASE_URL or SQLALCHEMY_DATABASE_URL
+
+if JOB_QUEUE_DATABASE_URL == SQLALCHEMY_DATABASE_URL:
+    queue_engine = engine
+elif JOB_QUEUE_DATABASE_URL.startswith("sqlite"):
+    queue_engine = create_engine(JOB_QUEUE_DATABASE_URL, connect_args={"check_same_thread": False})
+else:
+    queue_engine = create_engine(JOB_QUEUE_DATABASE_URL, pool_size=5, max_overflow=10)
+
+QueueSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=queue_engine)
+
+# Async drivers for the sync URLs used above; the search path hydrates chunks
+# through this engine so it never holds an event-loop thread on a DB round trip.
+_ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def to_async_url(url: str) -> str:
+    parsed = make_url(url)
+    driver = _ASYNC_DRIVERS.get(parsed.drivername)
+    if driver is None:
+        return url
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+_async_engine: Optional["AsyncEngine"] = None
+_AsyncSessionLocal: Any = None
+
+def get_async_engine() -> "AsyncEngine":
+    # Created lazily: processes that never serve /search (the ingestion worker) need
+    # neither asyncpg nor greenlet (required by sqlalchemy.ext.asyncio).
+    global _async_engine, _AsyncSessionLocal
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+        url = settings.ASYNC_DATABASE_URL or to_async_url(SQLALCHEMY_DATABASE_URL)
+        if url.startswith("sqlite"):
+            _async_engine = create_async_engine(url)
+        else:
+            _async_engine = create_async_engine(
+                url,
+                pool_size=settings.ASYNC_DB_POOL_SIZE,
+                max_overflow=settings.ASYNC_DB_MAX_OVERFLOW,
+                pool_pre_ping=True,
+            )
+        _AsyncSessionLocal = async_sessionmaker(_async_engine, autoflush=False, expire_on_commit=False)
+    return _async_engine
+
+async def dispose_async_engine() -> None:
+    global _async_engine, _AsyncSessionLocal
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+        _AsyncSessionLocal = None
+
 # Used by FastAPI, lifecycle is one single Http request
 def get_db():
     db = SessionLocal()
@@ -42,3 +105,39 @@ def session_scope():
         raise
     finally:
         session.close()
+
+# Used by FastAPI endpoints that read the job queue.
+def get_queue_db():
+    db = QueueSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Used by the upload path and the ingestion worker.
+@contextmanager
+def queue_session_scope():
+    session = QueueSessionLocal()
+    try:
+        yield session
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+# Used by async endpoints (search path).
+@asynccontextmanager
+async def async_session_scope():
+    get_async_engine()
+    session = _AsyncSessionLocal()
+    try:
+        yield session
+        await session.commit()
+    except BaseException:
+        # BaseException: a cancelled request (client disconnect) must still roll back.
+        await session.rollback()
+        raise
+    finally:
+        await session.close()
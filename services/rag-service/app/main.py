@@ -1,5 +1,7 @@
 # app/main.py
+import asyncio
 import os
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -10,6 +12,65 @@ from .api.upload import router as upload_router
 from .api.ocr import router as ocr_router
 from .api.documents import router as get_documents_router
 from .api.search import router as search_router
+from .api.jobs import router as jobs_router
+from .api.health import router as health_router
+from .services.model_registry import registry
+from .services.lexical_index import get_lexical_index
+from .services.index_sync_service import sync_index_state
+from .services.upload_service import sweep_orphaned_files
+from .db.schema_upgrade import upgrade_schema
+from .db.session import dispose_async_engine, engine
+from .utils.executors import shutdown_executors
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Databases created before newer columns existed get them first (docs/db_schema.md).
+    try:
+        await asyncio.to_thread(upgrade_schema, engine)
+    except Exception as e:
+        print(f"Schema upgrade failed: {str(e)}")
+
+    # Load and warm up models once per process in the background; /health/ready
+    # reports 503 until it has finished.
+    async def _warm_up():
+        try:
+            await asyncio.to_thread(registry.warm_up)
+        except Exception as e:
+            print(f"Model warm-up failed: {str(e)}")
+
+    # Build the BM25 index from the chunks table, then keep it (and the search cache
+    # versions) in sync with what the ingestion worker writes.
+    async def _sync_index_state():
+        get_lexical_index()
+        while True:
+            try:
+                await asyncio.to_thread(sync_index_state)
+            except Exception as e:
+                print(f"Index sync failed: {str(e)}")
+            await asyncio.sleep(settings.INDEX_SYNC_INTERVAL_SECONDS)
+
+    # Failed or cancelled upload batches leave their published files to this sweep
+    # (another upload may still be about to commit a document pointing at them).
+    async def _sweep_uploads():
+        while True:
+            try:
+                await asyncio.to_thread(sweep_orphaned_files)
+            except Exception as e:
+                print(f"Upload sweep failed: {str(e)}")
+            await asyncio.sleep(settings.UPLOAD_SWEEP_INTERVAL_SECONDS)
+
+    tasks = [
+        asyncio.create_task(_warm_up()),
+        asyncio.create_task(_sync_index_state()),
+        asyncio.create_task(_sweep_uploads()),
+    ]
+    yield
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await registry.close()
+    await dispose_async_engine()
+    shutdown_executors()
 
 is_dev = settings.ENV.lower() in ("dev", "develop", "development")
 app = FastAPI(
@@ -19,7 +80,7 @@ app = FastAPI(
     docs_url="/docs" if is_dev else None,
     redoc_url="/redoc" if is_dev else None,
     openapi_url="/openapi.json" if is_dev else None,
-    #lifespan=lifespan
+    lifespan=lifespan
 )
 
 #TODO A temporary way to load PDF in local dev enviroment.
@@ -43,4 +104,6 @@ app.add_middleware(
 app.include_router(upload_router)
 app.include_router(ocr_router)
 app.include_router(get_documents_router)
-app.include_router(search_router)
\ No newline at end of file
+app.include_router(search_router)
+app.include_router(jobs_router)
+app.include_router(health_router)
\ No newline at end of file
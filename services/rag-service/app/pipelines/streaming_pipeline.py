@@ -0,0 +1,158 @@
+import json
+import queue
+import tempfile
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+from uuid import UUID
+from app.repositories.document_repository import DocumentRepository
+from app.repositories.ocr_result_repository import OCRResultRepository
+from app.services.chunk_sync_service import ChunkSync
+from app.db.session import session_scope
+from app.constants.status import DocumentStatus
+from app.services.ocr_cache_service import iter_ocr_pages_cached
+from app.services.chunk_service import stream_chunk_document
+from app.utils.config import settings
+from app.utils.hashing import sha256_file
+from app.services.model_registry import registry
+
+# Marks the end of the OCR page stream.
+_DONE = object()
+
+def _put(q: "queue.Queue[Any]", item: Any, stop: threading.Event) -> bool:
+    # Blocking put that gives up when the consumer has stopped (so the producer never hangs).
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _ocr_producer(
+    file_path: str,
+    content_hash: Optional[str],
+    lang: str,
+    pages: "queue.Queue[Any]",
+    stop: threading.Event,
+) -> None:
+    try:
+        for page_no, lines in iter_ocr_pages_cached(file_path, content_hash, lang=lang):
+            if not _put(pages, (page_no, lines), stop):
+                return
+        _put(pages, _DONE, stop)
+    except BaseException as e:
+        # Hand the error to the consumer, which re-raises it in the pipeline thread.
+        _put(pages, e, stop)
+
+def _consume_pages(pages: "queue.Queue[Any]", spool) -> Iterator[List[Dict[str, Any]]]:
+    while True:
+        item = pages.get()
+        if item is _DONE:
+            return
+        if isinstance(item, BaseException):
+            raise item
+
+        _, lines = item
+        # Keep the full OCR result on disk instead of in memory; it is stored once at the end.
+        for line in lines:
+            spool.write(json.dumps(line, ensure_ascii=False))
+            spool.write("\n")
+        yield lines
+
+def _read_spooled_ocr(spool) -> str:
+    spool.seek(0)
+    return "[" + ", ".join(line.rstrip("\n") for line in spool) + "]"
+
+def process_document_pipeline_streaming(document_id: str, lang: str = "en") -> None:
+    """
+    Page-streaming ingestion (PIPELINE_MODE="streaming").
+
+    An OCR thread produces pages into a bounded queue while this thread chunks, embeds and
+    upserts whatever is complete. Page N+1 is OCR'd while page N is indexed, peak memory is
+    bounded by PIPELINE_QUEUE_DEPTH pages, and chunks become searchable as soon as they are
+    upserted.
+    """
+    doc_id = UUID(document_id)
+
+    # Models are loaded once per process and shared across documents.
+    tokenizer = registry.get_tokenizer()
+
+    pages: "queue.Queue[Any]" = queue.Queue(maxsize=max(settings.PIPELINE_QUEUE_DEPTH, 1))
+    stop = threading.Event()
+    producer = None
+
+    try:
+        with session_scope() as db:
+            doc_repo = DocumentRepository(db)
+            ocr_repo = OCRResultRepository(db)
+
+            document = doc_repo.get_by_id(doc_id)
+            if not document:
+                return
+
+            file_path = document.file_path
+            # Documents uploaded before content hashing was added are hashed here once.
+            content_hash = document.content_hash or sha256_file(file_path)
+            if not document.content_hash:
+                document.content_hash = content_hash
+
+            doc_repo.mark_status(doc_id, DocumentStatus.OCR_PROCESSING)
+            ocr_repo.mark_processing(doc_id)
+
+        # Reprocessing is incremental: each window is diffed against the existing chunks, and
+        # chunks no longer produced are deleted in one batch once the whole document is done.
+        chunk_sync = ChunkSync.load(doc_id, registry.get_embedder(cached=True), registry.get_vector_repo())
+
+        producer = threading.Thread(
+            target=_ocr_producer,
+            args=(file_path, content_hash, lang, pages, stop),
+            name=f"ocr-{doc_id}",
+            daemon=True,
+        )
+        producer.start()
+
+        chunk_index = 0
+        with tempfile.TemporaryFile("w+", encoding="utf-8") as spool:
+            for chunks_list in stream_chunk_document(_consume_pages(pages, spool), lang, tokenizer):
+                # -------------------------
+                # Chunks + Embedding + Vector DB Stage (per page window)
+                # -------------------------
+                chunk_records = []
+                for item in chunks_list:
+                    chunk_records.append({
+                        "document_id": doc_id,
+                        "chunk_index": chunk_index,
+                        "start_offset": item["start"],
+                        "end_offset": item["end"],
+                        "token_count": item["token_count"],
+                        "text": item["text"],
+                    })
+                    chunk_index += 1
+
+                chunk_sync.apply(chunk_records, chunks_list)
+
+                if chunk_records and chunk_records[0]["chunk_index"] == 0:
+                    # First chunks are searchable while the rest of the document is still being OCR'd.
+                    with session_scope() as db:
+                        DocumentRepository(db).mark_status(doc_id, DocumentStatus.EMBEDDING_PROCESSING)
+
+            ocr_text_to_save = _read_spooled_ocr(spool)
+
+        stats = chunk_sync.finish()
+        print(f"Indexed document {doc_id}: {stats.to_dict()}")
+
+        with session_scope() as db:
+            OCRResultRepository(db).mark_completed(document_id=doc_id, ocr_text=ocr_text_to_save)
+            DocumentRepository(db).mark_status(doc_id, DocumentStatus.EMBEDDING_DONE)
+
+    except Exception as e:
+        with session_scope() as db:
+            try:
+                OCRResultRepository(db).mark_failed(document_id=doc_id, error_message=str(e))
+            except Exception:
+                pass
+        raise
+    finally:
+        stop.set()
+        if producer is not None:
+            producer.join(timeout=5)
@@ -1,9 +1,26 @@
 # app/repositories/chunk_repository.py
-from typing import Any, Dict, List
-from sqlalchemy import insert, delete
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple
+from sqlalchemy import insert, delete, func, select, update
 from app.db.models.chunk import Chunk
 from sqlalchemy.orm import Session
 
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+# Columns search needs to build a hit: projected instead of loading ORM objects.
+_HIT_COLUMNS = (
+    Chunk.id,
+    Chunk.document_id,
+    Chunk.chunk_index,
+    Chunk.start_offset,
+    Chunk.end_offset,
+    Chunk.text,
+)
+
+# Columns that tell whether a vector store copy of a chunk is current (no text).
+_VERSION_COLUMNS = (Chunk.id, Chunk.document_id, Chunk.content_hash)
+
+
 class ChunkRepository:
     def __init__(self, db: Session):
         self.db = db
@@ -29,6 +46,43 @@ class ChunkRepository:
             .all()
         )
 
+    def list_positions_by_document_id(self, document_id: str) -> List[Dict[str, Any]]:
+        """
+        Id, content hash and position of every chunk of a document (no text), for re-index diffing.
+        """
+        rows = self.db.execute(
+            select(Chunk.id, Chunk.content_hash, Chunk.chunk_index, Chunk.start_offset, Chunk.end_offset)
+            .where(Chunk.document_id == document_id)
+            .order_by(Chunk.chunk_index.asc())
+        ).all()
+        return [dict(row._mapping) for row in rows]
+
+    def document_signatures(self) -> Dict[Any, Tuple[Any, ...]]:
+        """
+        document_id -> (chunk count, newest created_at, newest updated_at, offset sums);
+        changes whenever chunks of the document are inserted, deleted or rewritten in place
+        (re-embedded, or moved to new offsets within one clock tick). Used to keep
+        in-process indexes in sync.
+        """
+        rows = self.db.execute(
+            select(
+                Chunk.document_id,
+                func.count(Chunk.id),
+                func.max(Chunk.created_at),
+                func.max(Chunk.updated_at),
+                func.sum(Chunk.start_offset),
+                func.sum(Chunk.end_offset),
+            )
+            .group_by(Chunk.document_id)
+        ).all()
+        return {doc_id: (int(count), *rest) for doc_id, count, *rest in rows}
+
+    def list_texts_by_document_id(self, document_id: str) -> List[Tuple[Any, str]]:
+        rows = self.db.execute(
+            select(Chunk.id, Chunk.text).where(Chunk.document_id == document_id)
+        ).all()
+        return [(chunk_id, text or "") for chunk_id, text in rows]
+
     def get_by_ids(self, chunk_ids: List[str]) -> List[Chunk]:
         if not chunk_ids:
             return []
@@ -50,7 +104,69 @@ class ChunkRepository:
         except Exception as e:
             raise e
 
+    def bulk_update_positions(self, chunk_positions: List[Dict[str, Any]]) -> None:
+        """
+        Executemany UPDATE by primary key; each dict holds "id" plus the columns to change
+        (chunk_index, start_offset, end_offset, ...).
+        """
+        if not chunk_positions:
+            return
+        self.db.execute(update(Chunk), chunk_positions)
+
+    def delete_by_ids(self, chunk_ids: List[str]) -> None:
+        if not chunk_ids:
+            return
+        self.db.execute(
+            delete(Chunk).where(Chunk.id.in_(chunk_ids))
+        )
+
+    def get_hit_rows_by_ids(self, chunk_ids: List[Any]) -> List[Any]:
+        """
+        One SELECT of the hit columns (id, document_id, chunk_index, offsets, text);
+        returns plain rows, no ORM identity-map work.
+        """
+        if not chunk_ids:
+            return []
+        return list(self.db.execute(select(*_HIT_COLUMNS).where(Chunk.id.in_(chunk_ids))).all())
+
+    def get_content_hashes_by_ids(self, chunk_ids: List[Any]) -> List[Any]:
+        """
+        (id, document_id, content_hash) rows: enough to validate a vector store copy of a chunk.
+        """
+        if not chunk_ids:
+            return []
+        return list(self.db.execute(select(*_VERSION_COLUMNS).where(Chunk.id.in_(chunk_ids))).all())
+
     def delete_by_document_id(self, document_id: str) -> None:
         self.db.execute(
             delete(Chunk).where(Chunk.document_id == document_id)
-        )    
\ No newline at end of file
+        )
+
+
+class AsyncChunkRepository:
+    """
+    Read-side chunk queries for async callers (search path).
+    """
+
+    def __init__(self, db: "AsyncSession"):
+        self.db = db
+
+    async def get_by_ids(self, chunk_ids: List[str]) -> List[Chunk]:
+        if not chunk_ids:
+            return []
+        result = await self.db.execute(
+            select(Chunk).where(Chunk.id.in_(chunk_ids))
+        )
+        return list(result.scalars().all())
+
+    async def get_hit_rows_by_ids(self, chunk_ids: List[Any]) -> List[Any]:
+        if not chunk_ids:
+            return []
+        result = await self.db.execute(select(*_HIT_COLUMNS).where(Chunk.id.in_(chunk_ids)))
+        return list(result.all())
+
+    async def get_content_hashes_by_ids(self, chunk_ids: List[Any]) -> List[Any]:
+        if not chunk_ids:
+            return []
+        result = await self.db.execute(select(*_VERSION_COLUMNS).where(Chunk.id.in_(chunk_ids)))
+        return list(result.all())
@@ -4,8 +4,9 @@ from sqlalchemy import func, update
 from sqlalchemy.orm import Session,joinedload
 from app.db.models.user import User
 from app.db.models.document import Document
-from uuid import UUID
-from typing import List, Optional
+from app.constants.status import DocumentStatus
+from uuid import UUID, uuid4
+from typing import List, Optional, Set
 
 
 class DocumentRepository:
@@ -19,7 +20,8 @@ class DocumentRepository:
             file_path: str, 
             mime_type: str, 
             file_size_bytes: int, 
-            source: str,status:str
+            source: str,status:str,
+            content_hash: Optional[str] = None
         ) -> Document:
         db_document = Document(
             user_id=user_id,
@@ -28,19 +30,38 @@ class DocumentRepository:
             mime_type=mime_type,
             file_size_bytes=file_size_bytes,
             status=status,
-            source=source
+            source=source,
+            content_hash=content_hash
         )
         self.db.add(db_document)
         self.db.commit()
         self.db.refresh(db_document)
         return db_document
 
+    def create_documents(self, rows: List[dict]) -> List[UUID]:
+        """
+        Insert several documents (create_document keyword arguments) with one flush and one
+        commit. Returns their ids in input order, without reloading the rows.
+        """
+        db_documents = [Document(id=uuid4(), **row) for row in rows]
+        self.db.add_all(db_documents)
+        ids = [d.id for d in db_documents]
+        self.db.commit()
+        return ids
+
     def get_by_id(self, document_id: UUID) -> Optional[Document]:
         return self.db.query(Document)\
             .options(joinedload(Document.ocr_result))\
             .filter(Document.id == document_id)\
             .first()
 
+    def referenced_content_hashes(self, content_hashes: List[str]) -> Set[str]:
+        """
+        The given content hashes that some document row was stored with.
+        """
+        rows = self.db.query(Document.content_hash).filter(Document.content_hash.in_(content_hashes)).distinct().all()
+        return {row[0] for row in rows}
+
     def get_by_user_id(self, user_id: UUID) -> List[Document]:
         return self.db.query(Document).filter(Document.user_id == user_id).all()
 
@@ -71,3 +92,10 @@ class DocumentRepository:
         )   
 
 
+
+    def mark_failed(self, document_ids: List[UUID], error_message: str):
+        self.db.execute(
+            update(Document)
+            .where(Document.id.in_(document_ids))
+            .values(status=DocumentStatus.FAILED, error_message=error_message)
+        )
@@ -0,0 +1,211 @@
+# app/repositories/ingestion_job_repository.py
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+from sqlalchemy import and_, or_, update
+from sqlalchemy.orm import Session
+from app.db.models.ingestion_job import IngestionJob
+from app.constants.status import JobStatus
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class IngestionJobRepository:
+    """
+    IngestionJob repository (durable job queue).
+
+    Claiming is safe with several workers on both backends:
+    - Postgres: candidate rows are selected with FOR UPDATE SKIP LOCKED.
+    - SQLite: row locks are not available, so the claim UPDATE is conditional on
+      the row being unchanged (status + attempts act as an optimistic version).
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def enqueue(
+        self,
+        document_id: UUID,
+        stage: str,
+        *,
+        payload: Optional[Dict[str, Any]] = None,
+        max_attempts: int = 3,
+    ) -> IngestionJob:
+        job = IngestionJob(
+            document_id=document_id,
+            stage=stage,
+            payload=payload or {},
+            status=JobStatus.PENDING,
+            attempts=0,
+            max_attempts=max_attempts,
+            available_at=_utcnow(),
+        )
+        self.db.add(job)
+        self.db.commit()
+        self.db.refresh(job)
+        return job
+
+    def enqueue_many(
+        self,
+        document_ids: List[UUID],
+        stage: str,
+        *,
+        payload: Optional[Dict[str, Any]] = None,
+        max_attempts: int = 3,
+    ) -> List[IngestionJob]:
+        """
+        One job per document, written in a single commit.
+        """
+        now = _utcnow()
+        jobs = [
+            IngestionJob(
+                document_id=document_id,
+                stage=stage,
+                payload=dict(payload or {}),
+                status=JobStatus.PENDING,
+                attempts=0,
+                max_attempts=max_attempts,
+                available_at=now,
+            )
+            for document_id in document_ids
+        ]
+        self.db.add_all(jobs)
+        self.db.flush()
+        ids = [job.id for job in jobs]
+        self.db.commit()
+        # One SELECT reloads the committed rows (server defaults included) instead of a refresh per job.
+        loaded = {job.id: job for job in self.db.query(IngestionJob).filter(IngestionJob.id.in_(ids))}
+        return [loaded[job_id] for job_id in ids]
+
+    def get_by_id(self, job_id: UUID) -> Optional[IngestionJob]:
+        return self.db.query(IngestionJob).filter(IngestionJob.id == job_id).first()
+
+    def list_by_document_id(self, document_id: UUID) -> List[IngestionJob]:
+        return (
+            self.db.query(IngestionJob)
+            .filter(IngestionJob.document_id == document_id)
+            .order_by(IngestionJob.created_at.asc())
+            .all()
+        )
+
+    def claim_next(
+        self,
+        stage: str,
+        *,
+        worker_id: str,
+        visibility_timeout_seconds: int,
+    ) -> Optional[IngestionJob]:
+        """
+        Lease the oldest claimable job of a stage: PENDING jobs whose backoff has passed,
+        or RUNNING jobs whose lease (visibility timeout) has expired.
+        Returns None when nothing is claimable.
+        """
+        while True:
+            now = _utcnow()
+            candidate = (
+                self.db.query(IngestionJob)
+                .filter(IngestionJob.stage == stage)
+                .filter(
+                    or_(
+                        and_(IngestionJob.status == JobStatus.PENDING, IngestionJob.available_at <= now),
+                        and_(IngestionJob.status == JobStatus.RUNNING, IngestionJob.locked_until < now),
+                    )
+                )
+                .order_by(IngestionJob.available_at.asc())
+                .with_for_update(skip_locked=True)
+                .first()
+            )
+            if candidate is None:
+                self.db.commit()
+                return None
+
+            # A lease expired on the last allowed attempt: the worker died mid-job.
+            if candidate.status == JobStatus.RUNNING and candidate.attempts >= candidate.max_attempts:
+                candidate.status = JobStatus.FAILED
+                candidate.locked_until = None
+                candidate.finished_at = now
+                candidate.last_error = candidate.last_error or "Visibility timeout expired on the last attempt."
+                self.db.commit()
+                continue
+
+            result = self.db.execute(
+                update(IngestionJob)
+                .where(IngestionJob.id == candidate.id)
+                .where(IngestionJob.status == candidate.status)
+                .where(IngestionJob.attempts == candidate.attempts)
+                .values(
+                    status=JobStatus.RUNNING,
+                    attempts=candidate.attempts + 1,
+                    locked_by=worker_id,
+                    locked_until=now + timedelta(seconds=visibility_timeout_seconds),
+                )
+                .execution_options(synchronize_session=False)
+            )
+            self.db.commit()
+            if result.rowcount == 1:
+                self.db.refresh(candidate)
+                return candidate
+            # Another worker won the race; look for the next candidate.
+
+    def extend_lease(self, job_id: UUID, *, worker_id: str, visibility_timeout_seconds: int) -> bool:
+        result = self.db.execute(
+            update(IngestionJob)
+            .where(IngestionJob.id == job_id)
+            .where(IngestionJob.status == JobStatus.RUNNING)
+            .where(IngestionJob.locked_by == worker_id)
+            .values(locked_until=_utcnow() + timedelta(seconds=visibility_timeout_seconds))
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+        return result.rowcount == 1
+
+    def mark_succeeded(self, job_id: UUID, *, worker_id: str) -> bool:
+        result = self.db.execute(
+            update(IngestionJob)
+            .where(IngestionJob.id == job_id)
+            .where(IngestionJob.locked_by == worker_id)
+            .values(
+                status=JobStatus.SUCCEEDED,
+                locked_until=None,
+                last_error=None,
+                finished_at=_utcnow(),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+        return result.rowcount == 1
+
+    def mark_attempt_failed(
+        self,
+        job_id: UUID,
+        *,
+        worker_id: str,
+        error_message: str,
+        retry_delay_seconds: float,
+    ) -> Optional[IngestionJob]:
+        """
+        Record a failed attempt: reschedule after retry_delay_seconds, or mark the job FAILED
+        once max_attempts is reached. Returns None if this worker no longer holds the lease.
+        """
+        job = self.get_by_id(job_id)
+        if job is None or job.locked_by != worker_id or job.status != JobStatus.RUNNING:
+            return None
+
+        now = _utcnow()
+        job.last_error = error_message
+        job.locked_until = None
+        if job.attempts >= job.max_attempts:
+            job.status = JobStatus.FAILED
+            job.finished_at = now
+        else:
+            job.status = JobStatus.PENDING
+            job.available_at = now + timedelta(seconds=retry_delay_seconds)
+
+        self.db.commit()
+        self.db.refresh(job)
+        return job
@@ -0,0 +1,116 @@
+# app/repositories/ocr_page_cache_repository.py
+
+from __future__ import annotations
+
+import json
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.db.models.ocr_page_cache import OCRPageCache
+
+
+class OCRPageCacheRepository:
+    """
+    OCRPageCache repository. A cache key is (content_hash, lang, engine_version);
+    each key holds one row per page.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _key_filter(self, content_hash: str, lang: str, engine_version: str):
+        return (
+            (OCRPageCache.content_hash == content_hash)
+            & (OCRPageCache.lang == lang)
+            & (OCRPageCache.engine_version == engine_version)
+        )
+
+    def list_cached_pages(self, content_hash: str, lang: str, engine_version: str) -> Set[int]:
+        rows = self.db.execute(
+            select(OCRPageCache.page_no).where(self._key_filter(content_hash, lang, engine_version))
+        )
+        return {r[0] for r in rows}
+
+    def get_page(
+        self,
+        content_hash: str,
+        lang: str,
+        engine_version: str,
+        page_no: int,
+    ) -> Optional[List[Dict[str, Any]]]:
+        row = self.db.execute(
+            select(OCRPageCache.lines)
+            .where(self._key_filter(content_hash, lang, engine_version))
+            .where(OCRPageCache.page_no == page_no)
+        ).first()
+        return row[0] if row else None
+
+    def touch(self, content_hash: str, lang: str, engine_version: str) -> None:
+        self.db.execute(
+            update(OCRPageCache)
+            .where(self._key_filter(content_hash, lang, engine_version))
+            .values(last_accessed_at=datetime.now(timezone.utc))
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+
+    def put_page(
+        self,
+        content_hash: str,
+        lang: str,
+        engine_version: str,
+        page_no: int,
+        lines: List[Dict[str, Any]],
+    ) -> None:
+        self.db.add(OCRPageCache(
+            content_hash=content_hash,
+            lang=lang,
+            engine_version=engine_version,
+            page_no=page_no,
+            lines=lines,
+            size_bytes=len(json.dumps(lines, ensure_ascii=False).encode("utf-8")),
+            last_accessed_at=datetime.now(timezone.utc),
+        ))
+        try:
+            self.db.commit()
+        except IntegrityError:
+            # Another worker cached the same page concurrently; its copy is equivalent.
+            self.db.rollback()
+
+    def total_size_bytes(self) -> int:
+        return int(self.db.execute(select(func.coalesce(func.sum(OCRPageCache.size_bytes), 0))).scalar_one())
+
+    def evict_to_size(self, max_bytes: int) -> int:
+        """
+        Delete least recently used cache keys (all pages of a key at once) until the
+        cache fits in max_bytes. Returns the number of deleted pages.
+        """
+        total = self.total_size_bytes()
+        if total <= max_bytes:
+            return 0
+
+        keys = self.db.execute(
+            select(
+                OCRPageCache.content_hash,
+                OCRPageCache.lang,
+                OCRPageCache.engine_version,
+                func.sum(OCRPageCache.size_bytes),
+            )
+            .group_by(OCRPageCache.content_hash, OCRPageCache.lang, OCRPageCache.engine_version)
+            .order_by(func.max(OCRPageCache.last_accessed_at).asc())
+        ).all()
+
+        deleted = 0
+        for content_hash, lang, engine_version, key_bytes in keys:
+            if total <= max_bytes:
+                break
+            result = self.db.execute(
+                delete(OCRPageCache).where(self._key_filter(content_hash, lang, engine_version))
+            )
+            deleted += result.rowcount
+            total -= int(key_bytes or 0)
+
+        self.db.commit()
+        return deleted
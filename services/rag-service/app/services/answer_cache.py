@@ -0,0 +1,248 @@
+# app/services/answer_cache.py
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from contextlib import aclosing
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services.embedding_cache import normalize_text
+from app.services.llm_client import LLMBackend
+from app.vectorstore.index_version import index_versions
+
+# (normalized query, ordered chunk ids, model name, prompt version)
+AnswerKey = Tuple[str, Tuple[str, ...], str, str]
+
+
+@dataclass
+class _Entry:
+    answer: str
+    created_at: float
+    # index version of every contributing document when the answer was generated
+    document_versions: Dict[str, int]
+    query_embedding: Optional[np.ndarray]
+
+
+class AnswerCache:
+    """
+    Cache of LLM answers keyed by (normalized query, ordered chunk-ID set, model, prompt version).
+
+    - Entries expire after ttl_seconds and the cache holds at most max_entries (LRU).
+    - An entry is dropped as soon as any contributing document has been re-indexed since
+      the answer was generated (per-document index versions).
+    - Semantic mode (similarity_threshold set): on an exact miss, an answer generated for the
+      same chunks, model and prompt version is reused if its query embedding has cosine
+      similarity >= similarity_threshold with the new one.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 512,
+        ttl_seconds: float = 3600.0,
+        similarity_threshold: Optional[float] = None,
+    ):
+        self.max_entries = max(int(max_entries), 0)
+        self.ttl_seconds = float(ttl_seconds)
+        self.similarity_threshold = similarity_threshold
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[AnswerKey, _Entry]" = OrderedDict()
+        # (chunk ids, model, prompt version) -> keys of entries for that context, for semantic lookups
+        self._by_context: Dict[Tuple[Tuple[str, ...], str, str], List[AnswerKey]] = {}
+
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.expirations = 0
+
+    @staticmethod
+    def make_key(query: str, chunk_ids: Sequence[str], model: str, prompt_version: str) -> AnswerKey:
+        return (normalize_text(query), tuple(str(x) for x in chunk_ids), model, prompt_version)
+
+    def get(
+        self,
+        key: AnswerKey,
+        query_embedding: Optional[Sequence[float]] = None,
+    ) -> Optional[str]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._valid(key, entry, now):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.answer
+
+            if self.similarity_threshold is not None and query_embedding is not None:
+                candidate = self._semantic_match(key, np.asarray(query_embedding, dtype=np.float32), now)
+                if candidate is not None:
+                    self._entries.move_to_end(candidate)
+                    self.semantic_hits += 1
+                    return self._entries[candidate].answer
+
+            self.misses += 1
+            return None
+
+    @staticmethod
+    def snapshot_versions(document_ids: Sequence[str]) -> Dict[str, int]:
+        # Take this before generating: a re-index during generation must invalidate the answer.
+        return {str(d): index_versions.get(str(d)) for d in set(document_ids)}
+
+    def put(
+        self,
+        key: AnswerKey,
+        answer: str,
+        document_versions: Dict[str, int],
+        query_embedding: Optional[Sequence[float]] = None,
+    ) -> None:
+        if self.max_entries == 0:
+            return
+        entry = _Entry(
+            answer=answer,
+            created_at=time.monotonic(),
+            document_versions=dict(document_versions),
+            query_embedding=np.asarray(query_embedding, dtype=np.float32) if query_embedding is not None else None,
+        )
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = entry
+            self._by_context.setdefault(key[1:], []).append(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.semantic_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "expirations": self.expirations,
+                "hit_rate": ((self.hits + self.semantic_hits) / lookups) if lookups else 0.0,
+            }
+
+    # -------------------------
+    # Internals (lock held)
+    # -------------------------
+
+    def _valid(self, key: AnswerKey, entry: _Entry, now: float) -> bool:
+        if now - entry.created_at > self.ttl_seconds:
+            self.expirations += 1
+            self._drop(key)
+            return False
+        if any(index_versions.get(d) != v for d, v in entry.document_versions.items()):
+            self.invalidations += 1
+            self._drop(key)
+            return False
+        return True
+
+    def _semantic_match(self, key: AnswerKey, query_vec: np.ndarray, now: float) -> Optional[AnswerKey]:
+        best_key, best_sim = None, -1.0
+        q_norm = float(np.linalg.norm(query_vec)) or 1.0
+        for other in list(self._by_context.get(key[1:], ())):
+            entry = self._entries.get(other)
+            if entry is None or entry.query_embedding is None or not self._valid(other, entry, now):
+                continue
+            sim = float(entry.query_embedding @ query_vec) / ((float(np.linalg.norm(entry.query_embedding)) or 1.0) * q_norm)
+            if sim > best_sim:
+                best_key, best_sim = other, sim
+        if best_key is not None and best_sim >= self.similarity_threshold:
+            return best_key
+        return None
+
+    def _drop(self, key: AnswerKey) -> None:
+        self._entries.pop(key, None)
+        siblings = self._by_context.get(key[1:])
+        if siblings is not None:
+            try:
+                siblings.remove(key)
+            except ValueError:
+                pass
+            if not siblings:
+                del self._by_context[key[1:]]
+
+
+class AnswerService:
+    """
+    LLM answers behind the answer cache. Failed generations are not cached; their errors
+    (CircuitOpenError, LLMTimeoutError, backend errors) are raised to the caller.
+    """
+
+    def __init__(self, llm: LLMBackend, cache: Optional[AnswerCache] = None):
+        self.llm = llm
+        self.cache = cache
+
+    def lookup(
+        self,
+        query: str,
+        chunk_ids: Sequence[str],
+        query_embedding: Optional[Sequence[float]] = None,
+    ) -> Optional[str]:
+        if self.cache is None:
+            return None
+        key = AnswerCache.make_key(query, chunk_ids, self.llm.model_name, self.llm.prompt_version)
+        return self.cache.get(key, query_embedding=query_embedding)
+
+    async def get_answer(
+        self,
+        *,
+        query: str,
+        chunk_ids: Sequence[str],
+        chunks: List[str],
+        document_ids: Sequence[str],
+        query_embedding: Optional[Sequence[float]] = None,
+    ) -> str:
+        if not chunks:
+            return "No relevant context found in the document."
+
+        cached = self.lookup(query, chunk_ids, query_embedding)
+        if cached is not None:
+            return cached
+        key = AnswerCache.make_key(query, chunk_ids, self.llm.model_name, self.llm.prompt_version)
+        versions = AnswerCache.snapshot_versions(document_ids)
+
+        answer = await self.llm.generate_answer(query, chunks)
+        if self.cache is not None:
+            self.cache.put(key, answer, versions, query_embedding=query_embedding)
+        return answer
+
+    async def stream_answer(
+        self,
+        *,
+        query: str,
+        chunk_ids: Sequence[str],
+        chunks: List[str],
+        document_ids: Sequence[str],
+        query_embedding: Optional[Sequence[float]] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Streaming generation (check lookup first): pieces are relayed from the LLM and the
+        full answer is cached once the stream completes. A stream that is abandoned (client
+        gone) or fails is not cached; errors are raised.
+        """
+        if not chunks:
+            yield "No relevant context found in the document."
+            return
+
+        key = AnswerCache.make_key(query, chunk_ids, self.llm.model_name, self.llm.prompt_version)
+        versions = AnswerCache.snapshot_versions(document_ids)
+
+        pieces: List[str] = []
+        # Closed as soon as this generator is, so an abandoned stream stops the LLM call.
+        async with aclosing(self.llm.stream_answer(query, chunks)) as stream:
+            async for piece in stream:
+                pieces.append(piece)
+                yield piece
+
+        answer = "".join(pieces)
+        if self.cache is not None and answer.strip():
+            self.cache.put(key, answer, versions, query_embedding=query_embedding)
@@ -0,0 +1,296 @@
+# app/services/chunk_hydration.py
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from uuid import UUID
+
+from app.db.session import async_session_scope, session_scope
+from app.repositories.chunk_repository import AsyncChunkRepository, ChunkRepository
+from app.utils.config import settings
+from app.utils.hashing import chunk_content_hash
+from app.vectorstore.base import VectorHit
+from app.vectorstore.index_version import index_versions
+
+
+class ChunkRow(NamedTuple):
+    """
+    The chunk fields a search hit needs (same attribute names as the Chunk model).
+    """
+    id: Any
+    document_id: Any
+    chunk_index: int
+    start_offset: Optional[int]
+    end_offset: Optional[int]
+    text: Optional[str]
+
+
+def _hit_chunk_id(hit: VectorHit) -> str:
+    return str(hit.metadata.get("chunk_id") or hit.id)
+
+
+def _as_uuids(chunk_ids: List[str]) -> List[Any]:
+    ids: List[Any] = []
+    for cid in chunk_ids:
+        try:
+            ids.append(UUID(cid))
+        except ValueError:
+            continue
+    return ids
+
+
+class SqlHydrator:
+    """
+    Chunk rows for a list of hits with one projected SELECT (no ORM objects, no refresh).
+    Hydrators return {chunk_id: row}; hits missing from the map fall back to the vector store's copy.
+    """
+
+    name = "sql"
+
+    def hydrate(self, hits: List[VectorHit]) -> Dict[str, ChunkRow]:
+        return self._load([_hit_chunk_id(h) for h in hits])
+
+    async def ahydrate(self, hits: List[VectorHit]) -> Dict[str, ChunkRow]:
+        return await self._aload([_hit_chunk_id(h) for h in hits])
+
+    def _load(self, chunk_ids: List[str]) -> Dict[str, ChunkRow]:
+        if not chunk_ids:
+            return {}
+        with session_scope() as db:
+            rows = ChunkRepository(db).get_hit_rows_by_ids(_as_uuids(chunk_ids))
+        return {str(r.id): ChunkRow(*r) for r in rows}
+
+    async def _aload(self, chunk_ids: List[str]) -> Dict[str, ChunkRow]:
+        if not chunk_ids:
+            return {}
+        async with async_session_scope() as db:
+            rows = await AsyncChunkRepository(db).get_hit_rows_by_ids(_as_uuids(chunk_ids))
+        return {str(r.id): ChunkRow(*r) for r in rows}
+
+    def stats(self) -> Dict[str, Any]:
+        return {"mode": self.name}
+
+
+class CachedHydrator(SqlHydrator):
+    """
+    Read-through LRU of chunk rows in front of SqlHydrator. Each row is stored with its
+    document's index version, so rows of a re-indexed document are re-read.
+    """
+
+    name = "cache"
+
+    def __init__(self, max_entries: int = 20_000):
+        self.max_entries = max(int(max_entries), 0)
+        self._lock = threading.Lock()
+        self._rows: "OrderedDict[str, Tuple[int, ChunkRow]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def hydrate(self, hits: List[VectorHit]) -> Dict[str, ChunkRow]:
+        found, missing = self._lookup([_hit_chunk_id(h) for h in hits])
+        if missing:
+            found.update(self._remember(self._load(missing)))
+        return found
+
+    async def ahydrate(self, hits: List[VectorHit]) -> Dict[str, ChunkRow]:
+        found, missing = self._lookup([_hit_chunk_id(h) for h in hits])
+        if missing:
+            found.update(self._remember(await self._aload(missing)))
+        return found
+
+    def _lookup(self, chunk_ids: List[str]) -> Tuple[Dict[str, ChunkRow], List[str]]:
+        found: Dict[str, ChunkRow] = {}
+        missing: List[str] = []
+        with self._lock:
+            for cid in chunk_ids:
+                entry = self._rows.get(cid)
+                if entry is not None and entry[0] == index_versions.get(str(entry[1].document_id)):
+                    self._rows.move_to_end(cid)
+                    found[cid] = entry[1]
+                    self.hits += 1
+                else:
+                    missing.append(cid)
+                    self.misses += 1
+        return found, missing
+
+    def _remember(self, rows: Dict[str, ChunkRow]) -> Dict[str, ChunkRow]:
+        if self.max_entries == 0:
+            return rows
+        with self._lock:
+            for cid, row in rows.items():
+                # Version as of the read; a write landing meanwhile only makes the entry stale.
+                self._rows[cid] = (index_versions.get(str(row.document_id)), row)
+                self._rows.move_to_end(cid)
+            while len(self._rows) > self.max_entries:
+                self._rows.popitem(last=False)
+        return rows
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "mode": self.name,
+                "entries": len(self._rows),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
+
+
+class VectorStoreHydrator(SqlHydrator):
+    """
+    Trusts the text and metadata the vector store returned with each hit when the
+    metadata's content_hash (the per-chunk version written by ChunkSync) matches the
+    chunk's content_hash in Postgres and the stored text still hashes to it; only the
+    remaining hits (stale or older vectors, no stored text, lexical-only candidates) go
+    to the fallback hydrator.
+
+    Postgres hashes are kept in an LRU validated by the document's index version, like
+    CachedHydrator's rows; misses are read with one projected SELECT without the text.
+    """
+
+    name = "vector"
+
+    def __init__(self, fallback: Optional[SqlHydrator] = None, max_entries: int = 20_000):
+        self.fallback = fallback or SqlHydrator()
+        self.max_entries = max(int(max_entries), 0)
+        self._lock = threading.Lock()
+        # chunk_id -> (document index version when read, content_hash in Postgres)
+        self._hashes: "OrderedDict[str, Tuple[int, Optional[str]]]" = OrderedDict()
+        self.trusted = 0
+        self.fallbacks = 0
+        self.stale = 0
+
+    def hydrate(self, hits: List[VectorHit]) -> Dict[str, ChunkRow]:
+        candidates = self._candidates(hits)
+        found, missing = self._lookup_hashes(candidates)
+        if missing:
+            with session_scope() as db:
+                rows = ChunkRepository(db).get_content_hashes_by_ids(_as_uuids(missing))
+            found.update(self._remember(rows))
+        trusted, rest = self._split(hits, candidates, found)
+        if rest:
+            trusted.update(self.fallback.hydrate(rest))
+        return trusted
+
+    async def ahydrate(self, hits: List[VectorHit]) -> Dict[str, ChunkRow]:
+        candidates = self._candidates(hits)
+        found, missing = self._lookup_hashes(candidates)
+        if missing:
+            async with async_session_scope() as db:
+                rows = await AsyncChunkRepository(db).get_content_hashes_by_ids(_as_uuids(missing))
+            found.update(self._remember(rows))
+        trusted, rest = self._split(hits, candidates, found)
+        if rest:
+            trusted.update(await self.fallback.ahydrate(rest))
+        return trusted
+
+    @staticmethod
+    def _candidates(hits: List[VectorHit]) -> Dict[str, ChunkRow]:
+        # Hits carrying a self-consistent copy of their chunk; chunk_id -> row built from it.
+        candidates: Dict[str, ChunkRow] = {}
+        for h in hits:
+            row = VectorStoreHydrator._stored_row(h)
+            if row is not None:
+                candidates[str(row.id)] = row
+        return candidates
+
+    def _lookup_hashes(self, candidates: Dict[str, ChunkRow]) -> Tuple[Dict[str, Optional[str]], List[str]]:
+        found: Dict[str, Optional[str]] = {}
+        missing: List[str] = []
+        with self._lock:
+            for cid, row in candidates.items():
+                entry = self._hashes.get(cid)
+                if entry is not None and entry[0] == index_versions.get(str(row.document_id)):
+                    self._hashes.move_to_end(cid)
+                    found[cid] = entry[1]
+                else:
+                    missing.append(cid)
+        return found, missing
+
+    def _remember(self, rows: List[Any]) -> Dict[str, Optional[str]]:
+        hashes = {str(chunk_id): content_hash for chunk_id, _, content_hash in rows}
+        if self.max_entries == 0:
+            return hashes
+        with self._lock:
+            for chunk_id, document_id, content_hash in rows:
+                self._hashes[str(chunk_id)] = (index_versions.get(str(document_id)), content_hash)
+                self._hashes.move_to_end(str(chunk_id))
+            while len(self._hashes) > self.max_entries:
+                self._hashes.popitem(last=False)
+        return hashes
+
+    def _split(
+        self,
+        hits: List[VectorHit],
+        candidates: Dict[str, ChunkRow],
+        db_hashes: Dict[str, Optional[str]],
+    ) -> Tuple[Dict[str, ChunkRow], List[VectorHit]]:
+        found: Dict[str, ChunkRow] = {}
+        rest: List[VectorHit] = []
+        stale = 0
+        for h in hits:
+            cid = _hit_chunk_id(h)
+            row = candidates.get(cid)
+            if row is not None and db_hashes.get(cid) == h.metadata.get("content_hash"):
+                found[cid] = row
+                continue
+            if row is not None:
+                # Postgres has a different version of the chunk (or none): the vector copy drifted.
+                stale += 1
+            rest.append(h)
+        with self._lock:
+            self.trusted += len(found)
+            self.fallbacks += len(rest)
+            self.stale += stale
+        return found, rest
+
+    @staticmethod
+    def _stored_row(h: VectorHit) -> Optional[ChunkRow]:
+        meta = h.metadata
+        version = meta.get("content_hash")
+        if h.document is None or not version or meta.get("document_id") is None or meta.get("chunk_index") is None:
+            return None
+        if chunk_content_hash(h.document) != version:
+            return None
+        so, eo = meta.get("start_offset"), meta.get("end_offset")
+        return ChunkRow(
+            id=_hit_chunk_id(h),
+            document_id=meta["document_id"],
+            chunk_index=int(meta["chunk_index"]),
+            start_offset=int(so) if isinstance(so, int) else None,
+            end_offset=int(eo) if isinstance(eo, int) else None,
+            text=h.document,
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "mode": self.name,
+                "trusted": self.trusted,
+                "fallbacks": self.fallbacks,
+                "stale": self.stale,
+                "hash_entries": len(self._hashes),
+                "fallback": self.fallback.stats(),
+            }
+
+
+def get_hydrator(mode: Optional[str] = None) -> SqlHydrator:
+    """
+    Hydration strategy for SEARCH_HYDRATION: "sql", "cache" or "vector"
+    ("vector" falls back to the row cache).
+    """
+    mode = mode or settings.SEARCH_HYDRATION
+    if mode == "sql":
+        return SqlHydrator()
+    if mode == "cache":
+        return CachedHydrator(max_entries=settings.CHUNK_ROW_CACHE_MAX_ENTRIES)
+    if mode == "vector":
+        return VectorStoreHydrator(
+            fallback=CachedHydrator(max_entries=settings.CHUNK_ROW_CACHE_MAX_ENTRIES),
+            max_entries=settings.CHUNK_ROW_CACHE_MAX_ENTRIES,
+        )
+    raise ValueError(f"Unknown SEARCH_HYDRATION mode: {mode}")
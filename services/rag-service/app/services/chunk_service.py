@@ -1,37 +1,34 @@
 # app/services/chunk_service.py
-from typing import List, Dict, Any
+from bisect import bisect_left, bisect_right
+from functools import partial
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
+if TYPE_CHECKING:
+    from transformers import PreTrainedTokenizerBase
+
+Chunker = Callable[[List[Dict[str, Any]], str], List[Dict[str, Any]]]
+
+def get_separators(lang: str) -> List[str]:
+    # Ordered from strongest to weakest boundary; "" means "anywhere".
+    if lang == "zh":
+        return ["\n\n", "\n", "。", "！", "？", "；", "，", " ", ""]
+    elif lang == "ja":
+        return ["\n\n", "\n", "。", "！", "？", "、", " ", ""]
+    else:
+        return ["\n\n", "\n", ". ", "! ", "? ", "; ", ", ", " ", ""]
+
 def chunk_text(structured_ocr_results: List[Dict[str, Any]], lang: str) -> List[Dict[str, Any]]:
     """
     Chunks structured OCR results while preserving page and coordinate metadata.
     """
     # 1. Choose separators based on language
-    if lang == "zh":
-        separators = ["\n\n", "\n", "。", "！", "？", "；", "，", " ", ""]
-    elif lang == "ja":
-        separators = ["\n\n", "\n", "。", "！", "？", "、", " ", ""]
-    else:
-        separators = ["\n\n", "\n", ". ", "! ", "? ", "; ", ", ", " ", ""]
+    separators = get_separators(lang)
 
     # 2. Reconstruct text while tracking offsets to map back to metadata
     # We combine all lines into a single string to use the splitter's logic,
     # but we need to know which page each character belongs to.
-    full_text = ""
-    offset_to_metadata = []
-
-    for item in structured_ocr_results:
-        start_pos = len(full_text)
-        text = item["text"] + " " # Add space to prevent words from sticking
-        full_text += text
-        end_pos = len(full_text)
-        
-        offset_to_metadata.append({
-            "start": start_pos,
-            "end": end_pos,
-            "page": item["page"],
-            "bbox": item["bbox"]
-        })
+    full_text, line_starts = build_offset_index(structured_ocr_results)
 
     # 3. Initialize the splitter
     from app.utils.config import settings
@@ -55,15 +52,12 @@ def chunk_text(structured_ocr_results: List[Dict[str, Any]], lang: str) -> List[
         start_idx = doc.metadata.get("start_index", 0)
         end_idx = start_idx + len(chunk_text)
 
-        # 5. Find the primary page for this chunk
-        # Since a chunk might span pages, we take the page of the first character
-        associated_page = 1
-        associated_bbox = []
-        for meta in offset_to_metadata:
-            if meta["start"] <= start_idx < meta["end"]:
-                associated_page = meta["page"]
-                associated_bbox = meta["bbox"]
-                break
+        # 5. Find every OCR line the chunk covers (O(log n) per chunk).
+        # A chunk might span pages: "spans" lists each (page, bbox) in reading order,
+        # "page"/"bbox" remain those of the first character.
+        spans = find_line_spans(structured_ocr_results, line_starts, start_idx, end_idx)
+        associated_page = spans[0]["page"] if spans else 1
+        associated_bbox = spans[0]["bbox"] if spans else []
 
         results.append({
             "text": chunk_text,
@@ -71,6 +65,209 @@ def chunk_text(structured_ocr_results: List[Dict[str, Any]], lang: str) -> List[
             "end": end_idx,
             "page": associated_page,      # Critical for PDF navigation
             "bbox": associated_bbox,      # Critical for Highlighting
+            "spans": spans,               # Highlighting across lines / page boundaries
         })
 
-    return results
\ No newline at end of file
+    return results
+
+def token_chunk_text(
+    structured_ocr_results: List[Dict[str, Any]],
+    lang: str,
+    tokenizer: "PreTrainedTokenizerBase",
+    max_tokens: Optional[int] = None,
+    overlap_tokens: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Token-budgeted variant of chunk_text.
+
+    The text is tokenized once with the fast tokenizer's offset mapping. Each chunk takes at
+    most max_tokens tokens and ends at the strongest language separator found in the second
+    half of its budget, so it is never truncated by the embedding model. Char offsets and
+    token counts come out of the same pass (no re-tokenization per chunk).
+    """
+    from app.utils.config import settings
+    if not getattr(tokenizer, "is_fast", False):
+        raise ValueError("token_chunk_text requires a fast tokenizer (offset mapping)")
+
+    max_tokens = max(int(max_tokens or settings.CHUNK_MAX_TOKENS), 1)
+    overlap = overlap_tokens if overlap_tokens is not None else settings.CHUNK_OVERLAP_TOKENS
+    overlap = min(max(int(overlap), 0), max_tokens // 2)
+    separators = get_separators(lang)
+
+    full_text, line_starts = build_offset_index(structured_ocr_results)
+    encoding = tokenizer(
+        full_text,
+        add_special_tokens=False,
+        return_offsets_mapping=True,
+        return_attention_mask=False,
+        truncation=False,
+        verbose=False,
+    )
+    offsets: List[Tuple[int, int]] = encoding["offset_mapping"]
+    n = len(offsets)
+
+    def is_boundary(k: int, sep: str) -> bool:
+        # Can a chunk end right after token k - 1 on this separator?
+        if k >= n or sep == "":
+            return True
+        end = offsets[k - 1][1]
+        mark = sep.strip()
+        if mark:
+            return full_text.endswith(mark, 0, end)
+        return sep in full_text[end:offsets[k][0]]
+
+    results = []
+    i = 0
+    while i < n:
+        limit = min(i + max_tokens, n)
+        cut = limit
+        if limit < n:
+            # Strongest separator wins; the second half of the budget keeps chunks from getting tiny.
+            floor = i + max(max_tokens // 2, 1)
+            for sep in separators:
+                k = next((k for k in range(limit, floor - 1, -1) if is_boundary(k, sep)), None)
+                if k is not None:
+                    cut = k
+                    break
+
+        start_idx = offsets[i][0]
+        end_idx = offsets[cut - 1][1]
+        text = full_text[start_idx:end_idx]
+        if len(text) >= 10: # Skip noise
+            spans = find_line_spans(structured_ocr_results, line_starts, start_idx, end_idx)
+            results.append({
+                "text": text,
+                "start": start_idx,
+                "end": end_idx,
+                "page": spans[0]["page"] if spans else 1,
+                "bbox": spans[0]["bbox"] if spans else [],
+                "spans": spans,
+                "token_count": cut - i,
+            })
+
+        if cut >= n:
+            break
+        # Overlap: step back up to `overlap` tokens, starting on a word boundary when possible.
+        next_i = max(cut - overlap, i + 1)
+        for t in range(next_i, cut):
+            if offsets[t - 1][1] < offsets[t][0]:
+                next_i = t
+                break
+        i = next_i
+
+    return results
+
+def chunk_document(
+    structured_ocr_results: List[Dict[str, Any]],
+    lang: str,
+    tokenizer: "PreTrainedTokenizerBase",
+) -> List[Dict[str, Any]]:
+    """
+    Chunk with the configured strategy (CHUNK_STRATEGY); every chunk carries token_count.
+    """
+    return _with_token_counts(get_chunker(tokenizer)(structured_ocr_results, lang), tokenizer)
+
+def stream_chunk_document(
+    pages: Iterable[List[Dict[str, Any]]],
+    lang: str,
+    tokenizer: "PreTrainedTokenizerBase",
+) -> Iterator[List[Dict[str, Any]]]:
+    for chunks in stream_chunk_text(pages, lang, chunker=get_chunker(tokenizer)):
+        yield _with_token_counts(chunks, tokenizer)
+
+def get_chunker(tokenizer: "PreTrainedTokenizerBase") -> Chunker:
+    from app.utils.config import settings
+    if settings.CHUNK_STRATEGY == "tokens":
+        return partial(token_chunk_text, tokenizer=tokenizer)
+    return chunk_text
+
+def _with_token_counts(chunks: List[Dict[str, Any]], tokenizer: "PreTrainedTokenizerBase") -> List[Dict[str, Any]]:
+    # Character chunks are counted in one batched tokenizer call; token chunks already are.
+    missing = [c for c in chunks if "token_count" not in c]
+    if missing:
+        encoded = tokenizer([c["text"] for c in missing], add_special_tokens=False)["input_ids"]
+        for c, ids in zip(missing, encoded):
+            c["token_count"] = len(ids)
+    return chunks
+
+def build_offset_index(structured_ocr_results: List[Dict[str, Any]]) -> Tuple[str, List[int]]:
+    """
+    Join OCR lines into one text (one space after each line) in a single pass.
+    Returns (full_text, line_starts) where line_starts[i] is the offset of line i;
+    line_starts is sorted, so an offset maps back to its line with bisect.
+    """
+    parts: List[str] = []
+    line_starts: List[int] = []
+    pos = 0
+    for item in structured_ocr_results:
+        text = item["text"] + " " # Add space to prevent words from sticking
+        line_starts.append(pos)
+        parts.append(text)
+        pos += len(text)
+    return "".join(parts), line_starts
+
+def find_line_spans(
+    structured_ocr_results: List[Dict[str, Any]],
+    line_starts: List[int],
+    start: int,
+    end: int,
+) -> List[Dict[str, Any]]:
+    """
+    (page, bbox) of every OCR line overlapping the text range [start, end).
+    """
+    if not line_starts or end <= start:
+        return []
+    first = max(bisect_right(line_starts, start) - 1, 0)
+    last = bisect_left(line_starts, end)  # exclusive
+    return [
+        {"page": item["page"], "bbox": item["bbox"]}
+        for item in structured_ocr_results[first:last]
+    ]
+
+def stream_chunk_text(
+    pages: Iterable[List[Dict[str, Any]]],
+    lang: str,
+    chunker: Chunker = chunk_text,
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Page-streaming variant of chunk_text.
+
+    Consumes OCR lines one page at a time and yields the chunks that are already complete,
+    with offsets relative to the whole document. The lines covered by the last (possibly
+    unfinished) chunk are carried over to the next page, so memory is bounded by one page
+    plus one chunk instead of the whole document.
+    """
+    carry: List[Dict[str, Any]] = []
+    base_offset = 0  # document offset of carry[0]
+
+    for lines in pages:
+        window = carry + list(lines)
+        if not window:
+            continue
+
+        chunks = chunker(window, lang)
+        if not chunks:
+            carry = window
+            continue
+
+        ready = chunks[:-1]
+        if ready:
+            yield [_shift_chunk(c, base_offset) for c in ready]
+
+        # Carry everything from the start of the last chunk, cutting the first line at
+        # that character (same offset arithmetic as chunk_text: one space after each line).
+        last_start = chunks[-1]["start"]
+        _, line_starts = build_offset_index(window)
+        i = bisect_right(line_starts, last_start) - 1
+        head = {**window[i], "text": window[i]["text"][last_start - line_starts[i]:]}
+        carry = [head] + window[i + 1:]
+        base_offset += last_start
+
+    if carry:
+        tail = chunker(carry, lang)
+        if tail:
+            yield [_shift_chunk(c, base_offset) for c in tail]
+
+
+def _shift_chunk(chunk: Dict[str, Any], offset: int) -> Dict[str, Any]:
+    return {**chunk, "start": chunk["start"] + offset, "end": chunk["end"] + offset}
@@ -0,0 +1,185 @@
+# app/services/chunk_sync_service.py
+
+from __future__ import annotations
+
+import uuid
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Sequence
+from uuid import UUID
+
+from app.db.session import session_scope
+from app.repositories.chunk_repository import ChunkRepository
+from app.repositories.document_repository import DocumentRepository
+from app.services.embedding_service import EmbeddingService
+from app.services.lexical_index import get_lexical_index
+from app.utils.config import settings
+from app.utils.hashing import chunk_content_hash
+from app.vectorstore.base import VectorRepository
+from app.vectorstore.partition_router import PartitionedVectorRepository
+from app.vectorstore.schemas import ChunkVectorMeta, encode_spans
+
+_POSITION_FIELDS = ("chunk_index", "start_offset", "end_offset")
+
+
+@dataclass
+class ChunkSyncStats:
+    added: int = 0
+    unchanged: int = 0
+    moved: int = 0  # same text, new position: row and vector metadata updated, no re-embed
+    removed: int = 0
+
+    def to_dict(self) -> Dict[str, int]:
+        return {"added": self.added, "unchanged": self.unchanged, "moved": self.moved, "removed": self.removed}
+
+
+@dataclass
+class ChunkSync:
+    """
+    Incremental re-indexing of one document.
+
+    Existing chunks are indexed by content hash. Each batch of freshly produced chunks is
+    matched against them: matches keep their row id and vector (only their position is
+    updated when it moved), the rest are inserted, embedded and upserted. Existing chunks
+    never matched are deleted in one batch by finish().
+
+    Used by both pipelines: the batch pipeline applies the whole document at once, the
+    streaming pipeline applies one page window at a time.
+    """
+
+    document_id: UUID
+    embedding_service: EmbeddingService
+    vector_repo: VectorRepository
+    # Document owner, written into the vector metadata (user-scoped search, partition routing)
+    user_id: Optional[str] = None
+    stats: ChunkSyncStats = field(default_factory=ChunkSyncStats)
+    _existing: Dict[Optional[str], Deque[Dict[str, Any]]] = field(default_factory=lambda: defaultdict(deque))
+
+    @classmethod
+    def load(cls, document_id: UUID, embedding_service: EmbeddingService, vector_repo: VectorRepository) -> "ChunkSync":
+        sync = cls(document_id=document_id, embedding_service=embedding_service, vector_repo=vector_repo)
+        with session_scope() as db:
+            document = DocumentRepository(db).get_by_id(document_id)
+            file_size = (document.file_size_bytes or 0) if document is not None else 0
+            if document is not None and document.user_id is not None:
+                sync.user_id = str(document.user_id)
+            existing = 0
+            for row in ChunkRepository(db).list_positions_by_document_id(document_id):
+                # Chunks written before content hashing have no hash and are always replaced.
+                sync._existing[row["content_hash"]].append(row)
+                existing += 1
+        if isinstance(vector_repo, PartitionedVectorRepository):
+            # Chunk count is only known after chunking; the previous run's count or the file size stands in.
+            large = (
+                existing >= settings.VECTOR_PARTITION_LARGE_DOCUMENT_CHUNKS
+                or file_size >= settings.VECTOR_PARTITION_LARGE_DOCUMENT_BYTES
+            )
+            vector_repo.assign(str(document_id), sync.user_id, large=large)
+        return sync
+
+    def apply(self, chunk_records: Sequence[Dict[str, Any]], chunks: Sequence[Dict[str, Any]]) -> None:
+        """
+        chunk_records: chunk rows without id/embedding_id/content_hash (document_id,
+        chunk_index, offsets, token_count, text); chunks: the chunker output of each record,
+        whose page and (page, bbox) spans go into the vector metadata.
+        """
+        added: List[Dict[str, Any]] = []
+        added_chunks: List[Dict[str, Any]] = []
+        matched: List[Dict[str, Any]] = []
+        matched_chunks: List[Dict[str, Any]] = []
+
+        for rec, chunk in zip(chunk_records, chunks):
+            content_hash = chunk_content_hash(rec["text"])
+            candidates = self._existing.get(content_hash)
+            if candidates:
+                old = candidates.popleft()
+                matched.append({**rec, "id": old["id"], "_old": old})
+                matched_chunks.append(chunk)
+                continue
+            chunk_id = uuid.uuid4()
+            # Vectors are stored under the chunk id, which is what embedding_id links to.
+            added.append({**rec, "id": chunk_id, "embedding_id": str(chunk_id), "content_hash": content_hash})
+            added_chunks.append(chunk)
+
+        # A row whose vector never made it into the index (e.g. an earlier run died between
+        # the insert and the upsert) keeps its row but is embedded again.
+        indexed = self.vector_repo.existing_ids([str(x["id"]) for x in matched], document_id=str(self.document_id))
+
+        moved: List[Dict[str, Any]] = []
+        moved_chunks: List[Dict[str, Any]] = []
+        reembed: List[Dict[str, Any]] = []
+        reembed_chunks: List[Dict[str, Any]] = []
+        for rec, chunk in zip(matched, matched_chunks):
+            old = rec.pop("_old")
+            if str(rec["id"]) not in indexed:
+                reembed.append(rec)
+                reembed_chunks.append(chunk)
+            elif any(old[f] != rec[f] for f in _POSITION_FIELDS):
+                moved.append(rec)
+                moved_chunks.append(chunk)
+            else:
+                self.stats.unchanged += 1
+
+        position_updates = [
+            {"id": x["id"], **{f: x[f] for f in _POSITION_FIELDS}}
+            for x in moved + reembed
+        ]
+        if added or position_updates:
+            with session_scope() as db:
+                chunk_repo = ChunkRepository(db)
+                chunk_repo.bulk_insert(added)
+                chunk_repo.bulk_update_positions(position_updates)
+
+        if moved:
+            self.vector_repo.update_metadatas(
+                chunk_ids=[str(x["id"]) for x in moved],
+                metadatas=[self._meta(x, chunk) for x, chunk in zip(moved, moved_chunks)],
+            )
+            self.stats.moved += len(moved)
+
+        to_embed = added + reembed
+        if to_embed:
+            texts = [x["text"] for x in to_embed]
+            vectors = self.embedding_service.embed_texts(texts)
+            self.vector_repo.upsert_chunks(
+                chunk_ids=[str(x["id"]) for x in to_embed],
+                embeddings=vectors,
+                documents=texts,
+                metadatas=[self._meta(x, chunk) for x, chunk in zip(to_embed, added_chunks + reembed_chunks)],
+            )
+            self.stats.added += len(to_embed)
+
+        # Keep this process's BM25 index (if it has one) current; other processes sync from the table.
+        lexical_index = get_lexical_index(create=False)
+        if lexical_index is not None and added:
+            lexical_index.add_chunks((str(x["id"]), str(self.document_id), x["text"]) for x in added)
+
+    def finish(self) -> ChunkSyncStats:
+        """
+        Delete, in one batch, every existing chunk that no new chunk matched.
+        """
+        removed_ids = [row["id"] for rows in self._existing.values() for row in rows]
+        self._existing.clear()
+        if removed_ids:
+            with session_scope() as db:
+                ChunkRepository(db).delete_by_ids(removed_ids)
+            self.vector_repo.delete_by_ids([str(x) for x in removed_ids], document_id=str(self.document_id))
+            lexical_index = get_lexical_index(create=False)
+            if lexical_index is not None:
+                lexical_index.remove_chunks(str(x) for x in removed_ids)
+        self.stats.removed += len(removed_ids)
+        return self.stats
+
+    def _meta(self, rec: Dict[str, Any], chunk: Dict[str, Any]) -> ChunkVectorMeta:
+        return ChunkVectorMeta(
+            document_id=str(self.document_id),
+            user_id=self.user_id,
+            chunk_id=str(rec["id"]),
+            chunk_index=rec["chunk_index"],
+            source="ocr",
+            start_offset=rec["start_offset"],
+            end_offset=rec["end_offset"],
+            page=chunk.get("page"),
+            spans=encode_spans(chunk.get("spans")),
+            content_hash=rec.get("content_hash") or chunk_content_hash(rec["text"]),
+        )
@@ -0,0 +1,201 @@
+# app/services/context_packer.py
+
+from __future__ import annotations
+
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Set
+
+if TYPE_CHECKING:
+    from transformers import PreTrainedTokenizerBase
+
+_WS = re.compile(r"\s+")
+
+
+@dataclass
+class ContextPiece:
+    """
+    One block of prompt context: a run of contiguous or overlapping chunks of one document.
+    """
+    text: str
+    document_id: str
+    chunk_ids: List[str] = field(default_factory=list)
+    start_offset: Optional[int] = None
+    end_offset: Optional[int] = None
+    # Best (lowest) retrieval rank among its chunks; pieces are ordered by it
+    rank: int = 0
+    last_chunk_index: int = -1
+
+
+class ContextPacker:
+    """
+    Turns ranked search hits into the context pieces sent to the LLM.
+
+    1. Hits are taken best first while they fit max_tokens (counted with the embedding
+       tokenizer, one batched call). A hit that does not fit is skipped, so a smaller,
+       lower-ranked one can still use the rest of the budget.
+    2. A hit is dropped when its offsets lie inside an already selected hit of the same
+       document, or when its text is a near duplicate (character 5-gram Jaccard >=
+       dedup_similarity) of one, e.g. the same page uploaded twice.
+    3. The selected hits of each document are sorted by position. Overlapping or adjacent
+       ranges (start_offset / end_offset), or consecutive chunk_index values when offsets
+       are missing, are merged into one piece. The overlap shared by neighbouring chunks
+       (CHUNK_OVERLAP) is sent once.
+    4. Pieces are ordered by the best rank among their hits.
+    """
+
+    def __init__(self, tokenizer: "PreTrainedTokenizerBase", max_tokens: int = 2048, dedup_similarity: float = 0.9):
+        self.tokenizer = tokenizer
+        self.max_tokens = max(int(max_tokens), 1)
+        self.dedup_similarity = dedup_similarity
+
+    def pack(self, hits: Sequence[Any]) -> List[ContextPiece]:
+        """
+        hits: SearchHit-like objects (chunk_id, text, document_id, chunk_index,
+        start_offset, end_offset), best first.
+        """
+        hits = [h for h in hits if (h.text or "").strip()]
+        if not hits:
+            return []
+        costs = self._count_tokens([h.text for h in hits])
+
+        selected: List[int] = []
+        shingles: List[Set[str]] = []
+        remaining = self.max_tokens
+        for i, h in enumerate(hits):
+            if costs[i] > remaining:
+                continue
+            if any(_contains(hits[j], h) for j in selected):
+                continue
+            grams = _shingles(h.text)
+            if any(_jaccard(grams, other) >= self.dedup_similarity for other in shingles):
+                continue
+            selected.append(i)
+            shingles.append(grams)
+            remaining -= costs[i]
+
+        by_document: Dict[str, List[int]] = {}
+        for i in selected:
+            by_document.setdefault(str(hits[i].document_id), []).append(i)
+
+        pieces: List[ContextPiece] = []
+        for document_id, idx in by_document.items():
+            idx.sort(key=lambda i: (_position(hits[i]), i))
+            piece: Optional[ContextPiece] = None
+            for i in idx:
+                h = hits[i]
+                if piece is not None and _continues(piece, h):
+                    _extend(piece, h, i)
+                    continue
+                piece = ContextPiece(
+                    text=h.text,
+                    document_id=document_id,
+                    chunk_ids=[str(h.chunk_id)],
+                    start_offset=h.start_offset,
+                    end_offset=h.end_offset,
+                    rank=i,
+                    last_chunk_index=int(h.chunk_index),
+                )
+                pieces.append(piece)
+
+        pieces.sort(key=lambda p: p.rank)
+        return pieces
+
+    def pack_texts(self, hits: Sequence[Any]) -> List[str]:
+        return [p.text for p in self.pack(hits)]
+
+    def _count_tokens(self, texts: List[str]) -> List[int]:
+        encoded = self.tokenizer(texts, add_special_tokens=False, verbose=False)["input_ids"]
+        return [len(ids) for ids in encoded]
+
+
+_packer: Optional[ContextPacker] = None
+_packer_lock = threading.Lock()
+
+
+def get_context_packer() -> ContextPacker:
+    """
+    Process-wide packer on the registry's embedding tokenizer, sized by CONTEXT_MAX_TOKENS.
+    """
+    global _packer
+    with _packer_lock:
+        if _packer is None:
+            from app.services.model_registry import registry
+            from app.utils.config import settings
+
+            _packer = ContextPacker(
+                registry.get_tokenizer(),
+                max_tokens=settings.CONTEXT_MAX_TOKENS,
+                dedup_similarity=settings.CONTEXT_DEDUP_SIMILARITY,
+            )
+        return _packer
+
+
+def _position(h: Any) -> tuple:
+    # Offsets when known; chunk_index orders chunks whose offsets are missing.
+    return (h.start_offset if h.start_offset is not None else -1, int(h.chunk_index))
+
+
+def _contains(outer: Any, inner: Any) -> bool:
+    if str(outer.document_id) != str(inner.document_id):
+        return False
+    if None in (outer.start_offset, outer.end_offset, inner.start_offset, inner.end_offset):
+        return False
+    return outer.start_offset <= inner.start_offset and inner.end_offset <= outer.end_offset
+
+
+def _continues(piece: ContextPiece, h: Any) -> bool:
+    if piece.end_offset is not None and h.start_offset is not None:
+        # <= end + 1: chunks of joined OCR lines are separated by a single space
+        return h.start_offset <= piece.end_offset + 1
+    return int(h.chunk_index) == piece.last_chunk_index + 1
+
+
+def _extend(piece: ContextPiece, h: Any, rank: int) -> None:
+    gap = None
+    if piece.end_offset is not None and h.start_offset is not None:
+        gap = h.start_offset - piece.end_offset
+    if gap is not None and h.end_offset is not None and h.end_offset <= piece.end_offset:
+        # Fully inside the piece already
+        piece.chunk_ids.append(str(h.chunk_id))
+        piece.rank = min(piece.rank, rank)
+        return
+    piece.text = _join(piece.text, h.text, gap)
+    piece.chunk_ids.append(str(h.chunk_id))
+    piece.end_offset = h.end_offset if h.end_offset is not None else piece.end_offset
+    piece.rank = min(piece.rank, rank)
+    piece.last_chunk_index = int(h.chunk_index)
+
+
+def _join(text: str, nxt: str, gap: Optional[int]) -> str:
+    if gap is not None and gap >= 0:
+        return text + ("" if gap == 0 else " ") + nxt
+    if gap is not None and text.endswith(nxt[:-gap]):
+        return text + nxt[-gap:]
+    # Offsets missing or off by stripped whitespace: find the shared text itself.
+    k = _overlap_len(text, nxt)
+    if k:
+        return text + nxt[k:]
+    return text + " " + nxt
+
+
+def _overlap_len(a: str, b: str, min_len: int = 16, max_len: int = 2000) -> int:
+    # Longest suffix of a that is a prefix of b (at least min_len chars, to avoid chance matches)
+    for k in range(min(len(a), len(b), max_len), min_len - 1, -1):
+        if a.endswith(b[:k]):
+            return k
+    return 0
+
+
+def _shingles(text: str, n: int = 5) -> Set[str]:
+    norm = _WS.sub(" ", (text or "").lower()).strip()
+    if len(norm) <= n:
+        return {norm}
+    return {norm[i:i + n] for i in range(len(norm) - n + 1)}
+
+
+def _jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
@@ -0,0 +1,123 @@
+# app/services/embedding_batcher.py
+
+from __future__ import annotations
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.embedding_service import EmbeddingService
+
+
+class EmbeddingBatcher:
+    """
+    Request coalescer for query embeddings.
+
+    Concurrent callers each await embed(text); texts are collected for up to max_wait_ms
+    (or until max_batch_size is reached) and encoded with a single model.encode call on a
+    dedicated executor, then every caller's future is resolved with its own vector.
+    """
+
+    def __init__(
+        self,
+        embedding_service: EmbeddingService,
+        *,
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+    ):
+        self.embedding_service = embedding_service
+        self.max_batch_size = max(int(max_batch_size), 1)
+        self.max_wait_ms = max(float(max_wait_ms), 0.0)
+
+        # One thread: the model runs one batch at a time; batching is what buys throughput.
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embed")
+        self._queue: Optional["asyncio.Queue[Tuple[str, asyncio.Future]]"] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        # metrics
+        self._batches = 0
+        self._items = 0
+        self._largest_batch = 0
+        self._encode_seconds = 0.0
+
+    def _ensure_started(self) -> "asyncio.Queue[Tuple[str, asyncio.Future]]":
+        loop = asyncio.get_running_loop()
+        if self._queue is None or self._loop is not loop or self._task is None or self._task.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._task = loop.create_task(self._run())
+        return self._queue
+
+    async def embed(self, text: str) -> List[float]:
+        queue = self._ensure_started()
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        await queue.put((text, future))
+        return await future
+
+    async def _run(self) -> None:
+        assert self._queue is not None
+        queue = self._queue
+        loop = asyncio.get_running_loop()
+
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + self.max_wait_ms / 1000
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Callers that went away (client disconnect) do not need encoding.
+            batch = [(text, fut) for text, fut in batch if not fut.done()]
+            if not batch:
+                continue
+
+            start = time.perf_counter()
+            try:
+                vectors = await loop.run_in_executor(
+                    self._executor,
+                    self.embedding_service.embed_texts,
+                    [text for text, _ in batch],
+                )
+            except Exception as e:
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+
+            self._batches += 1
+            self._items += len(batch)
+            self._largest_batch = max(self._largest_batch, len(batch))
+            self._encode_seconds += time.perf_counter() - start
+
+            for (_, fut), vec in zip(batch, vectors):
+                if not fut.done():
+                    fut.set_result(vec)
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        self._executor.shutdown(wait=False)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "batches": self._batches,
+            "items": self._items,
+            "avg_batch_size": (self._items / self._batches) if self._batches else 0.0,
+            "largest_batch": self._largest_batch,
+            "avg_encode_ms": (self._encode_seconds * 1000 / self._batches) if self._batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+        }
@@ -0,0 +1,246 @@
+# app/services/embedding_cache.py
+
+from __future__ import annotations
+
+import atexit
+import hashlib
+import json
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from app.services.embedding_service import EmbeddingService
+from app.utils.config import settings
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX: single process assumed
+    fcntl = None
+
+_KEY_BYTES = 32  # SHA-256 digest
+_WAYS = 8  # slots per bucket: a key can only be stored in (and evict from) its bucket
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """
+    Whitespace-normalized text used both as cache key and as model input.
+    The WordPiece tokenizer splits on whitespace, so this does not change embeddings.
+    """
+    return " ".join((text or "").split())
+
+
+def text_key(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """
+    Persistent, LRU-bounded embedding cache for one (model name, normalize flag), shared
+    by every process (API workers, ingestion workers) that opens the same directory.
+
+    On-disk layout (all memory-mapped, nothing to serialize on shutdown):
+    - vectors.f32: float32 matrix [capacity, dim]
+    - keys.bin:    uint8 matrix [capacity, 32], SHA-256 of the normalized text
+    - ticks.bin:   int64 [capacity], last access time (ns), 0 = free slot
+
+    The files are their own index: a key can only live in the _WAYS slots of the bucket
+    its digest selects, so a lookup scans one bucket and sees what any process wrote.
+    A full bucket evicts its least recently used slot (set-associative LRU).
+
+    Lookups hold a shared flock on cache.lock, inserts (and the layout check on open) an
+    exclusive one, so readers never see a half-written slot and writers never race.
+    """
+
+    def __init__(self, cache_dir: str, model_name: str, normalize: bool, dim: int, capacity: int):
+        self.model_name = model_name
+        self.normalize = normalize
+        self.dim = dim
+        self.ways = max(min(_WAYS, capacity), 1)
+        self.buckets = max(capacity // self.ways, 1)
+        self.capacity = self.buckets * self.ways
+
+        namespace = hashlib.sha256(f"{model_name}|{normalize}|{dim}".encode("utf-8")).hexdigest()[:16]
+        self.path = Path(cache_dir) / namespace
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._lock_file = open(self.path / "cache.lock", "a+")
+
+        with self._file_lock(exclusive=True):
+            self._open()
+
+    # -------------------------
+    # Storage
+    # -------------------------
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool) -> Iterator[None]:
+        # flock locks belong to the open file: they serialize processes and instances alike.
+        if fcntl is None:
+            yield
+            return
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _open(self) -> None:
+        meta_path = self.path / "meta.json"
+        meta = {"model_name": self.model_name, "normalize": self.normalize, "dim": self.dim, "capacity": self.capacity, "ways": self.ways}
+        if meta_path.exists():
+            stored = json.loads(meta_path.read_text())
+            if stored != meta:
+                # Capacity (or layout) changed: start over rather than reinterpret the files.
+                for name in ("vectors.f32", "keys.bin", "ticks.bin"):
+                    (self.path / name).unlink(missing_ok=True)
+                meta_path.write_text(json.dumps(meta))
+        else:
+            meta_path.write_text(json.dumps(meta))
+
+        self._vectors = self._memmap("vectors.f32", np.float32, (self.capacity, self.dim))
+        self._keys = self._memmap("keys.bin", np.uint8, (self.capacity, _KEY_BYTES))
+        self._ticks = self._memmap("ticks.bin", np.int64, (self.capacity,))
+
+    def _memmap(self, name: str, dtype, shape) -> np.memmap:
+        file_path = self.path / name
+        mode = "r+" if file_path.exists() else "w+"
+        return np.memmap(file_path, dtype=dtype, mode=mode, shape=shape)
+
+    def _bucket(self, key: bytes) -> int:
+        return (int.from_bytes(key[:8], "little") % self.buckets) * self.ways
+
+    def _find(self, start: int, key: bytes) -> Optional[int]:
+        ways = slice(start, start + self.ways)
+        match = np.flatnonzero((self._ticks[ways] > 0) & (self._keys[ways] == np.frombuffer(key, dtype=np.uint8)).all(axis=1))
+        return start + int(match[0]) if match.size else None
+
+    def flush(self) -> None:
+        with self._lock:
+            self._vectors.flush()
+            self._keys.flush()
+            self._ticks.flush()
+
+    def close(self) -> None:
+        self.flush()
+        self._lock_file.close()
+
+    # -------------------------
+    # Lookup / insert
+    # -------------------------
+
+    def get_many(self, keys: Sequence[bytes]) -> List[Optional[np.ndarray]]:
+        """
+        Batched lookup. Returns a copy of each cached vector, or None for a miss.
+        """
+        out: List[Optional[np.ndarray]] = []
+        with self._lock, self._file_lock(exclusive=False):
+            now = time.time_ns()
+            for key in keys:
+                slot = self._find(self._bucket(key), key)
+                if slot is None:
+                    self.misses += 1
+                    out.append(None)
+                    continue
+                self.hits += 1
+                # Concurrent readers may race on this stamp; either value keeps the entry recent.
+                self._ticks[slot] = now
+                out.append(np.array(self._vectors[slot]))
+        return out
+
+    def put_many(self, keys: Sequence[bytes], vectors: Sequence[Sequence[float]]) -> None:
+        with self._lock, self._file_lock(exclusive=True):
+            now = time.time_ns()
+            for key, vec in zip(keys, vectors):
+                start = self._bucket(key)
+                if self._find(start, key) is not None:
+                    continue
+                ticks = self._ticks[start:start + self.ways]
+                # A free slot if there is one (tick 0), else the bucket's least recently used.
+                slot = start + int(np.argmin(ticks))
+                if ticks[slot - start] > 0:
+                    self.evictions += 1
+                self._vectors[slot] = np.asarray(vec, dtype=np.float32)
+                self._keys[slot] = np.frombuffer(key, dtype=np.uint8)
+                self._ticks[slot] = now
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": int(np.count_nonzero(self._ticks)),
+                "capacity": self.capacity,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
+
+
+_CACHES: Dict[str, Optional[EmbeddingCache]] = {}
+_CACHES_LOCK = threading.Lock()
+
+def get_embedding_cache(model_name: str, normalize: bool, dim: int) -> Optional[EmbeddingCache]:
+    """
+    Process-wide cache per (model, normalize, dim); None if caching is disabled. Every
+    process opening the same EMBEDDING_CACHE_DIR shares the entries.
+    """
+    if not settings.EMBEDDING_CACHE_ENABLED:
+        return None
+    key = f"{model_name}|{normalize}|{dim}"
+    with _CACHES_LOCK:
+        if key not in _CACHES:
+            cache = EmbeddingCache(
+                cache_dir=settings.EMBEDDING_CACHE_DIR,
+                model_name=model_name,
+                normalize=normalize,
+                dim=dim,
+                capacity=settings.EMBEDDING_CACHE_CAPACITY,
+            )
+            atexit.register(cache.close)
+            _CACHES[key] = cache
+        return _CACHES[key]
+
+
+class CachedEmbeddingService(EmbeddingService):
+    """
+    EmbeddingService with a persistent embedding cache in front of the model.
+    Only texts missing from the cache (deduplicated within the batch) are encoded.
+    """
+
+    def _get_cache(self) -> Optional[EmbeddingCache]:
+        dim = self._get_model().get_sentence_embedding_dimension()
+        return get_embedding_cache(self.model_name, self.normalize, dim)
+
+    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        normalized = [normalize_text(t) for t in texts]
+        cache = self._get_cache()
+        if cache is None:
+            return super().embed_texts(normalized)
+
+        keys = [text_key(t) for t in normalized]
+        cached = cache.get_many(keys)
+
+        # Encode each distinct missing text once.
+        missing: Dict[bytes, str] = {}
+        for key, text, vec in zip(keys, normalized, cached):
+            if vec is None and key not in missing:
+                missing[key] = text
+
+        encoded: Dict[bytes, List[float]] = {}
+        if missing:
+            vectors = super().embed_texts(list(missing.values()))
+            encoded = dict(zip(missing.keys(), vectors))
+            cache.put_many(list(encoded.keys()), list(encoded.values()))
+
+        return [
+            vec.tolist() if vec is not None else encoded[key]
+            for key, vec in zip(keys, cached)
+        ]
@@ -0,0 +1,26 @@
+# app/services/index_sync_service.py
+
+from __future__ import annotations
+
+from app.db.session import session_scope
+from app.repositories.chunk_repository import ChunkRepository
+from app.services.lexical_index import get_lexical_index, refresh_from_db
+from app.vectorstore.index_version import index_versions
+
+
+def sync_index_state() -> None:
+    """
+    Pick up index writes made by other processes (the ingestion worker).
+
+    One grouped query reads each document's chunk signature; documents that changed get
+    their index version bumped (invalidating cached search results) and are reloaded into
+    this process's BM25 index.
+    """
+    with session_scope() as db:
+        signatures = ChunkRepository(db).document_signatures()
+
+    index_versions.observe(signatures)
+
+    lexical_index = get_lexical_index(create=False)
+    if lexical_index is not None:
+        refresh_from_db(lexical_index, signatures)
@@ -0,0 +1,133 @@
+# app/services/job_queue_service.py
+
+from __future__ import annotations
+
+import random
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from app.constants.status import JobStage
+from app.db.session import queue_session_scope
+from app.repositories.ingestion_job_repository import IngestionJobRepository
+from app.utils.config import settings
+
+
+@dataclass
+class ClaimedJob:
+    """
+    Plain snapshot of a leased job, safe to use after the queue session is closed.
+    """
+    id: UUID
+    document_id: UUID
+    stage: str
+    attempts: int
+    max_attempts: int
+    payload: Dict[str, Any] = field(default_factory=dict)
+
+
+def job_to_dict(job) -> Dict[str, Any]:
+    return {
+        "job_id": str(job.id),
+        "document_id": str(job.document_id),
+        "stage": job.stage,
+        "status": job.status,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "available_at": job.available_at,
+        "locked_until": job.locked_until,
+        "last_error": job.last_error,
+        "created_at": job.created_at,
+        "finished_at": job.finished_at,
+    }
+
+
+def enqueue_document(
+    document_id: UUID,
+    lang: str = "en",
+    stage: str = JobStage.INGEST.value,
+) -> Dict[str, Any]:
+    with queue_session_scope() as db:
+        job = IngestionJobRepository(db).enqueue(
+            document_id,
+            stage,
+            payload={"lang": lang},
+            max_attempts=settings.JOB_MAX_ATTEMPTS,
+        )
+        return job_to_dict(job)
+
+
+def enqueue_documents(
+    document_ids: List[UUID],
+    lang: str = "en",
+    stage: str = JobStage.INGEST.value,
+) -> List[Dict[str, Any]]:
+    """
+    Enqueue several documents in one queue transaction (batch uploads).
+    """
+    if not document_ids:
+        return []
+    with queue_session_scope() as db:
+        jobs = IngestionJobRepository(db).enqueue_many(
+            document_ids,
+            stage,
+            payload={"lang": lang},
+            max_attempts=settings.JOB_MAX_ATTEMPTS,
+        )
+        return [job_to_dict(job) for job in jobs]
+
+
+def claim_job(stage: str, worker_id: str) -> Optional[ClaimedJob]:
+    with queue_session_scope() as db:
+        job = IngestionJobRepository(db).claim_next(
+            stage,
+            worker_id=worker_id,
+            visibility_timeout_seconds=settings.JOB_VISIBILITY_TIMEOUT_SECONDS,
+        )
+        if job is None:
+            return None
+        return ClaimedJob(
+            id=job.id,
+            document_id=job.document_id,
+            stage=job.stage,
+            attempts=job.attempts,
+            max_attempts=job.max_attempts,
+            payload=dict(job.payload or {}),
+        )
+
+
+def extend_job_lease(job_id: UUID, worker_id: str) -> bool:
+    with queue_session_scope() as db:
+        return IngestionJobRepository(db).extend_lease(
+            job_id,
+            worker_id=worker_id,
+            visibility_timeout_seconds=settings.JOB_VISIBILITY_TIMEOUT_SECONDS,
+        )
+
+
+def complete_job(job_id: UUID, worker_id: str) -> bool:
+    with queue_session_scope() as db:
+        return IngestionJobRepository(db).mark_succeeded(job_id, worker_id=worker_id)
+
+
+def retry_delay_seconds(attempts: int) -> float:
+    """
+    Exponential backoff with jitter: base * 2^(attempts-1), capped, scaled by [0.5, 1.0).
+    """
+    delay = settings.JOB_RETRY_BACKOFF_SECONDS * (2 ** max(attempts - 1, 0))
+    delay = min(delay, settings.JOB_RETRY_BACKOFF_MAX_SECONDS)
+    return delay * (0.5 + random.random() / 2)
+
+
+def fail_job(job: ClaimedJob, worker_id: str, error_message: str) -> bool:
+    """
+    Record a failed attempt. Returns True if the job has no attempts left.
+    """
+    with queue_session_scope() as db:
+        updated = IngestionJobRepository(db).mark_attempt_failed(
+            job.id,
+            worker_id=worker_id,
+            error_message=error_message,
+            retry_delay_seconds=retry_delay_seconds(job.attempts),
+        )
+        return updated is not None and updated.attempts >= updated.max_attempts
@@ -0,0 +1,281 @@
+# app/services/lexical_index.py
+
+from __future__ import annotations
+
+import heapq
+import math
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.db.session import session_scope
+from app.repositories.chunk_repository import ChunkRepository
+from app.utils.config import settings
+
+# Hiragana, Katakana, CJK ideographs (incl. extension A / compatibility), half-width Katakana
+_CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff66-\uff9f"
+# A CJK run, or a word that may be glued into an identifier by - _ . / : #  (e.g. "inv-2023-001")
+_TOKEN_RE = re.compile(rf"[{_CJK}]+|[^\W_{_CJK}]+(?:[-_./:#][^\W_{_CJK}]+)*")
+_PART_RE = re.compile(rf"[^\W_{_CJK}]+")
+_CJK_RE = re.compile(rf"[{_CJK}]")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """
+    Index / query terms for en, zh and ja text (segmented by script, so mixed text works):
+    - Latin / digits: lower-cased words; identifiers such as "INV-2023-001" produce the
+      whole identifier and each of its parts, so both exact codes and fragments match.
+    - Chinese / Japanese: overlapping character bigrams (a single character stays a unigram),
+      the usual dictionary-free segmentation for CJK retrieval.
+    """
+    normalized = unicodedata.normalize("NFKC", text or "").lower()
+    terms: List[str] = []
+    for m in _TOKEN_RE.finditer(normalized):
+        token = m.group()
+        if _CJK_RE.match(token):
+            if len(token) == 1:
+                terms.append(token)
+            else:
+                terms.extend(token[i:i + 2] for i in range(len(token) - 1))
+            continue
+        parts = _PART_RE.findall(token)
+        if len(parts) > 1:
+            terms.append(token)
+        terms.extend(parts)
+    return terms
+
+
+def _identifier_parts(text: Optional[str]) -> Dict[str, List[str]]:
+    # identifier -> its parts, e.g. {"inv-2023-001": ["inv", "2023", "001"]}
+    normalized = unicodedata.normalize("NFKC", text or "").lower()
+    identifiers: Dict[str, List[str]] = {}
+    for m in _TOKEN_RE.finditer(normalized):
+        parts = _PART_RE.findall(m.group())
+        if len(parts) > 1:
+            identifiers[m.group()] = parts
+    return identifiers
+
+
+class BM25Index:
+    """
+    In-memory inverted index with Okapi BM25 scoring over chunk text.
+
+    Postings are term -> {slot: term frequency}; each chunk occupies one integer slot.
+    Chunks can be added and removed individually, so the index is maintained incrementally
+    (per document) instead of being rebuilt.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._slot_by_chunk: Dict[str, int] = {}
+        self._chunk_ids: List[Optional[str]] = []
+        self._document_ids: List[Optional[str]] = []
+        self._terms: List[Tuple[str, ...]] = []
+        self._lengths: List[int] = []
+        self._free: List[int] = []
+        self._total_length = 0
+
+        self._chunks_by_document: Dict[str, Set[str]] = {}
+        # Per-document change marker of the rows last loaded from Postgres (see refresh_from_db).
+        self._signatures: Dict[str, Tuple[Any, ...]] = {}
+
+        self.queries = 0
+        self.query_seconds = 0.0
+
+    # -------------------------
+    # Maintenance
+    # -------------------------
+
+    def add_chunks(self, chunks: Iterable[Tuple[str, str, str]]) -> None:
+        """
+        chunks: (chunk_id, document_id, text). Re-adding a chunk id replaces it.
+        """
+        with self._lock:
+            for chunk_id, document_id, text in chunks:
+                chunk_id, document_id = str(chunk_id), str(document_id)
+                if chunk_id in self._slot_by_chunk:
+                    self._remove(chunk_id)
+
+                counts = Counter(tokenize(text))
+                if self._free:
+                    slot = self._free.pop()
+                else:
+                    slot = len(self._chunk_ids)
+                    self._chunk_ids.append(None)
+                    self._document_ids.append(None)
+                    self._terms.append(())
+                    self._lengths.append(0)
+
+                length = sum(counts.values())
+                self._chunk_ids[slot] = chunk_id
+                self._document_ids[slot] = document_id
+                self._terms[slot] = tuple(counts)
+                self._lengths[slot] = length
+                self._total_length += length
+                for term, tf in counts.items():
+                    self._postings.setdefault(term, {})[slot] = tf
+
+                self._slot_by_chunk[chunk_id] = slot
+                self._chunks_by_document.setdefault(document_id, set()).add(chunk_id)
+
+    def remove_chunks(self, chunk_ids: Iterable[str]) -> None:
+        with self._lock:
+            for chunk_id in chunk_ids:
+                self._remove(str(chunk_id))
+
+    def remove_document(self, document_id: str) -> None:
+        with self._lock:
+            for chunk_id in list(self._chunks_by_document.get(str(document_id), ())):
+                self._remove(chunk_id)
+            self._signatures.pop(str(document_id), None)
+
+    def replace_document(self, document_id: str, chunks: Iterable[Tuple[str, str]], signature: Tuple[Any, ...]) -> None:
+        """
+        chunks: (chunk_id, text) of every chunk the document has now.
+        """
+        document_id = str(document_id)
+        with self._lock:
+            self.remove_document(document_id)
+            self.add_chunks((chunk_id, document_id, text) for chunk_id, text in chunks)
+            self._signatures[document_id] = signature
+
+    def _remove(self, chunk_id: str) -> None:
+        slot = self._slot_by_chunk.pop(chunk_id, None)
+        if slot is None:
+            return
+        for term in self._terms[slot]:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(slot, None)
+                if not postings:
+                    del self._postings[term]
+
+        document_id = self._document_ids[slot]
+        siblings = self._chunks_by_document.get(document_id)
+        if siblings is not None:
+            siblings.discard(chunk_id)
+            if not siblings:
+                del self._chunks_by_document[document_id]
+
+        self._total_length -= self._lengths[slot]
+        self._chunk_ids[slot] = None
+        self._document_ids[slot] = None
+        self._terms[slot] = ()
+        self._lengths[slot] = 0
+        self._free.append(slot)
+
+    # -------------------------
+    # Query
+    # -------------------------
+
+    def search(self, query: str, top_k: int = 10, document_id: Optional[str] = None) -> List[Tuple[str, float]]:
+        """
+        Top-k (chunk_id, BM25 score), best first.
+        """
+        start = time.perf_counter()
+        terms = Counter(tokenize(query))
+        with self._lock:
+            # An identifier found as a whole is matched as a whole: its parts ("inv", "2023")
+            # would only add noise and walk long posting lists.
+            for identifier, parts in _identifier_parts(query).items():
+                if identifier in self._postings:
+                    terms.subtract(parts)
+            terms = +terms
+
+            n = len(self._slot_by_chunk)
+            if not terms or n == 0:
+                return []
+            avgdl = self._total_length / n if n else 1.0
+            doc_filter = str(document_id) if document_id else None
+
+            scores: Dict[int, float] = {}
+            for term, qtf in terms.items():
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                df = len(postings)
+                idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+                for slot, tf in postings.items():
+                    if doc_filter is not None and self._document_ids[slot] != doc_filter:
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[slot] / avgdl)
+                    scores[slot] = scores.get(slot, 0.0) + qtf * idf * tf * (self.k1 + 1) / (tf + norm)
+
+            best = heapq.nlargest(top_k, scores.items(), key=lambda x: x[1])
+            result = [(self._chunk_ids[slot], score) for slot, score in best]
+
+            self.queries += 1
+            self.query_seconds += time.perf_counter() - start
+        return result
+
+    # -------------------------
+    # Introspection
+    # -------------------------
+
+    def signature(self, document_id: str) -> Optional[Tuple[Any, ...]]:
+        with self._lock:
+            return self._signatures.get(str(document_id))
+
+    def document_ids(self) -> Set[str]:
+        with self._lock:
+            return set(self._chunks_by_document) | set(self._signatures)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "chunks": len(self._slot_by_chunk),
+                "documents": len(self._chunks_by_document),
+                "terms": len(self._postings),
+                "queries": self.queries,
+                "avg_query_ms": (self.query_seconds * 1000 / self.queries) if self.queries else 0.0,
+            }
+
+
+def refresh_from_db(index: BM25Index, signatures: Optional[Dict[Any, Tuple[Any, ...]]] = None) -> int:
+    """
+    Bring the index in line with the chunks table and return the number of reloaded documents.
+
+    Each document's signature (ChunkRepository.document_signatures) is compared with the one recorded
+    when it was last loaded; only documents that changed are re-read. On an empty index this
+    is a full rebuild. Ingestion usually runs in the worker process, so this is how the API
+    process picks up its inserts and deletions.
+    """
+    if signatures is None:
+        with session_scope() as db:
+            signatures = ChunkRepository(db).document_signatures()
+
+    current = {str(doc_id): doc_id for doc_id in signatures}
+    for document_id in index.document_ids() - set(current):
+        index.remove_document(document_id)
+
+    changed = [doc_id for doc_id, sig in signatures.items() if index.signature(str(doc_id)) != sig]
+    for document_id in changed:
+        with session_scope() as db:
+            rows = ChunkRepository(db).list_texts_by_document_id(document_id)
+        index.replace_document(str(document_id), ((str(cid), text) for cid, text in rows), signatures[document_id])
+    return len(changed)
+
+
+_INDEX: Optional[BM25Index] = None
+_INDEX_LOCK = threading.Lock()
+
+def get_lexical_index(create: bool = True) -> Optional[BM25Index]:
+    """
+    Process-wide BM25 index, or None when LEXICAL_INDEX_ENABLED is off
+    (or, with create=False, when this process has not built one).
+    """
+    global _INDEX
+    if not settings.LEXICAL_INDEX_ENABLED:
+        return None
+    if _INDEX is None and create:
+        with _INDEX_LOCK:
+            if _INDEX is None:
+                _INDEX = BM25Index(k1=settings.BM25_K1, b=settings.BM25_B)
+    return _INDEX
@@ -0,0 +1,350 @@
+# app/services/llm_client.py
+
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Protocol, runtime_checkable
+
+# Exception class names (google.api_core and HTTP clients) worth another attempt
+_RETRYABLE_ERRORS = {
+    "ResourceExhausted",
+    "TooManyRequests",
+    "ServiceUnavailable",
+    "InternalServerError",
+    "DeadlineExceeded",
+    "GatewayTimeout",
+    "BadGateway",
+    "Aborted",
+}
+
+
+class LLMTimeoutError(TimeoutError):
+    """A call (or the whole request, retries included) ran past its deadline."""
+
+
+class CircuitOpenError(RuntimeError):
+    """The circuit breaker is open: the backend failed repeatedly and is not called for now."""
+
+
+@runtime_checkable
+class LLMBackend(Protocol):
+    """
+    What AnswerService needs from a model: the Gemini LLMService, FakeLLMService, or an
+    LLMClient wrapping either. timeout is the per-call deadline in seconds, passed on to the
+    backend's own request timeout when it has one.
+    """
+
+    model_name: str
+    prompt_version: str
+
+    async def generate_answer(self, query: str, chunks: List[str], timeout: Optional[float] = None) -> str: ...
+
+    def stream_answer(self, query: str, chunks: List[str], timeout: Optional[float] = None) -> AsyncIterator[str]: ...
+
+
+def is_retryable(error: BaseException) -> bool:
+    return isinstance(error, (TimeoutError, ConnectionError)) or type(error).__name__ in _RETRYABLE_ERRORS
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure breaker: after failure_threshold failures in a row the circuit opens
+    and calls are rejected for reset_seconds; then one trial call is let through (half-open)
+    and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.failure_threshold = max(int(failure_threshold), 1)
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_running = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_running:
+            self._trial_running = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._trial_running or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+        self._trial_running = False
+
+    def abandon(self) -> None:
+        # A call that ended without an outcome (cancelled) frees the half-open trial slot.
+        self._trial_running = False
+
+
+class LLMClient:
+    """
+    Resilience layer in front of an LLMBackend, with the same interface:
+
+    - at most max_concurrency calls in flight (asyncio semaphore; waiting counts against
+      the deadline), on top of the backend's own bounded executor
+    - timeout_seconds per attempt and deadline_seconds for the whole call, retries included
+    - retries of transient errors (timeouts, 429 / 5xx) with full-jitter exponential backoff
+    - optional hedging: when an attempt has not finished after the hedge_quantile latency of
+      recent calls, a second identical request is sent if a concurrency slot is free, and
+      whichever answers first wins (the other is cancelled)
+    - a circuit breaker that fails fast (CircuitOpenError) while the backend keeps failing
+
+    Streams are retried only until their first piece arrives, and are never hedged.
+    """
+
+    def __init__(
+        self,
+        backend: LLMBackend,
+        *,
+        max_concurrency: int = 8,
+        timeout_seconds: float = 30.0,
+        deadline_seconds: float = 60.0,
+        max_retries: int = 2,
+        retry_base_seconds: float = 0.5,
+        retry_max_seconds: float = 8.0,
+        hedge: bool = False,
+        hedge_quantile: float = 0.95,
+        hedge_min_samples: int = 20,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.backend = backend
+        self.max_concurrency = max(int(max_concurrency), 1)
+        self.timeout_seconds = timeout_seconds
+        self.deadline_seconds = deadline_seconds
+        self.max_retries = max(int(max_retries), 0)
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = max(int(hedge_min_samples), 1)
+        self.breaker = breaker or CircuitBreaker()
+
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._latencies: Deque[float] = deque(maxlen=500)
+
+        # metrics
+        self.calls = 0
+        self.in_flight = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.failures = 0
+        self.rejected = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    @property
+    def model_name(self) -> str:
+        return self.backend.model_name
+
+    @property
+    def prompt_version(self) -> str:
+        return self.backend.prompt_version
+
+    # -------------------------
+    # Interface
+    # -------------------------
+
+    async def generate_answer(self, query: str, chunks: List[str], timeout: Optional[float] = None) -> str:
+        """
+        Answer text; raises LLMTimeoutError, CircuitOpenError or the backend's last error.
+        """
+        self.calls += 1
+        deadline = time.monotonic() + (timeout if timeout is not None else self.deadline_seconds)
+        attempt = 0
+        while True:
+            self._check_breaker()
+            try:
+                answer = await self._hedged(query, chunks, deadline)
+            except asyncio.CancelledError:
+                self.breaker.abandon()
+                raise
+            except Exception as e:
+                self._record_failure(e)
+                if not self._should_retry(e, attempt, deadline):
+                    raise
+                attempt += 1
+                await self._backoff(attempt, deadline)
+                continue
+            self.breaker.record_success()
+            return answer
+
+    async def stream_answer(self, query: str, chunks: List[str], timeout: Optional[float] = None) -> AsyncIterator[str]:
+        self.calls += 1
+        deadline = time.monotonic() + (timeout if timeout is not None else self.deadline_seconds)
+        attempt = 0
+        while True:
+            self._check_breaker()
+            semaphore = self._get_semaphore()
+            try:
+                await asyncio.wait_for(semaphore.acquire(), timeout=self._remaining(deadline))
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise LLMTimeoutError("Timed out waiting for an LLM slot")
+            self.in_flight += 1
+            started = time.monotonic()
+            pieces = self.backend.stream_answer(query, chunks, timeout=self._attempt_timeout(deadline))
+            first = True
+            try:
+                while True:
+                    try:
+                        piece = await asyncio.wait_for(pieces.__anext__(), timeout=self._attempt_timeout(deadline))
+                    except StopAsyncIteration:
+                        break
+                    except asyncio.TimeoutError:
+                        self.timeouts += 1
+                        raise LLMTimeoutError("LLM stream stalled past its deadline")
+                    if first:
+                        self._latencies.append(time.monotonic() - started)
+                        first = False
+                    yield piece
+            except Exception as e:
+                self._record_failure(e)
+                # Pieces already sent cannot be taken back: only a stream that produced nothing is retried.
+                if not first or not self._should_retry(e, attempt, deadline):
+                    raise
+                attempt += 1
+            else:
+                self.breaker.record_success()
+                return
+            finally:
+                await pieces.aclose()
+                self.in_flight -= 1
+                semaphore.release()
+                self.breaker.abandon()
+            await self._backoff(attempt, deadline)
+
+    # -------------------------
+    # Internals
+    # -------------------------
+
+    async def _hedged(self, query: str, chunks: List[str], deadline: float) -> str:
+        primary = asyncio.ensure_future(self._call(query, chunks, deadline))
+        delay = self._hedge_delay()
+        hedge: Optional[asyncio.Future] = None
+        try:
+            if delay is None or delay >= self._remaining(deadline):
+                return await primary
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done:
+                return primary.result()
+            if self._get_semaphore().locked():
+                # No spare capacity: a hedge would only queue behind other callers.
+                return await primary
+            self.hedges += 1
+            hedge = asyncio.ensure_future(self._call(query, chunks, deadline))
+            pending = {primary, hedge}
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in (primary, hedge):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    async def _call(self, query: str, chunks: List[str], deadline: float) -> str:
+        semaphore = self._get_semaphore()
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=self._remaining(deadline))
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise LLMTimeoutError("Timed out waiting for an LLM slot")
+        self.in_flight += 1
+        started = time.monotonic()
+        try:
+            timeout = self._attempt_timeout(deadline)
+            answer = await asyncio.wait_for(self.backend.generate_answer(query, chunks, timeout=timeout), timeout=timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise LLMTimeoutError(f"LLM call exceeded {timeout:.1f}s")
+        finally:
+            self.in_flight -= 1
+            semaphore.release()
+        self._latencies.append(time.monotonic() - started)
+        return answer
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def _check_breaker(self) -> None:
+        if not self.breaker.allow():
+            self.rejected += 1
+            raise CircuitOpenError("LLM circuit breaker is open")
+
+    def _record_failure(self, error: Exception) -> None:
+        self.failures += 1
+        # Only failures that say something about the backend's health trip the breaker.
+        if is_retryable(error):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    def _should_retry(self, error: Exception, attempt: int, deadline: float) -> bool:
+        return is_retryable(error) and attempt < self.max_retries and self._remaining(deadline) > 0
+
+    async def _backoff(self, attempt: int, deadline: float) -> None:
+        self.retries += 1
+        # Full jitter: spreads the retries of callers that failed together.
+        delay = random.uniform(0, min(self.retry_max_seconds, self.retry_base_seconds * 2 ** (attempt - 1)))
+        await asyncio.sleep(min(delay, self._remaining(deadline)))
+
+    def _remaining(self, deadline: float) -> float:
+        return max(deadline - time.monotonic(), 0.0)
+
+    def _attempt_timeout(self, deadline: float) -> float:
+        return max(min(self.timeout_seconds, self._remaining(deadline)), 0.001)
+
+    def _hedge_delay(self) -> Optional[float]:
+        if not self.hedge or len(self._latencies) < self.hedge_min_samples:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(int(len(ordered) * self.hedge_quantile), len(ordered) - 1)]
+
+    def stats(self) -> Dict[str, Any]:
+        ordered = sorted(self._latencies)
+        return {
+            "model": self.model_name,
+            "calls": self.calls,
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "retries": self.retries,
+            "timeouts": self.timeouts,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "hedge_delay_seconds": self._hedge_delay(),
+            "p50_seconds": ordered[len(ordered) // 2] if ordered else None,
+            "breaker": self.breaker.state,
+        }
@@ -1,31 +1,29 @@
 import google.generativeai as genai
-from typing import List
+from typing import AsyncIterator, List, Optional
 import asyncio
+import logging
+import random
+import threading
+from app.services.llm_client import CircuitBreaker, LLMBackend, LLMClient
 from app.utils.config import settings
+from app.utils.executors import get_executor
 
-class LLMService:
-    def __init__(self):
-        api_key = settings.GEMINI_API_KEY
-        if not api_key:
-            raise ValueError("GEMINI_API_KEY not found in settings")
-        
-        genai.configure(api_key=api_key)
-        # model
-        self.model = genai.GenerativeModel('gemini-2.5-flash')
+# Bump whenever build_prompt changes: cached answers are keyed by it.
+PROMPT_VERSION = "1"
 
-    async def get_answer(self, query: str, chunks: List[str]) -> str:
-        """
-        Combine retrieved chunks and query, then send to Gemini for an answer.
-        Uses asyncio.to_thread to prevent blocking the event loop.
-        """
-        if not chunks:
-            return "No relevant context found in the document."
+logger = logging.getLogger(__name__)
 
-        # Context
-        context = "\n\n".join([f"Context Piece {i+1}: {text}" for i, text in enumerate(chunks)])
-        
-        # Prompt
-        prompt = f"""
+
+class EmptyResponseError(RuntimeError):
+    """The model returned no usable text (empty, or blocked by its safety filters)."""
+
+
+def build_prompt(query: str, chunks: List[str]) -> str:
+    # Context
+    context = "\n\n".join([f"Context Piece {i+1}: {text}" for i, text in enumerate(chunks)])
+    
+    # Prompt
+    prompt = f"""
                 You are an expert document analysis assistant. 
                 Your task is to answer the user's question using the provided context.
 
@@ -43,14 +41,192 @@ class LLMService:
                 5. Answer in the same language as the user's question (e.g., if asked in Chinese, answer in Chinese).
                 6. Do not use your pre-trained external knowledge; strictly stick to what is provided above.
                 """
+    return prompt
+
+class LLMService:
+    prompt_version = PROMPT_VERSION
+
+    def __init__(self, model_name: Optional[str] = None):
+        api_key = settings.GEMINI_API_KEY
+        if not api_key:
+            raise ValueError("GEMINI_API_KEY not found in settings")
+        
+        genai.configure(api_key=api_key)
+        # model
+        self.model_name = model_name or settings.GEMINI_MODEL
+        self.model = genai.GenerativeModel(self.model_name)
+
+    async def get_answer(self, query: str, chunks: List[str]) -> str:
+        """
+        Combine retrieved chunks and query, then send to Gemini for an answer.
+        The blocking call runs on the bounded "llm" executor, not the event loop.
+        Errors are logged and raised; the API layer maps them to an HTTP status.
+        """
+        if not chunks:
+            return "No relevant context found in the document."
+
+        try:
+            return await self.generate_answer(query, chunks)
+        except Exception:
+            logger.exception("Gemini API error")
+            raise
+
+    async def generate_answer(self, query: str, chunks: List[str], timeout: Optional[float] = None) -> str:
+        """
+        Like get_answer, without the empty-context shortcut and the error log (the
+        client layer and the answer cache call this and handle errors themselves).
+        timeout also bounds the HTTP request, so an abandoned call frees its thread.
+        """
+        prompt = build_prompt(query, chunks)
+        loop = asyncio.get_running_loop()
+        response = await loop.run_in_executor(
+            get_executor("llm"),
+            lambda: self.model.generate_content(prompt, **self._request_options(timeout)),
+        )
 
         try:
-            response = await asyncio.to_thread(self.model.generate_content, prompt)
-            
-            if response and response.text:
-                return response.text
-            return "The model was unable to generate a valid response."
-            
-        except Exception as e:
-            print(f"Gemini API Error: {str(e)}")
-            return "An error occurred while generating the answer. Please try again later."
\ No newline at end of file
+            text = response.text if response else ""
+        except ValueError as e:
+            # .text raises when the candidate was blocked and has no parts.
+            raise EmptyResponseError(f"The model was unable to generate a valid response: {e}") from e
+        if not text:
+            raise EmptyResponseError("The model was unable to generate a valid response.")
+        return text
+
+    async def stream_answer(self, query: str, chunks: List[str], timeout: Optional[float] = None) -> AsyncIterator[str]:
+        """
+        Answer text pieces as Gemini produces them (generate_content(stream=True)).
+        The blocking response iterator is drained on an "llm" executor thread; closing this generator
+        (e.g. the client disconnected) stops the thread after the piece it is waiting on.
+        Errors are raised, like generate_answer.
+        """
+        prompt = build_prompt(query, chunks)
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+        done = object()
+
+        def produce():
+            try:
+                for piece in self.model.generate_content(prompt, stream=True, **self._request_options(timeout)):
+                    if stop.is_set():
+                        break
+                    text = getattr(piece, "text", "")
+                    if text:
+                        loop.call_soon_threadsafe(queue.put_nowait, text)
+                loop.call_soon_threadsafe(queue.put_nowait, done)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+
+        producer = loop.run_in_executor(get_executor("llm"), produce)
+        try:
+            while True:
+                item = await queue.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            producer.cancel()
+
+    @staticmethod
+    def _request_options(timeout: Optional[float]) -> dict:
+        return {"request_options": {"timeout": timeout}} if timeout else {}
+
+
+class FakeBackendError(ConnectionError):
+    """Injected failure of FakeLLMService; transient, like a dropped connection or a 503."""
+
+
+class FakeLLMService(LLMService):
+    """
+    Local stand-in for Gemini (LLM_BACKEND="fake"): deterministic answers, optional
+    latency, call counting. Used for tests and load runs without an API key.
+
+    failure_rate makes that share of calls fail with a retryable error; slow_rate makes
+    that share take slow_factor times the delay (a latency tail for hedging to cut).
+    """
+
+    def __init__(
+        self,
+        model_name: str = "fake-llm",
+        delay_seconds: float = 0.0,
+        failure_rate: float = 0.0,
+        slow_rate: float = 0.0,
+        slow_factor: float = 10.0,
+        seed: Optional[int] = None,
+    ):
+        self.model_name = model_name
+        self.delay_seconds = delay_seconds
+        self.failure_rate = failure_rate
+        self.slow_rate = slow_rate
+        self.slow_factor = slow_factor
+        self._random = random.Random(seed)
+        self.calls = 0
+
+    async def generate_answer(self, query: str, chunks: List[str], timeout: Optional[float] = None) -> str:
+        self.calls += 1
+        delay = self._delay()
+        if delay:
+            await asyncio.sleep(delay)
+        self._maybe_fail()
+        return self._fake_text(query, chunks)
+
+    def _delay(self) -> float:
+        if self.slow_rate and self._random.random() < self.slow_rate:
+            return self.delay_seconds * self.slow_factor
+        return self.delay_seconds
+
+    def _maybe_fail(self) -> None:
+        if self.failure_rate and self._random.random() < self.failure_rate:
+            raise FakeBackendError("ServiceUnavailable: injected fake LLM failure")
+
+    def _fake_text(self, query: str, chunks: List[str]) -> str:
+        return f"[{self.model_name}] answer to {query!r} from {len(chunks)} context pieces"
+
+    async def stream_answer(self, query: str, chunks: List[str], timeout: Optional[float] = None) -> AsyncIterator[str]:
+        self.calls += 1
+        words = self._fake_text(query, chunks).split(" ")
+        delay = self._delay()
+        self._maybe_fail()
+        for i, word in enumerate(words):
+            if delay:
+                await asyncio.sleep(delay / len(words))
+            yield word if i == 0 else " " + word
+
+
+def get_llm_backend() -> LLMBackend:
+    if settings.LLM_BACKEND == "fake":
+        return FakeLLMService(
+            delay_seconds=settings.FAKE_LLM_DELAY_SECONDS,
+            failure_rate=settings.FAKE_LLM_FAILURE_RATE,
+            slow_rate=settings.FAKE_LLM_SLOW_RATE,
+        )
+    if settings.LLM_BACKEND == "gemini":
+        return LLMService()
+    raise ValueError(f"Unknown LLM_BACKEND: {settings.LLM_BACKEND}")
+
+
+def get_llm_service() -> LLMClient:
+    """
+    The configured backend (LLM_BACKEND) behind the client layer: concurrency limit,
+    deadlines, retries, optional hedging and a circuit breaker (LLM_* settings).
+    """
+    return LLMClient(
+        get_llm_backend(),
+        max_concurrency=settings.LLM_MAX_CONCURRENCY,
+        timeout_seconds=settings.LLM_TIMEOUT_SECONDS,
+        deadline_seconds=settings.LLM_DEADLINE_SECONDS,
+        max_retries=settings.LLM_MAX_RETRIES,
+        retry_base_seconds=settings.LLM_RETRY_BASE_SECONDS,
+        retry_max_seconds=settings.LLM_RETRY_MAX_SECONDS,
+        hedge=settings.LLM_HEDGE_ENABLED,
+        hedge_quantile=settings.LLM_HEDGE_QUANTILE,
+        hedge_min_samples=settings.LLM_HEDGE_MIN_SAMPLES,
+        breaker=CircuitBreaker(
+            failure_threshold=settings.LLM_BREAKER_FAILURES,
+            reset_seconds=settings.LLM_BREAKER_RESET_SECONDS,
+        ),
+    )
\ No newline at end of file
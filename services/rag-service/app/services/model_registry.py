@@ -0,0 +1,213 @@
+# app/services/model_registry.py
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+import numpy as np
+from transformers import AutoTokenizer, PreTrainedTokenizerBase
+
+from app.services.embedding_batcher import EmbeddingBatcher
+from app.services.embedding_cache import CachedEmbeddingService
+from app.services.embedding_service import EmbeddingService
+from app.services.ocr_pool import get_ocr_pool
+from app.services.ocr_service import get_ocr_engine
+from app.services.reranker import CrossEncoderReranker
+from app.utils.config import settings
+from app.vectorstore.base import VectorRepository
+from app.vectorstore.chroma_repo import ChromaVectorRepository
+from app.vectorstore.mmap_repo import MmapVectorRepository
+from app.vectorstore.partition_router import PartitionedVectorRepository
+
+DEFAULT_COLLECTION = "rag_chunks"
+
+
+class ModelRegistry:
+    """
+    Process-wide owner of heavy, reusable resources: embedding model, tokenizer,
+    OCR engines and the vector index.
+
+    Everything is loaded once (lazily, or eagerly through warm_up) and shared by the
+    API handlers and the ingestion pipelines of this process.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._embedder: Optional[EmbeddingService] = None
+        self._cached_embedder: Optional[CachedEmbeddingService] = None
+        self._embedding_batcher: Optional[EmbeddingBatcher] = None
+        self._tokenizer: Optional[PreTrainedTokenizerBase] = None
+        self._reranker: Optional[CrossEncoderReranker] = None
+        self._vector_repos: Dict[str, VectorRepository] = {}
+        self._partitioned_repo: Optional[PartitionedVectorRepository] = None
+
+        self._ready = False
+        self._warmup_seconds: Dict[str, float] = {}
+        self._warmup_error: Optional[str] = None
+
+    # -------------------------
+    # Accessors
+    # -------------------------
+
+    def get_embedder(self, cached: bool = False) -> EmbeddingService:
+        """
+        Shared embedding service. cached=True puts the persistent embedding cache in front
+        of the model (used for chunk ingestion); both share the same loaded model.
+        """
+        with self._lock:
+            if self._embedder is None:
+                self._embedder = EmbeddingService(
+                    model_name=settings.LLM_MODEL_DEV,
+                    normalize=True,
+                    batch_size=32,
+                    device=None,
+                )
+            if not cached:
+                return self._embedder
+            if self._cached_embedder is None:
+                self._cached_embedder = CachedEmbeddingService(
+                    model_name=self._embedder.model_name,
+                    normalize=self._embedder.normalize,
+                    batch_size=self._embedder.batch_size,
+                    device=self._embedder.device,
+                )
+                self._cached_embedder._model = self._embedder._get_model()
+            return self._cached_embedder
+
+    def get_embedding_batcher(self) -> EmbeddingBatcher:
+        """
+        Micro-batching front end of the shared embedder for concurrent query embeddings.
+        """
+        with self._lock:
+            if self._embedding_batcher is None:
+                self._embedding_batcher = EmbeddingBatcher(
+                    self.get_embedder(),
+                    max_batch_size=settings.EMBED_BATCH_MAX_SIZE,
+                    max_wait_ms=settings.EMBED_BATCH_MAX_WAIT_MS,
+                )
+            return self._embedding_batcher
+
+    def get_reranker(self) -> CrossEncoderReranker:
+        """
+        Cross-encoder for the optional rerank stage of search (model loaded on first use).
+        """
+        with self._lock:
+            if self._reranker is None:
+                self._reranker = CrossEncoderReranker(
+                    model_name=settings.RERANK_MODEL,
+                    batch_size=settings.RERANK_BATCH_SIZE,
+                    cache_entries=settings.RERANK_CACHE_MAX_ENTRIES,
+                )
+            return self._reranker
+
+    def get_tokenizer(self) -> PreTrainedTokenizerBase:
+        with self._lock:
+            if self._tokenizer is None:
+                self._tokenizer = AutoTokenizer.from_pretrained(settings.LLM_MODEL_DEV)
+            return self._tokenizer
+
+    def get_ocr_engine(self, lang: str = "en") -> Any:
+        # Engines are cached per language by ocr_service.
+        return get_ocr_engine(lang)
+
+    def get_vector_repo(self, collection_name: str = DEFAULT_COLLECTION) -> VectorRepository:
+        """
+        Vector index for a collection, backed by VECTOR_BACKEND ("chroma" or "mmap").
+        With VECTOR_PARTITIONING the default collection is a PartitionedVectorRepository
+        routing to per-user / per-document collections of the same backend.
+        """
+        with self._lock:
+            if collection_name == DEFAULT_COLLECTION and settings.VECTOR_PARTITIONING:
+                if self._partitioned_repo is None:
+                    self._partitioned_repo = PartitionedVectorRepository(
+                        repo_for=self._collection_repo,
+                        persist_dir=settings.VECTOR_DB_URL,
+                        base_collection=DEFAULT_COLLECTION,
+                        store_documents=settings.VECTOR_STORE_DOCUMENTS,
+                    )
+                return self._partitioned_repo
+            return self._collection_repo(collection_name)
+
+    def _collection_repo(self, collection_name: str) -> VectorRepository:
+        with self._lock:
+            repo = self._vector_repos.get(collection_name)
+            if repo is None:
+                if settings.VECTOR_BACKEND == "mmap":
+                    repo = MmapVectorRepository(
+                        persist_dir=settings.VECTOR_DB_URL,
+                        collection_name=collection_name,
+                        store_documents=settings.VECTOR_STORE_DOCUMENTS,
+                        dtype=settings.VECTOR_MMAP_DTYPE,
+                        rescore_multiplier=settings.VECTOR_RESCORE_MULTIPLIER,
+                    )
+                elif settings.VECTOR_BACKEND == "chroma":
+                    repo = ChromaVectorRepository(
+                        persist_dir=settings.VECTOR_DB_URL,
+                        collection_name=collection_name,
+                        store_documents=settings.VECTOR_STORE_DOCUMENTS,
+                    )
+                else:
+                    raise ValueError(f"Unknown VECTOR_BACKEND: {settings.VECTOR_BACKEND}")
+                self._vector_repos[collection_name] = repo
+            return repo
+
+    # -------------------------
+    # Warm-up / readiness
+    # -------------------------
+
+    def warm_up(self, *, ocr_langs: Iterable[str] = ()) -> None:
+        """
+        Load every resource and run one dummy inference through each, so the first real
+        request pays neither model loading nor lazy allocation / JIT costs.
+        """
+        try:
+            self._timed("tokenizer", lambda: self.get_tokenizer().encode("warm up"))
+            self._timed("embedder", lambda: self.get_embedder().embed_texts(["warm up"] * 2))
+            self._timed("vector_repo", lambda: self.get_vector_repo().count())
+            if settings.RERANK_ENABLED:
+                self._timed("reranker", lambda: self.get_reranker()._get_model().predict([("warm up", "warm up")]))
+
+            langs = list(ocr_langs)
+            if langs:
+                pool = get_ocr_pool()
+                if pool is not None:
+                    self._timed("ocr_pool", lambda: pool.warm_up())
+                else:
+                    blank = np.full((64, 64, 3), 255, dtype=np.uint8)
+                    for lang in langs:
+                        self._timed(f"ocr_{lang}", lambda lang=lang: self.get_ocr_engine(lang).ocr(blank))
+
+            self._ready = True
+        except Exception as e:
+            self._warmup_error = str(e)
+            raise
+
+    def _timed(self, name: str, fn) -> None:
+        start = time.perf_counter()
+        fn()
+        self._warmup_seconds[name] = round(time.perf_counter() - start, 3)
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    def readiness(self) -> Dict[str, Any]:
+        return {
+            "ready": self._ready,
+            "warmup_seconds": dict(self._warmup_seconds),
+            "error": self._warmup_error,
+        }
+
+    async def close(self) -> None:
+        """
+        Stop the embedding batcher if one was started; nothing is created at shutdown.
+        """
+        with self._lock:
+            batcher, self._embedding_batcher = self._embedding_batcher, None
+        if batcher is not None:
+            await batcher.close()
+
+
+registry = ModelRegistry()
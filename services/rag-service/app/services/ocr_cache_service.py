@@ -0,0 +1,84 @@
+# app/services/ocr_cache_service.py
+from __future__ import annotations
+
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set
+
+from app.db.session import session_scope
+from app.repositories.ocr_page_cache_repository import OCRPageCacheRepository
+from app.services.ocr_pool import PageRange, PageResult, iter_ocr_pages_sharded
+from app.services.ocr_service import get_ocr_engine_version, get_page_count
+from app.utils.config import settings
+
+
+def _missing_ranges(page_count: int, cached: Set[int]) -> List[PageRange]:
+    # Collapse missing pages into contiguous (first, last) ranges.
+    ranges: List[PageRange] = []
+    start: Optional[int] = None
+    for page_no in range(1, page_count + 1):
+        if page_no in cached:
+            if start is not None:
+                ranges.append((start, page_no - 1))
+                start = None
+        elif start is None:
+            start = page_no
+    if start is not None:
+        ranges.append((start, page_count))
+    return ranges
+
+
+def iter_ocr_pages_cached(
+    file_path: str,
+    content_hash: Optional[str],
+    lang: str = "en",
+) -> Iterator[PageResult]:
+    """
+    iter_ocr_pages_sharded behind the content-addressed OCR cache.
+
+    Cached pages are read back one at a time; only missing pages are OCR'd, and each one
+    is written to the cache as soon as it is produced, so an interrupted document resumes
+    from where it stopped.
+    """
+    if not settings.OCR_CACHE_ENABLED or not content_hash:
+        yield from iter_ocr_pages_sharded(file_path, lang=lang)
+        return
+
+    engine_version = get_ocr_engine_version()
+    page_count = get_page_count(file_path)
+
+    with session_scope() as db:
+        repo = OCRPageCacheRepository(db)
+        cached = repo.list_cached_pages(content_hash, lang, engine_version)
+        if cached:
+            repo.touch(content_hash, lang, engine_version)
+
+    missing = _missing_ranges(page_count, cached)
+    fresh = iter_ocr_pages_sharded(file_path, lang=lang, page_ranges=missing) if missing else iter([])
+
+    for page_no in range(1, page_count + 1):
+        if page_no in cached:
+            with session_scope() as db:
+                lines = OCRPageCacheRepository(db).get_page(content_hash, lang, engine_version, page_no)
+            yield page_no, lines or []
+            continue
+
+        produced = next(fresh, None)
+        if produced is None:
+            break
+        fresh_page_no, lines = produced
+        with session_scope() as db:
+            OCRPageCacheRepository(db).put_page(content_hash, lang, engine_version, fresh_page_no, lines)
+        yield fresh_page_no, lines
+
+    if missing:
+        evict_ocr_cache()
+
+
+def run_ocr_cached(file_path: str, content_hash: Optional[str], lang: str = "en") -> List[Dict[str, Any]]:
+    return [line for _, lines in iter_ocr_pages_cached(file_path, content_hash, lang=lang) for line in lines]
+
+
+def evict_ocr_cache(max_bytes: Optional[int] = None) -> int:
+    with session_scope() as db:
+        return OCRPageCacheRepository(db).evict_to_size(
+            settings.OCR_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        )
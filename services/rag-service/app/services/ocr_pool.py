@@ -0,0 +1,306 @@
+# app/services/ocr_pool.py
+from __future__ import annotations
+
+import atexit
+import multiprocessing
+import threading
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.constants.status import OCRStatus
+from app.services.ocr_service import get_ocr_engine, get_page_count, iter_ocr_pages, run_ocr
+from app.utils.config import settings
+
+PageResult = Tuple[int, List[Dict[str, Any]]]
+PageRange = Tuple[int, int]  # 1-based, inclusive
+
+
+# -------------------------
+# Worker process side
+# -------------------------
+
+def _init_worker(langs: Sequence[str]) -> None:
+    # Warm the engines once per process so shards never pay model load time.
+    for lang in langs:
+        get_ocr_engine(lang)
+
+def _warm_worker(lang: str) -> None:
+    get_ocr_engine(lang).ocr(np.full((64, 64, 3), 255, dtype=np.uint8))
+
+def _ocr_shard(file_path: str, lang: str, first_page: int, last_page: int) -> List[PageResult]:
+    return list(iter_ocr_pages(file_path, lang=lang, first_page=first_page, last_page=last_page))
+
+
+# -------------------------
+# Parent process side
+# -------------------------
+
+def split_page_ranges(
+    page_count: int,
+    shard_size: int,
+    page_ranges: Optional[Sequence[PageRange]] = None,
+) -> List[PageRange]:
+    """
+    Split the requested (or all) pages into shards of at most shard_size pages, in page order.
+    """
+    ranges = page_ranges or [(1, page_count)]
+    shards: List[PageRange] = []
+    for first, last in ranges:
+        first = max(int(first), 1)
+        last = min(int(last), page_count)
+        for start in range(first, last + 1, shard_size):
+            shards.append((start, min(start + shard_size - 1, last)))
+    return shards
+
+
+class OCRPool:
+    """
+    Page-sharded OCR across worker processes.
+
+    PDFs are split into page ranges (PyMuPDF), each range is OCR'd by a process holding
+    its own warmed PaddleOCR engine, and results are merged back in page order.
+    """
+
+    def __init__(self, workers: int, pages_per_shard: int, warm_langs: Sequence[str] = ("en",)):
+        self.workers = max(int(workers), 1)
+        self.pages_per_shard = max(int(pages_per_shard), 1)
+        self.warm_langs = tuple(warm_langs)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    # spawn: Paddle is not fork-safe once initialized in the parent.
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=_init_worker,
+                        initargs=(self.warm_langs,),
+                    )
+        return self._executor
+
+    def _shards(self, file_path: str, page_ranges: Optional[Sequence[PageRange]]) -> List[PageRange]:
+        page_count = get_page_count(file_path)
+        # Small documents: spread pages over all workers instead of filling one shard.
+        requested = sum(last - first + 1 for first, last in page_ranges) if page_ranges else page_count
+        shard_size = min(self.pages_per_shard, max(-(-requested // self.workers), 1))
+        return split_page_ranges(page_count, shard_size, page_ranges)
+
+    def submit(
+        self,
+        file_path: str,
+        lang: str = "en",
+        page_ranges: Optional[Sequence[PageRange]] = None,
+    ) -> List["Future[List[PageResult]]"]:
+        """
+        Submit every shard at once. Futures are returned in page order.
+        """
+        executor = self._get_executor()
+        return [
+            executor.submit(_ocr_shard, file_path, lang, first, last)
+            for first, last in self._shards(file_path, page_ranges)
+        ]
+
+    def iter_pages(
+        self,
+        file_path: str,
+        lang: str = "en",
+        page_ranges: Optional[Sequence[PageRange]] = None,
+    ) -> Iterator[PageResult]:
+        """
+        Yield pages in order while keeping at most 2 shards per worker in flight,
+        so memory stays bounded for streaming consumers.
+        """
+        executor = self._get_executor()
+        pending = deque(self._shards(file_path, page_ranges))
+        in_flight: Deque["Future[List[PageResult]]"] = deque()
+        try:
+            while pending or in_flight:
+                while pending and len(in_flight) < self.workers * 2:
+                    first, last = pending.popleft()
+                    in_flight.append(executor.submit(_ocr_shard, file_path, lang, first, last))
+                for page in in_flight.popleft().result():
+                    yield page
+        finally:
+            for f in in_flight:
+                f.cancel()
+
+    def run(
+        self,
+        file_path: str,
+        lang: str = "en",
+        page_ranges: Optional[Sequence[PageRange]] = None,
+    ) -> List[Dict[str, Any]]:
+        return merge_shards([f.result() for f in self.submit(file_path, lang, page_ranges)])
+
+    def warm_up(self) -> None:
+        """
+        Start every worker process and run one dummy inference per process and language.
+        """
+        executor = self._get_executor()
+        futures = [
+            executor.submit(_warm_worker, lang)
+            for _ in range(self.workers)
+            for lang in self.warm_langs
+        ]
+        for f in futures:
+            f.result()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+def merge_shards(shards: Sequence[List[PageResult]]) -> List[Dict[str, Any]]:
+    lines: List[Dict[str, Any]] = []
+    for pages in shards:
+        for _, page_lines in pages:
+            lines.extend(page_lines)
+    return lines
+
+
+_POOLS: Dict[str, OCRPool] = {}
+_POOL_LOCK = threading.Lock()
+
+def _pool(name: str, workers: int) -> Optional[OCRPool]:
+    if workers <= 0:
+        return None
+    if name not in _POOLS:
+        with _POOL_LOCK:
+            if name not in _POOLS:
+                pool = OCRPool(workers, settings.OCR_POOL_PAGES_PER_SHARD, warm_langs=settings.WARMUP_OCR_LANGS)
+                atexit.register(pool.shutdown)
+                _POOLS[name] = pool
+    return _POOLS[name]
+
+def get_ocr_pool() -> Optional[OCRPool]:
+    """
+    Process-wide pool used by ingestion, or None when OCR_POOL_WORKERS is 0.
+    """
+    return _pool("ingest", settings.OCR_POOL_WORKERS)
+
+def get_api_ocr_pool() -> Optional[OCRPool]:
+    """
+    Pool behind the /ocr endpoint, or None when OCR_API_POOL_WORKERS is 0 (the default).
+    Its processes only start with the first job.
+    """
+    return _pool("api", settings.OCR_API_POOL_WORKERS)
+
+def _use_pool(file_path: str) -> Optional[OCRPool]:
+    # Images are a single page; sharding only pays off for PDFs.
+    return get_ocr_pool() if file_path.lower().endswith(".pdf") else None
+
+def run_ocr_sharded(
+    file_path: str,
+    lang: str = "en",
+    page_ranges: Optional[Sequence[PageRange]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Drop-in replacement for run_ocr that fans pages out to the OCR pool when enabled.
+    """
+    pool = _use_pool(file_path)
+    if pool is None:
+        if page_ranges:
+            return merge_shards([
+                list(iter_ocr_pages(file_path, lang=lang, first_page=first, last_page=last))
+                for first, last in page_ranges
+            ])
+        return run_ocr(file_path, lang=lang)
+    return pool.run(file_path, lang=lang, page_ranges=page_ranges)
+
+def iter_ocr_pages_sharded(
+    file_path: str,
+    lang: str = "en",
+    page_ranges: Optional[Sequence[PageRange]] = None,
+) -> Iterator[PageResult]:
+    """
+    Drop-in replacement for iter_ocr_pages that fans pages out to the OCR pool when enabled.
+    """
+    pool = _use_pool(file_path)
+    if pool is not None:
+        return pool.iter_pages(file_path, lang=lang, page_ranges=page_ranges)
+    if page_ranges:
+        return (
+            page
+            for first, last in page_ranges
+            for page in iter_ocr_pages(file_path, lang=lang, first_page=first, last_page=last)
+        )
+    return iter_ocr_pages(file_path, lang=lang)
+
+
+# -------------------------
+# OCR job handles (used by the /ocr endpoint)
+# -------------------------
+
+class OCRJob:
+    def __init__(self, file_path: str, lang: str, futures: List["Future[List[PageResult]]"]):
+        self.id = str(uuid.uuid4())
+        self.file_path = file_path
+        self.lang = lang
+        self.futures = futures
+
+    @property
+    def status(self) -> str:
+        # A cancelled shard (pool shut down) never produces its pages.
+        if any(f.cancelled() or (f.done() and f.exception() is not None) for f in self.futures):
+            return OCRStatus.FAILED
+        if all(f.done() for f in self.futures):
+            return OCRStatus.SUCCESS
+        if any(f.running() or f.done() for f in self.futures):
+            return OCRStatus.PROCESSING
+        return OCRStatus.PENDING
+
+    def to_dict(self, include_result: bool = False) -> Dict[str, Any]:
+        status = self.status
+        data: Dict[str, Any] = {
+            "job_id": self.id,
+            "status": status,
+            "shards_total": len(self.futures),
+            "shards_done": sum(1 for f in self.futures if f.done() and not f.cancelled()),
+        }
+        if status == OCRStatus.FAILED:
+            errors = [f.exception() for f in self.futures if f.done() and not f.cancelled() and f.exception()]
+            data["error_message"] = str(errors[0]) if errors else "OCR job was cancelled (pool shut down)"
+        if include_result and status == OCRStatus.SUCCESS:
+            data["result"] = merge_shards([f.result() for f in self.futures])
+        return data
+
+
+class OCRJobRegistry:
+    """
+    In-memory registry of OCR job handles for the API process, bounded to max_jobs entries.
+    """
+
+    def __init__(self, max_jobs: int = 256):
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, OCRJob]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        pool: OCRPool,
+        file_path: str,
+        lang: str = "en",
+        page_ranges: Optional[Sequence[PageRange]] = None,
+    ) -> OCRJob:
+        job = OCRJob(file_path, lang, pool.submit(file_path, lang=lang, page_ranges=page_ranges))
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+        return job
+
+    def get(self, job_id: str) -> Optional[OCRJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+
+ocr_jobs = OCRJobRegistry()
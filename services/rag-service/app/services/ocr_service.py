@@ -3,8 +3,12 @@ from __future__ import annotations
 
 import os
 import threading
-from typing import Dict, List, Any
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import pymupdf
+import numpy as np
+import paddleocr
 from paddleocr import PaddleOCR
+from app.utils.config import settings
 
 _LANG_MAP = {
     "ja": "japan",
@@ -12,6 +16,9 @@ _LANG_MAP = {
     "en": "en",
 }
 
+# Bump when the structured output changes (rendering, bbox format, ...) to invalidate the OCR cache.
+_OCR_OUTPUT_VERSION = "1"
+
 _OCR_ENGINES: Dict[str, PaddleOCR] = {}
 _LOCK = threading.Lock()
 
@@ -30,33 +37,163 @@ def get_ocr_engine(lang: str) -> PaddleOCR:
             _OCR_ENGINES[paddle_lang] = engine
         return engine
 
+def get_ocr_engine_version() -> str:
+    """
+    Identifies everything that affects OCR output; part of the OCR cache key.
+    """
+    native = f"native={settings.NATIVE_TEXT_MIN_CHARS}" if settings.NATIVE_TEXT_LAYER_ENABLED else "native=off"
+    return ";".join([
+        f"out={_OCR_OUTPUT_VERSION}",
+        f"paddleocr={getattr(paddleocr, '__version__', 'unknown')}",
+        f"pymupdf={pymupdf.VersionBind}",
+        native,
+    ])
+
+def _structure_page(page: Any, page_no: int) -> List[Dict[str, Any]]:
+    """
+    Convert one page of raw PaddleOCR output into structured lines.
+    """
+    structured_results = []
+    if page is None:
+        return structured_results
+
+    for line in page:
+
+        box = line[0]
+        text_content = line[1][0]
+
+        structured_results.append({
+            "text": text_content,
+            "page": page_no,
+            "bbox": box,
+            "y_center": (box[0][1] + box[2][1]) / 2
+        })
+
+    return structured_results
+
+def _render_zoom(page: "pymupdf.Page") -> float:
+    # PaddleOCR renders PDF pages at 2x, falling back to 1x when either side would exceed 2000px.
+    rect = page.rect
+    if rect.width * 2 > 2000 or rect.height * 2 > 2000:
+        return 1.0
+    return 2.0
+
+def _render_pdf_page(page: "pymupdf.Page") -> np.ndarray:
+    """
+    Render a PDF page to a BGR image the same way PaddleOCR does for PDF input,
+    so bbox coordinates stay comparable with run_ocr.
+    """
+    zoom = _render_zoom(page)
+    pm = page.get_pixmap(matrix=pymupdf.Matrix(zoom, zoom), alpha=False)
+
+    img = np.frombuffer(pm.samples, dtype=np.uint8).reshape(pm.height, pm.width, pm.n)
+    # RGB -> BGR
+    return np.ascontiguousarray(img[:, :, ::-1])
+
+def has_usable_text_layer(page: "pymupdf.Page") -> bool:
+    """
+    Page classifier: True for born-digital pages whose embedded text can replace OCR,
+    False for scanned / image-only pages (no text, or mostly unmapped glyphs).
+    """
+    text = page.get_text("text")
+    chars = [c for c in text if not c.isspace()]
+    if len(chars) < settings.NATIVE_TEXT_MIN_CHARS:
+        return False
+    # Fonts without a ToUnicode map extract as U+FFFD; such a layer is unreadable.
+    garbage = sum(1 for c in chars if c == "\ufffd")
+    return garbage / len(chars) <= 0.05
+
+def extract_native_lines(page: "pymupdf.Page", page_no: int) -> List[Dict[str, Any]]:
+    """
+    Extract text lines from the PDF text layer in the same structure OCR produces.
+    Boxes are scaled to the OCR render resolution so highlights line up either way.
+    """
+    zoom = _render_zoom(page)
+    structured_results = []
+
+    for block in page.get_text("dict")["blocks"]:
+        if block.get("type") != 0:  # 0 = text, 1 = image
+            continue
+        for line in block["lines"]:
+            text_content = "".join(span["text"] for span in line["spans"]).strip()
+            if not text_content:
+                continue
+
+            x0, y0, x1, y1 = (v * zoom for v in line["bbox"])
+            box = [[x0, y0], [x1, y0], [x1, y1], [x0, y1]]
+
+            structured_results.append({
+                "text": text_content,
+                "page": page_no,
+                "bbox": box,
+                "y_center": (box[0][1] + box[2][1]) / 2
+            })
+
+    return structured_results
+
 def run_ocr(file_path: str, lang: str = "en") -> List[Dict[str, Any]]:
     """
     Run OCR and return a list of structured data instead of raw text.
     Each item contains: text, page_index, and bounding box coordinates.
+    PDF pages with a usable text layer skip OCR (see iter_ocr_pages).
     """
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"File not found: {file_path}")
 
+    if file_path.lower().endswith(".pdf"):
+        return [line for _, lines in iter_ocr_pages(file_path, lang=lang) for line in lines]
+
     engine = get_ocr_engine(lang)
     result = engine.ocr(file_path)
 
     structured_results = []
 
     for page_idx, page in enumerate(result or []):
-        if page is None:
-            continue
-        
-        for line in page:
+        structured_results.extend(_structure_page(page, page_idx + 1))
 
-            box = line[0]
-            text_content = line[1][0]
-            
-            structured_results.append({
-                "text": text_content,
-                "page": page_idx + 1, 
-                "bbox": box,          
-                "y_center": (box[0][1] + box[2][1]) / 2 
-            })
+    return structured_results
+
+def get_page_count(file_path: str) -> int:
+    """
+    Number of pages OCR will produce for a file (images count as one page).
+    """
+    if not file_path.lower().endswith(".pdf"):
+        return 1
+    with pymupdf.open(file_path) as pdf:
+        return pdf.page_count
+
+def iter_ocr_pages(
+    file_path: str,
+    lang: str = "en",
+    first_page: int = 1,
+    last_page: Optional[int] = None,
+) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+    """
+    Streaming variant of run_ocr: yields (page_no, structured_lines) one page at a time,
+    so only the page being recognized is held in memory. PDF pages with a usable text
+    layer are extracted with PyMuPDF; only scanned / image-only pages are OCR'd.
+    first_page / last_page are 1-based and inclusive (PDF only).
+    """
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"File not found: {file_path}")
+
+    if not file_path.lower().endswith(".pdf"):
+        result = get_ocr_engine(lang).ocr(file_path)
+        for page_idx, page in enumerate(result or []):
+            yield page_idx + 1, _structure_page(page, page_idx + 1)
+        return
+
+    with pymupdf.open(file_path) as pdf:
+        end = pdf.page_count if last_page is None else min(last_page, pdf.page_count)
+        for page_idx in range(max(first_page, 1) - 1, end):
+            pdf_page = pdf[page_idx]
+
+            # Fast path: born-digital pages never touch the OCR engine.
+            if settings.NATIVE_TEXT_LAYER_ENABLED and has_usable_text_layer(pdf_page):
+                yield page_idx + 1, extract_native_lines(pdf_page, page_idx + 1)
+                continue
 
-    return structured_results
\ No newline at end of file
+            img = _render_pdf_page(pdf_page)
+            result = get_ocr_engine(lang).ocr(img)
+            page = result[0] if result else None
+            yield page_idx + 1, _structure_page(page, page_idx + 1)
@@ -0,0 +1,24 @@
+# app/services/rank_fusion.py
+
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[str]],
+    k: int = 60,
+    weights: Optional[Sequence[float]] = None,
+) -> List[Tuple[str, float]]:
+    """
+    Reciprocal rank fusion: score(id) = sum_i weight_i / (k + rank_i(id)), rank starting at 1.
+
+    Only ranks are used, so retrievers with incomparable scores (cosine distance, BM25)
+    can be fused without calibration. Returns (id, fused score), best first.
+    """
+    weights = list(weights) if weights is not None else [1.0] * len(rankings)
+    scores: Dict[str, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, item_id in enumerate(ranking, start=1):
+            scores[item_id] = scores.get(item_id, 0.0) + weight / (k + rank)
+    return sorted(scores.items(), key=lambda x: x[1], reverse=True)
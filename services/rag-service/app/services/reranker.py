@@ -0,0 +1,92 @@
+# app/services/reranker.py
+
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from sentence_transformers import CrossEncoder
+
+from app.utils.hashing import chunk_content_hash
+from app.utils.lru import LRUCache
+
+
+class CrossEncoderReranker:
+    """
+    Local cross-encoder that scores (query, chunk text) pairs for the rerank stage of search.
+
+    - every pair of a call (one query or a whole batch) goes through one batched predict
+    - scores are cached by (query, chunk content hash), so a repeated query, or a chunk seen
+      again under the same query, costs nothing; a re-chunked text gets a new hash
+    - scores are relevance logits: higher is better, only comparable within one query
+    """
+
+    def __init__(
+        self,
+        model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
+        batch_size: int = 32,
+        max_length: int = 512,
+        cache_entries: int = 8192,
+        device: Optional[str] = None,
+    ):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.device = device
+
+        self._model: Optional[CrossEncoder] = None
+        self._model_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._scores: LRUCache[float] = LRUCache(cache_entries)
+        self.pairs_scored = 0
+        self.timeouts = 0
+
+    def _get_model(self) -> CrossEncoder:
+        with self._model_lock:
+            if self._model is None:
+                self._model = CrossEncoder(self.model_name, max_length=self.max_length, device=self.device)
+            return self._model
+
+    def score(self, query: str, texts: List[str]) -> List[float]:
+        return self.score_many([query], [texts])[0]
+
+    def score_many(self, queries: List[str], texts: List[List[str]]) -> List[List[float]]:
+        """
+        One score list per query, aligned with its texts.
+        """
+        keys = [[(q, chunk_content_hash(t)) for t in ts] for q, ts in zip(queries, texts)]
+        scores: List[List[Optional[float]]] = []
+        missing: Dict[Tuple[str, str], Tuple[str, str]] = {}
+        with self._lock:
+            for q, ts, ks in zip(queries, texts, keys):
+                row = [self._scores.get(k) for k in ks]
+                for k, t, s in zip(ks, ts, row):
+                    if s is None:
+                        missing.setdefault(k, (q, t or ""))
+                scores.append(row)
+
+        if missing:
+            predicted = self._get_model().predict(
+                list(missing.values()),
+                batch_size=self.batch_size,
+                show_progress_bar=False,
+            )
+            fresh = dict(zip(missing, (float(x) for x in predicted)))
+            with self._lock:
+                for k, s in fresh.items():
+                    self._scores.put(k, s)
+                self.pairs_scored += len(fresh)
+            scores = [
+                [s if s is not None else fresh[k] for s, k in zip(row, ks)]
+                for row, ks in zip(scores, keys)
+            ]
+        return scores
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "model": self.model_name,
+                "pairs_scored": self.pairs_scored,
+                "timeouts": self.timeouts,
+                "cache": self._scores.stats(),
+            }
@@ -0,0 +1,61 @@
+# app/services/search_cache.py
+
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from app.services.embedding_cache import normalize_text
+from app.utils.lru import LRUCache
+
+
+class SearchResultCache:
+    """
+    Two-tier cache for SearchService:
+    1) query embeddings, keyed by the normalized query (survives index writes);
+    2) hydrated hit lists, keyed by (normalized query, document_id, top_k, mode, index version).
+
+    The index version comes from app.vectorstore.index_version, so any write touching the
+    searched document (or any document, for unfiltered searches) makes older hit lists
+    unreachable; they age out of the LRU.
+    """
+
+    def __init__(self, max_embeddings: int = 4096, max_results: int = 1024):
+        self._lock = threading.Lock()
+        self._embeddings: LRUCache[List[float]] = LRUCache(max_embeddings)
+        self._results: LRUCache[List[Any]] = LRUCache(max_results)
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        # Whitespace only: anything stronger could map different embeddings to one key.
+        return normalize_text(query)
+
+    @staticmethod
+    def result_key(
+        query: str, document_id: Optional[str], top_k: int, mode: str, version: int, user_id: Optional[str] = None
+    ) -> Tuple[str, Optional[str], int, str, int, Optional[str]]:
+        return (query, str(document_id) if document_id else None, int(top_k), mode, int(version), str(user_id) if user_id else None)
+
+    def get_embedding(self, query: str) -> Optional[List[float]]:
+        with self._lock:
+            return self._embeddings.get(query)
+
+    def put_embedding(self, query: str, vector: List[float]) -> None:
+        with self._lock:
+            self._embeddings.put(query, vector)
+
+    def get_results(self, key: Hashable) -> Optional[List[Any]]:
+        with self._lock:
+            hits = self._results.get(key)
+        return list(hits) if hits is not None else None
+
+    def put_results(self, key: Hashable, hits: List[Any]) -> None:
+        with self._lock:
+            self._results.put(key, list(hits))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "embeddings": self._embeddings.stats(),
+                "results": self._results.stats(),
+            }
@@ -2,46 +2,88 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Any, Dict, List, Optional
+import asyncio
+import threading
+from concurrent.futures import CancelledError as FuturesCancelledError
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Any, Dict, List, Optional, Tuple
 from uuid import UUID
 
-from app.db.session import session_scope
-from app.repositories.chunk_repository import ChunkRepository
+from app.services.chunk_hydration import SqlHydrator
+from app.services.embedding_batcher import EmbeddingBatcher
 from app.services.embedding_service import EmbeddingService
-from app.vectorstore.chroma_repo import ChromaVectorRepository, VectorHit
+from app.services.lexical_index import BM25Index
+from app.services.rank_fusion import reciprocal_rank_fusion
+from app.services.reranker import CrossEncoderReranker
+from app.services.search_cache import SearchResultCache
+from app.utils.config import settings
+from app.utils.executors import get_executor
+from app.vectorstore.base import VectorHit, VectorRepository
+from app.vectorstore.index_version import index_versions
+from app.vectorstore.schemas import decode_spans
 
 
 @dataclass
 class SearchHit:
     chunk_id: str
-    distance: float
+    # None for a hybrid hit only the lexical index holds (ranked by score alone)
+    distance: Optional[float]
     text: str
     document_id: str
     chunk_index: int
     start_offset: Optional[int]
     end_offset: Optional[int]
     metadata: Dict[str, Any]
+    # Reciprocal-rank-fusion score in hybrid mode; None for vector-only search.
+    score: Optional[float] = None
+    # Cross-encoder relevance score when the hit was reranked; None otherwise.
+    rerank_score: Optional[float] = None
+    # (page, bbox) of every OCR line the chunk covers, so a chunk crossing a page boundary
+    # can be highlighted on both pages; empty when the vector metadata has none.
+    spans: List[Dict[str, Any]] = field(default_factory=list)
 
 
 class SearchService:
     """
     Semantic search service:
-    query text -> embed -> vector search (Chroma) -> map back to chunks in Postgres (source of truth).
+    query text -> embed -> vector search (Chroma or mmap backend) -> map back to chunks in Postgres (source of truth).
 
     Notes:
-    - Chroma stores embeddings + metadata as an index layer.
+    - The vector store keeps embeddings + metadata as an index layer (VectorRepository).
     - Postgres stores chunk truth data (text, offsets, etc).
+    - mode="hybrid" also queries the in-process BM25 index and fuses both rankings with
+      reciprocal rank fusion, so exact identifiers (invoice numbers, part codes, names)
+      are found without raising top_k.
+    - Hits are mapped to chunk rows by a pluggable hydrator (app.services.chunk_hydration):
+      one projected SQL query, a read-through row cache, or Chroma's own copy when its
+      per-chunk version checks out.
+    - rerank=True retrieves RERANK_CANDIDATES candidates and keeps the top_k a local
+      cross-encoder scores best, falling back to retrieval order past RERANK_TIMEOUT_MS.
     """
 
     def __init__(
         self,
         *,
         embedding_service: EmbeddingService,
-        vector_repo: ChromaVectorRepository,
+        vector_repo: VectorRepository,
+        lexical_index: Optional[BM25Index] = None,
+        embedding_batcher: Optional[EmbeddingBatcher] = None,
+        cache: Optional[SearchResultCache] = None,
+        hydrator: Optional[SqlHydrator] = None,
+        reranker: Optional[CrossEncoderReranker] = None,
     ):
         self.embedding_service = embedding_service
         self.vector_repo = vector_repo
+        self.lexical_index = lexical_index
+        # asearch encodes queries through the batcher when given (concurrent requests share a batch)
+        self.embedding_batcher = embedding_batcher
+        self.cache = cache
+        # how hits are mapped to chunk rows: SQL, a row cache, or trusted Chroma copies
+        self.hydrator = hydrator or SqlHydrator()
+        # optional rerank stage (rerank=True): cross-encoder over the retrieved candidates
+        self.reranker = reranker
 
     def search(
         self,
@@ -49,84 +91,442 @@ class SearchService:
         query: str,
         top_k: int = 5,
         document_id: Optional[str] = None,
+        query_embedding: Optional[List[float]] = None,
+        mode: str = "vector",
+        user_id: Optional[str] = None,
+        rerank: bool = False,
     ) -> List[SearchHit]:
-        q = (query or "").strip()
+        q = SearchResultCache.normalize(query)
         if not q:
             return []
 
-        # 1) embed query (no DB session)
-        query_vec = self.embedding_service.embed_text(q)
-        print(f"Searching with document_id: {document_id}")
-        print(f"Query embedding: {query_vec}")
+        # 0) repeat query against an unchanged index: served from the result cache
+        rerank = rerank and self.reranker is not None
+        key = self._result_key(q, document_id, top_k, mode, user_id, rerank)
+        cached = self.cache.get_results(key) if self.cache is not None else None
+        if cached is not None:
+            return cached
 
-        # 2) vector search (index layer)
-        hits: List[VectorHit] = self.vector_repo.query(
-            query_embedding=query_vec,
-            top_k=top_k,
-            document_id=document_id,
+        # 1) embed query (no DB session); callers may pass a precomputed (e.g. micro-batched) embedding
+        query_vec = query_embedding
+        if query_vec is None:
+            query_vec = self.cache.get_embedding(q) if self.cache is not None else None
+        if query_vec is None:
+            query_vec = self.embedding_service.embed_text(q)
+            self._remember_embedding(q, query_vec)
+
+        # 2) vector search (index layer), fused with BM25 in hybrid mode
+        hits = self._retrieve(q, query_vec, self._fetch_k(top_k, rerank), document_id, mode, user_id)
+
+        chunk_ids = self._chunk_ids(hits)
+        if not chunk_ids:
+            self._remember_results(key, [])
+            return []
+
+        # 4) chunk rows (one projected query at most, see chunk_hydration)
+        chunk_map = self.hydrator.hydrate(hits)
+
+        # 5) assemble response in the same order as vector hits
+        results = self._assemble(hits, chunk_map)
+
+        # 6) cross-encoder rerank of the candidates, within the time budget
+        if rerank:
+            reranked, complete = self._rerank([q], [results], top_k)
+            results = reranked[0]
+            if not complete:
+                # Retrieval order stood in for the scores: not worth caching.
+                return results
+
+        self._remember_results(key, results)
+        return results
+
+    async def asearch(
+        self,
+        *,
+        query: str,
+        top_k: int = 5,
+        document_id: Optional[str] = None,
+        query_embedding: Optional[List[float]] = None,
+        mode: str = "vector",
+        user_id: Optional[str] = None,
+        rerank: bool = False,
+    ) -> List[SearchHit]:
+        """
+        Non-blocking variant of search for async endpoints:
+        - query encoding and the Chroma query run on dedicated, size-limited executors
+        - chunk hydration uses the async engine (asyncpg) and its own connection pool
+        Cancelling the awaiting task (e.g. on client disconnect) stops at the next await.
+        """
+        q = SearchResultCache.normalize(query)
+        if not q:
+            return []
+
+        # 0) repeat query against an unchanged index: served from the result cache
+        rerank = rerank and self.reranker is not None
+        key = self._result_key(q, document_id, top_k, mode, user_id, rerank)
+        cached = self.cache.get_results(key) if self.cache is not None else None
+        if cached is not None:
+            return cached
+
+        loop = asyncio.get_running_loop()
+
+        # 1) embed query
+        query_vec = query_embedding if query_embedding is not None else await self.embed_query(q)
+
+        # 2) vector search (index layer), fused with BM25 in hybrid mode
+        hits = await loop.run_in_executor(
+            get_executor("vector"),
+            partial(self._retrieve, q, query_vec, self._fetch_k(top_k, rerank), document_id, mode, user_id),
+        )
+
+        chunk_ids = self._chunk_ids(hits)
+        if not chunk_ids:
+            self._remember_results(key, [])
+            return []
+
+        # 3) chunk rows, without blocking the event loop (async engine for the SQL part)
+        chunk_map = await self.hydrator.ahydrate(hits)
+        results = self._assemble(hits, chunk_map)
+
+        # 4) cross-encoder rerank on its own executor, abandoned when over budget
+        if rerank:
+            reranked, complete = await self._arerank([q], [results], top_k)
+            results = reranked[0]
+            if not complete:
+                return results
+
+        self._remember_results(key, results)
+        return results
+
+    def search_many(
+        self,
+        *,
+        queries: List[str],
+        top_k: int = 5,
+        document_id: Optional[str] = None,
+        mode: str = "vector",
+        user_id: Optional[str] = None,
+        rerank: bool = False,
+        cancelled: Optional[threading.Event] = None,
+    ) -> List[List[SearchHit]]:
+        """
+        Batch search for evaluation runs and bulk callers; one hit list per query, in order.
+        Queries not served by the result cache share one model.encode batch, one Chroma
+        query and one chunk hydration query (duplicates within the batch are searched once).
+
+        Runs on an executor thread, which cannot be interrupted: once `cancelled` is set
+        (the caller went away), the next stage raises concurrent.futures.CancelledError.
+        """
+        qs = [SearchResultCache.normalize(q) for q in queries]
+        rerank = rerank and self.reranker is not None
+        keys = [self._result_key(q, document_id, top_k, mode, user_id, rerank) for q in qs]
+        results: List[Optional[List[SearchHit]]] = [None] * len(qs)
+
+        pending: List[str] = []
+        for i, q in enumerate(qs):
+            if not q:
+                results[i] = []
+                continue
+            cached = self.cache.get_results(keys[i]) if self.cache is not None else None
+            if cached is not None:
+                results[i] = cached
+            elif q not in pending:
+                pending.append(q)
+
+        if pending:
+            # 1) embed every uncached query in one batch
+            _check_cancelled(cancelled)
+            query_vecs = self._embed_many(pending)
+
+            # 2) one vector query for the whole batch (fused with BM25 in hybrid mode)
+            _check_cancelled(cancelled)
+            hit_lists = self._retrieve_many(pending, query_vecs, self._fetch_k(top_k, rerank), document_id, mode, user_id)
+
+            # 3) hydrate the union of hits at once (a single SQL query at most)
+            _check_cancelled(cancelled)
+            union = list({str(h.metadata.get("chunk_id") or h.id): h for hits in hit_lists for h in hits}.values())
+            chunk_map = self.hydrator.hydrate(union)
+            by_query = {q: self._assemble(hits, chunk_map) for q, hits in zip(pending, hit_lists)}
+
+            # 4) one cross-encoder pass over every query's candidates
+            complete = True
+            if rerank:
+                _check_cancelled(cancelled)
+                reranked, complete = self._rerank(pending, [by_query[q] for q in pending], top_k)
+                by_query = dict(zip(pending, reranked))
+
+            for i, q in enumerate(qs):
+                if results[i] is None:
+                    results[i] = list(by_query[q])
+                    if complete:
+                        self._remember_results(keys[i], by_query[q])
+
+        return results
+
+    def _embed_many(self, qs: List[str]) -> List[List[float]]:
+        vecs: List[Optional[List[float]]] = [
+            self.cache.get_embedding(q) if self.cache is not None else None for q in qs
+        ]
+        missing = [i for i, v in enumerate(vecs) if v is None]
+        if missing:
+            encoded = self.embedding_service.embed_texts([qs[i] for i in missing])
+            for i, vec in zip(missing, encoded):
+                vecs[i] = vec
+                self._remember_embedding(qs[i], vec)
+        return vecs
+
+    def _retrieve_many(
+        self,
+        queries: List[str],
+        query_vecs: List[List[float]],
+        top_k: int,
+        document_id: Optional[str],
+        mode: str,
+        user_id: Optional[str] = None,
+    ) -> List[List[VectorHit]]:
+        if mode != "hybrid" or self.lexical_index is None:
+            return self.vector_repo.query_many(query_embeddings=query_vecs, top_k=top_k, document_id=document_id, user_id=user_id)
+        candidates = top_k * max(settings.HYBRID_CANDIDATE_MULTIPLIER, 1)
+        vector_lists = self.vector_repo.query_many(
+            query_embeddings=query_vecs, top_k=candidates, document_id=document_id, user_id=user_id
         )
+        return self._fuse_many(queries, query_vecs, vector_lists, top_k, document_id, user_id)
+
+    async def embed_query(self, query: str) -> List[float]:
+        """
+        Query embedding through the embedding-cache tier, then the micro-batcher (or the
+        embedding executor).
+        """
+        q = SearchResultCache.normalize(query)
+        query_vec = self.cache.get_embedding(q) if self.cache is not None else None
+        if query_vec is None:
+            if self.embedding_batcher is not None:
+                query_vec = await self.embedding_batcher.embed(q)
+            else:
+                loop = asyncio.get_running_loop()
+                query_vec = await loop.run_in_executor(get_executor("embedding"), self.embedding_service.embed_text, q)
+            self._remember_embedding(q, query_vec)
+        return query_vec
+
+    def _result_key(
+        self,
+        q: str,
+        document_id: Optional[str],
+        top_k: int,
+        mode: str,
+        user_id: Optional[str] = None,
+        rerank: bool = False,
+    ) -> Any:
+        if self.cache is None:
+            return None
+        # Read before searching: a write landing mid-search leaves this entry on an old version.
+        version = index_versions.get(document_id)
+        return SearchResultCache.result_key(q, document_id, top_k, f"{mode}+rerank" if rerank else mode, version, user_id)
 
-        # 3) extract chunk_ids from hits (prefer metadata["chunk_id"], fallback to hit.id)
+    @staticmethod
+    def _fetch_k(top_k: int, rerank: bool) -> int:
+        # The reranker picks top_k out of a deeper candidate list.
+        return max(top_k, settings.RERANK_CANDIDATES) if rerank else top_k
+
+    def _rerank(
+        self, queries: List[str], candidates: List[List[SearchHit]], top_k: int
+    ) -> Tuple[List[List[SearchHit]], bool]:
+        """
+        Reorder each candidate list by cross-encoder score and keep top_k. Past the
+        RERANK_TIMEOUT_MS budget (or on a model error) the retrieval order is kept;
+        the second value tells whether the scores were applied.
+        """
+        future = get_executor("rerank").submit(
+            self.reranker.score_many, queries, [[h.text for h in hits] for hits in candidates]
+        )
+        try:
+            scores = future.result(timeout=settings.RERANK_TIMEOUT_MS / 1000)
+        except FuturesTimeoutError:
+            # A queued call is dropped; a running one still fills the score cache.
+            future.cancel()
+            self.reranker.timeouts += 1
+            return [hits[:top_k] for hits in candidates], False
+        except Exception as e:
+            print(f"Rerank failed, keeping retrieval order: {e}")
+            return [hits[:top_k] for hits in candidates], False
+        return self._apply_scores(candidates, scores, top_k), True
+
+    async def _arerank(
+        self, queries: List[str], candidates: List[List[SearchHit]], top_k: int
+    ) -> Tuple[List[List[SearchHit]], bool]:
+        future = get_executor("rerank").submit(
+            self.reranker.score_many, queries, [[h.text for h in hits] for hits in candidates]
+        )
+        try:
+            scores = await asyncio.wait_for(asyncio.wrap_future(future), timeout=settings.RERANK_TIMEOUT_MS / 1000)
+        except asyncio.TimeoutError:
+            self.reranker.timeouts += 1
+            return [hits[:top_k] for hits in candidates], False
+        except Exception as e:
+            print(f"Rerank failed, keeping retrieval order: {e}")
+            return [hits[:top_k] for hits in candidates], False
+        return self._apply_scores(candidates, scores, top_k), True
+
+    @staticmethod
+    def _apply_scores(
+        candidates: List[List[SearchHit]], scores: List[List[float]], top_k: int
+    ) -> List[List[SearchHit]]:
+        results: List[List[SearchHit]] = []
+        for hits, hit_scores in zip(candidates, scores):
+            ranked = sorted(zip(hits, hit_scores), key=lambda pair: pair[1], reverse=True)[:top_k]
+            for hit, score in ranked:
+                hit.rerank_score = score
+            results.append([hit for hit, _ in ranked])
+        return results
+
+    def _remember_embedding(self, q: str, query_vec: List[float]) -> None:
+        if self.cache is not None:
+            self.cache.put_embedding(q, query_vec)
+
+    def _remember_results(self, key: Any, results: List[SearchHit]) -> None:
+        if self.cache is not None:
+            self.cache.put_results(key, results)
+
+    def _retrieve(
+        self,
+        query: str,
+        query_vec: List[float],
+        top_k: int,
+        document_id: Optional[str],
+        mode: str,
+        user_id: Optional[str] = None,
+    ) -> List[VectorHit]:
+        if mode != "hybrid" or self.lexical_index is None:
+            return self.vector_repo.query(query_embedding=query_vec, top_k=top_k, document_id=document_id, user_id=user_id)
+
+        # Each retriever contributes a deeper candidate list; fusion picks the final top_k.
+        candidates = top_k * max(settings.HYBRID_CANDIDATE_MULTIPLIER, 1)
+        vector_hits = self.vector_repo.query(
+            query_embedding=query_vec, top_k=candidates, document_id=document_id, user_id=user_id
+        )
+        return self._fuse_many([query], [query_vec], [vector_hits], top_k, document_id, user_id)[0]
+
+    def _fuse_many(
+        self,
+        queries: List[str],
+        query_vecs: List[List[float]],
+        vector_lists: List[List[VectorHit]],
+        top_k: int,
+        document_id: Optional[str],
+        user_id: Optional[str] = None,
+    ) -> List[List[VectorHit]]:
+        candidates = top_k * max(settings.HYBRID_CANDIDATE_MULTIPLIER, 1)
+        lexical_lists = [self.lexical_index.search(query, top_k=candidates, document_id=document_id) for query in queries]
+        by_ids = [{str(h.metadata.get("chunk_id") or h.id): h for h in vector_hits} for vector_hits in vector_lists]
+        if user_id is not None:
+            # The BM25 index spans every user: keep only the lexical candidates whose vectors the user owns.
+            owned = self.vector_repo.get_hits_many(
+                chunk_ids=[[cid for cid, _ in lexical if cid not in by_id] for lexical, by_id in zip(lexical_lists, by_ids)],
+                query_embeddings=query_vecs,
+                user_id=user_id,
+            )
+            for by_id, extra in zip(by_ids, owned):
+                for h in extra:
+                    by_id[str(h.metadata.get("chunk_id") or h.id)] = h
+            lexical_lists = [[(cid, s) for cid, s in lexical if cid in by_id] for lexical, by_id in zip(lexical_lists, by_ids)]
+
+        fused_lists: List[Optional[List[Tuple[str, float]]]] = []
+        for lexical_hits, vector_hits in zip(lexical_lists, vector_lists):
+            if not lexical_hits:
+                fused_lists.append(None)
+                continue
+            fused_lists.append(reciprocal_rank_fusion(
+                [[str(h.metadata.get("chunk_id") or h.id) for h in vector_hits], [cid for cid, _ in lexical_hits]],
+                k=settings.RRF_K,
+            )[:top_k])
+
+        # Lexical-only candidates are scored against the query vector so distance stays meaningful
+        # (fetched for the whole batch at once).
+        missing = [
+            [cid for cid, _ in fused if cid not in by_id] if fused is not None else []
+            for fused, by_id in zip(fused_lists, by_ids)
+        ]
+        if any(missing):
+            for by_id, extra in zip(by_ids, self.vector_repo.get_hits_many(chunk_ids=missing, query_embeddings=query_vecs)):
+                for h in extra:
+                    by_id[str(h.metadata.get("chunk_id") or h.id)] = h
+
+        results: List[List[VectorHit]] = []
+        for fused, by_id, vector_hits in zip(fused_lists, by_ids, vector_lists):
+            if fused is None:
+                results.append(vector_hits[:top_k])
+                continue
+            hits: List[VectorHit] = []
+            for cid, score in fused:
+                h = by_id.get(cid)
+                if h is None:
+                    # In the lexical index but not (yet) in Chroma: Postgres still has the text,
+                    # there is no vector to measure a distance to.
+                    h = VectorHit(id=cid, distance=None, document=None, metadata={"chunk_id": cid})
+                h.score = score
+                hits.append(h)
+            results.append(hits)
+        return results
+
+    @staticmethod
+    def _chunk_ids(hits: List[VectorHit]) -> List[str]:
+        # extract chunk_ids from hits (prefer metadata["chunk_id"], fallback to hit.id)
         chunk_ids: List[str] = []
         for h in hits:
             cid = h.metadata.get("chunk_id") or h.id
             if cid:
                 chunk_ids.append(str(cid))
+        return chunk_ids
 
-        if not chunk_ids:
-            return []
+    @staticmethod
+    def _assemble(hits: List[VectorHit], chunk_map: Dict[str, Any]) -> List[SearchHit]:
+        results: List[SearchHit] = []
+
+        for h in hits:
+            cid = str(h.metadata.get("chunk_id") or h.id)
+            c = chunk_map.get(cid)
+
+            # If missing in DB, fallback to Chroma stored "document" field
+            text = c.text if c is not None else (h.document or "")
 
-        # 4) fetch chunks from Postgres (source of truth)
-        with session_scope() as db:
-            chunk_repo = ChunkRepository(db)
-            chunks = chunk_repo.get_by_ids(chunk_ids)
-
-            for chunk in chunks:
-                db.refresh(chunk)
-
-            chunk_map = {str(c.id): c for c in chunks}
-
-            # 5) assemble response in the same order as vector hits
-            results: List[SearchHit] = []
-            
-            for h in hits:
-                cid = str(h.metadata.get("chunk_id") or h.id)
-                c = chunk_map.get(cid)
-
-                # If missing in DB, fallback to Chroma stored "document" field
-                text = c.text if c is not None else (h.document or "")
-
-                # metadata fields (may be absent depending on exclude_none)
-                doc_id = ""
-                chunk_index = -1
-                start_offset = None
-                end_offset = None
-
-                if c is not None:
-                    doc_id = str(c.document_id)
-                    chunk_index = int(c.chunk_index)
-                    start_offset = c.start_offset
-                    end_offset = c.end_offset
-                else:
-                    doc_id = str(h.metadata.get("document_id") or "")
-                    chunk_index = int(h.metadata.get("chunk_index") or -1)
-                    # offsets might not exist in metadata if you excluded None; handle safely
-                    so = h.metadata.get("start_offset")
-                    eo = h.metadata.get("end_offset")
-                    start_offset = int(so) if isinstance(so, int) else None
-                    end_offset = int(eo) if isinstance(eo, int) else None
-
-                results.append(
-                    SearchHit(
-                        chunk_id=cid,
-                        distance=float(h.distance),
-                        text=text,
-                        document_id=doc_id,
-                        chunk_index=chunk_index,
-                        start_offset=start_offset,
-                        end_offset=end_offset,
-                        metadata=h.metadata,
-                    )
+            # metadata fields (may be absent depending on exclude_none)
+            doc_id = ""
+            chunk_index = -1
+            start_offset = None
+            end_offset = None
+
+            if c is not None:
+                doc_id = str(c.document_id)
+                chunk_index = int(c.chunk_index)
+                start_offset = c.start_offset
+                end_offset = c.end_offset
+            else:
+                doc_id = str(h.metadata.get("document_id") or "")
+                chunk_index = int(h.metadata.get("chunk_index") or -1)
+                # offsets might not exist in metadata if you excluded None; handle safely
+                so = h.metadata.get("start_offset")
+                eo = h.metadata.get("end_offset")
+                start_offset = int(so) if isinstance(so, int) else None
+                end_offset = int(eo) if isinstance(eo, int) else None
+
+            results.append(
+                SearchHit(
+                    chunk_id=cid,
+                    distance=float(h.distance) if h.distance is not None else None,
+                    text=text,
+                    document_id=doc_id,
+                    chunk_index=chunk_index,
+                    start_offset=start_offset,
+                    end_offset=end_offset,
+                    metadata=h.metadata,
+                    score=h.score,
+                    spans=decode_spans(h.metadata.get("spans")),
                 )
+            )
+
+        return results
+
 
-            return results
+def _check_cancelled(cancelled: Optional[threading.Event]) -> None:
+    if cancelled is not None and cancelled.is_set():
+        raise FuturesCancelledError()
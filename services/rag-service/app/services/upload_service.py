@@ -1,41 +1,232 @@
 from pathlib import Path
-import shutil
+import asyncio
+import hashlib
 import os
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import BinaryIO, Iterator, List, Optional
 from fastapi import UploadFile,HTTPException
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
+from app.db.session import session_scope
 from app.repositories.document_repository import DocumentRepository
 from app.constants.status import DocumentStatus
-from uuid import UUID
+from app.utils.config import settings
+from app.utils.executors import get_executor
+from uuid import UUID, uuid4
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX: single API process assumed
+    fcntl = None
 
 UPLOAD_DIR = Path(__file__).resolve().parent.parent / "uploaded_files"
+# Partial uploads; moved into UPLOAD_DIR once their content hash is known
+INCOMING_DIR = UPLOAD_DIR / ".incoming"
+# Serializes publishing a file with the orphan sweep removing it (across processes)
+PUBLISH_LOCK_FILE = ".publish.lock"
 
 # make directory if is not exist
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+os.makedirs(INCOMING_DIR, exist_ok=True)
+
+
+@dataclass
+class StoredFile:
+    filename: str
+    file_path: str
+    mime_type: Optional[str]
+    file_size_bytes: int
+    content_hash: str
+    # This upload published the file (it was not stored before)
+    created: bool = False
+
+
+def content_addressed_path(content_hash: str, filename: Optional[str]) -> Path:
+    # The extension is kept: OCR picks the PDF path by it.
+    return UPLOAD_DIR / f"{content_hash}{Path(filename or '').suffix.lower()}"
+
+
+async def store_upload(file: UploadFile) -> StoredFile:
+    """
+    Stream an upload to disk without blocking the event loop: blocks are read
+    asynchronously, and hashed and written on the "upload" executor while the next block
+    is read. The file lands at its content-addressed path, so same-named uploads no
+    longer overwrite each other and identical content is stored once.
+    """
+    loop = asyncio.get_running_loop()
+    executor = get_executor("upload")
+    tmp_path = INCOMING_DIR / uuid4().hex
+    digest = hashlib.sha256()
+    size = 0
+    f = await loop.run_in_executor(executor, open, tmp_path, "wb")
+    # Block being written, as a concurrent future: done() tracks the writing thread itself
+    pending: Optional[Future] = None
+    try:
+        while True:
+            block = await file.read(settings.UPLOAD_CHUNK_BYTES)
+            if pending is not None:
+                await asyncio.wrap_future(pending)
+            if not block:
+                break
+            size += len(block)
+            pending = executor.submit(_write_block, f, digest, block)
+        await loop.run_in_executor(executor, f.close)
+        content_hash = digest.hexdigest()
+        file_path = content_addressed_path(content_hash, file.filename)
+        created = await loop.run_in_executor(executor, _publish, tmp_path, file_path)
+    except BaseException:
+        # BaseException: a cancelled request (client disconnect) must not leave a partial file.
+        if pending is not None and not pending.done():
+            # A failed read must not close the file under the block still being written.
+            try:
+                await asyncio.wrap_future(pending)
+            except BaseException:
+                pass
+        try:
+            await loop.run_in_executor(executor, f.close)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+        raise
+    finally:
+        await file.close()
+
+    return StoredFile(
+        filename=file.filename,
+        file_path=str(file_path),
+        mime_type=file.content_type,
+        file_size_bytes=size,
+        content_hash=content_hash,
+        created=created,
+    )
 
-def save_uploaded_file(file: UploadFile,db: Session,user_id: UUID,source: str):
+
+async def save_uploaded_files(files: List[UploadFile], db: Session, user_id: UUID, source: str) -> List[dict]:
+    """
+    Store several uploads concurrently, then insert all their documents in one commit.
+    If any file or the insert fails, nothing is inserted. Files the batch published are
+    left to sweep_orphaned_files: another upload may have deduplicated to one of them
+    and not committed its document yet.
+    """
+    loop = asyncio.get_running_loop()
     try:
-        # Step 1: Save file to the storage
-        file_location = os.path.join(UPLOAD_DIR, file.filename)
-        
-        with open(file_location, "wb") as f:
-            shutil.copyfileobj(file.file, f)
+        # Step 1: Stream files to the storage; let every upload finish before judging the batch
+        outcomes = await asyncio.gather(*(store_upload(file) for file in files), return_exceptions=True)
+        stored = [o for o in outcomes if isinstance(o, StoredFile)]
+        errors = [o for o in outcomes if isinstance(o, BaseException)]
+        if errors:
+            raise errors[0]
 
-        # Step 2:Save file metadata to db
+        # Step 2: Save file metadata to db (one insert batch, off the event loop)
+        rows = [
+            dict(
+                user_id=user_id,
+                filename=s.filename,
+                file_path=s.file_path,
+                mime_type=s.mime_type,              # MIME type of the uploaded file
+                file_size_bytes=s.file_size_bytes,  # Size of the uploaded file
+                content_hash=s.content_hash,        # SHA-256 of the file content
+                source=source,                      # Source can be 'upload', 'api', or 'url'
+                status=DocumentStatus.UPLOADED,
+            )
+            for s in stored
+        ]
         document_repo = DocumentRepository(db)
-        db_document = document_repo.create_document(
-            user_id = user_id,
-            filename = file.filename,
-            file_path = file_location,
-            mime_type = file.content_type,  # MIME type of the uploaded file
-            file_size_bytes = file.size,    # Size of the uploaded file
-            source = source,                 # Source can be 'upload', 'api', or 'url'
-            status = DocumentStatus.UPLOADED
-        )
-        
-        return {"document_status": db_document.status, "filename": file.filename, "document_id": db_document.id}
-    
-    except SQLAlchemyError as e:
-        raise HTTPException(status_code=500, detail="Database operation failed: " + str(e))
+        document_ids = await loop.run_in_executor(get_executor("upload"), document_repo.create_documents, rows)
+
+        return [
+            {
+                "document_status": DocumentStatus.UPLOADED,
+                "filename": s.filename,
+                "document_id": document_id,
+                # Stored name under the upload directory (the /ocr file_key)
+                "file_key": Path(s.file_path).name,
+            }
+            for s, document_id in zip(stored, document_ids)
+        ]
+
     except Exception as e:
+        if isinstance(e, SQLAlchemyError):
+            raise HTTPException(status_code=500, detail="Database operation failed: " + str(e))
         raise HTTPException(status_code=500, detail="File upload failed: " + str(e))
+
+
+async def save_uploaded_file(file: UploadFile, db: Session, user_id: UUID, source: str) -> dict:
+    return (await save_uploaded_files([file], db, user_id, source))[0]
+
+
+def _write_block(f: BinaryIO, digest: "hashlib._Hash", block: bytes) -> None:
+    digest.update(block)
+    f.write(block)
+
+
+def _publish(tmp_path: Path, file_path: Path) -> bool:
+    with _publish_lock():
+        if file_path.exists():
+            # Same content is already stored. Touching it restarts the sweep's grace period,
+            # so it is not removed before this upload's document is committed.
+            tmp_path.unlink(missing_ok=True)
+            os.utime(file_path)
+            return False
+        os.replace(tmp_path, file_path)
+        return True
+
+
+@contextmanager
+def _publish_lock() -> Iterator[None]:
+    if fcntl is None:
+        yield
+        return
+    with open(UPLOAD_DIR / PUBLISH_LOCK_FILE, "a+") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def sweep_orphaned_files(grace_seconds: Optional[float] = None, batch_size: int = 500) -> int:
+    """
+    Remove stored files no document points at, and partial uploads, once they are older
+    than the grace period (UPLOAD_ORPHAN_GRACE_SECONDS); they come from failed or cancelled
+    batches and crashed processes. Returns the number of files removed.
+
+    Only content-addressed files are considered, matched to documents by content hash (so
+    moving UPLOAD_DIR cannot orphan anything). A file is re-checked under the publish lock
+    right before it is removed: an upload that published or deduplicated to it in the
+    meantime has reset its age.
+    """
+    grace = settings.UPLOAD_ORPHAN_GRACE_SECONDS if grace_seconds is None else grace_seconds
+    cutoff = time.time() - grace
+    removed = 0
+
+    for entry in os.scandir(INCOMING_DIR):
+        if entry.is_file() and entry.stat().st_mtime < cutoff:
+            Path(entry.path).unlink(missing_ok=True)
+            removed += 1
+
+    candidates = [
+        Path(entry.path)
+        for entry in os.scandir(UPLOAD_DIR)
+        if entry.is_file() and _is_content_hash(Path(entry.name).stem) and entry.stat().st_mtime < cutoff
+    ]
+    for i in range(0, len(candidates), batch_size):
+        batch = candidates[i:i + batch_size]
+        with session_scope() as db:
+            referenced = DocumentRepository(db).referenced_content_hashes(sorted({p.stem for p in batch}))
+        for path in batch:
+            if path.stem in referenced:
+                continue
+            with _publish_lock():
+                try:
+                    if path.stat().st_mtime < cutoff:
+                        path.unlink()
+                        removed += 1
+                except FileNotFoundError:
+                    pass
+    return removed
+
+
+def _is_content_hash(name: str) -> bool:
+    return len(name) == 64 and all(c in "0123456789abcdef" for c in name)
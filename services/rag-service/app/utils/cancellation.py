@@ -0,0 +1,64 @@
+# app/utils/cancellation.py
+
+from __future__ import annotations
+
+import asyncio
+from typing import Awaitable, TypeVar
+
+import anyio
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from starlette.types import Send
+
+T = TypeVar("T")
+
+
+class ClientDisconnected(Exception):
+    """
+    Raised when the HTTP client went away before the work finished.
+    """
+
+
+async def cancel_on_disconnect(request: Request, work: Awaitable[T], poll_seconds: float = 0.25) -> T:
+    """
+    Await `work` while watching the connection. If the client disconnects, the work is
+    cancelled (pending executor jobs are dropped, DB sessions roll back) and
+    ClientDisconnected is raised.
+    """
+    task = asyncio.ensure_future(work)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_seconds)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+                raise ClientDisconnected()
+    finally:
+        # The caller itself was cancelled (e.g. server shutdown): do not leave the work running.
+        if not task.done():
+            task.cancel()
+
+
+class ClosingStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that always closes its body generator when the response ends.
+
+    On a client disconnect Starlette cancels the send loop and drops the generator, whose
+    finally blocks (closing an upstream LLM stream, releasing its slot) would only run
+    whenever it is garbage collected. Here they run right away, shielded from the
+    cancellation that ended the response.
+    """
+
+    async def stream_response(self, send: Send) -> None:
+        try:
+            await super().stream_response(send)
+        finally:
+            aclose = getattr(self.body_iterator, "aclose", None)
+            if aclose is not None:
+                with anyio.CancelScope(shield=True):
+                    await aclose()
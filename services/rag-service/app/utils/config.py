@@ -1,6 +1,6 @@
 # rag-service/app/utils/config.py
 from pathlib import Path
-from typing import Any, List
+from typing import Any, Dict, List, Optional
 from pydantic import field_validator, root_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 import json
@@ -63,15 +63,175 @@ class Settings(BaseSettings):
     CORS_ORIGINS: Any = []
 
     #Chunk
+    # "tokens": token-budgeted chunks (one tokenizer pass, never truncated by the embedder).
+    # "chars": character-based RecursiveCharacterTextSplitter (MAX_CHUNK_SIZE / CHUNK_OVERLAP).
+    CHUNK_STRATEGY: str = "tokens"
     MAX_CHUNK_SIZE: int = 800
     CHUNK_OVERLAP: int = 50
+    # all-MiniLM-L6-v2 truncates at 256 tokens including [CLS] and [SEP]
+    CHUNK_MAX_TOKENS: int = 254
+    CHUNK_OVERLAP_TOKENS: int = 24
+    #Pipeline
+    # "batch": OCR -> chunk -> embed -> upsert, one stage after another.
+    # "streaming": pages flow through bounded queues so OCR of page N+1 overlaps indexing of page N.
+    PIPELINE_MODE: str = "batch"
+    PIPELINE_QUEUE_DEPTH: int = 4  # max OCR'd pages waiting to be indexed (streaming mode)
+    #OCR
+    # Worker processes in the page-sharded OCR pool (each holds its own engine); 0 runs OCR in-process.
+    OCR_POOL_WORKERS: int = 4
+    # Worker processes behind the /ocr endpoint in the API process, started on its first request.
+    # 0 (the default) disables /ocr, so the API does not host OCR engines next to the ingestion worker.
+    OCR_API_POOL_WORKERS: int = 0
+    OCR_POOL_PAGES_PER_SHARD: int = 4
+    # OCR engines loaded and warmed up when the ingestion worker starts
+    WARMUP_OCR_LANGS: List[str] = ["en"]
+    # Born-digital PDF pages with at least this many non-space characters skip OCR.
+    NATIVE_TEXT_LAYER_ENABLED: bool = True
+    NATIVE_TEXT_MIN_CHARS: int = 50
+    # Per-page OCR cache keyed by (file SHA-256, lang, engine version); LRU-evicted above the size cap.
+    OCR_CACHE_ENABLED: bool = True
+    OCR_CACHE_MAX_BYTES: int = 2 * 1024 ** 3
+    #Upload
+    # Read / write block size of the streaming upload path, and threads doing its file and DB I/O
+    UPLOAD_CHUNK_BYTES: int = 1024 * 1024
+    UPLOAD_EXECUTOR_WORKERS: int = 4
+    # Files accepted by one batch upload request
+    UPLOAD_MAX_FILES: int = 50
+    # Stored files no document points at (failed or cancelled batches) are removed by a
+    # periodic sweep once they have been neither published nor deduplicated to for the grace period
+    UPLOAD_ORPHAN_GRACE_SECONDS: float = 3600.0
+    UPLOAD_SWEEP_INTERVAL_SECONDS: float = 600.0
     #RDB
     DATABASE_URL_DEV:str
+    # Async engine used by the search path (asyncpg). Derived from DATABASE_URL_DEV when unset.
+    ASYNC_DATABASE_URL: Optional[str] = None
+    ASYNC_DB_POOL_SIZE: int = 10
+    ASYNC_DB_MAX_OVERFLOW: int = 20
     #VDB
     VECTOR_DB_URL:str
     #LLM
     LLM_MODEL_DEV:str="sentence-transformers/all-MiniLM-L6-v2"
     GEMINI_API_KEY:str
+    GEMINI_MODEL: str = "gemini-2.5-flash"
+    # "gemini", or "fake" for a local deterministic stand-in (tests / load runs)
+    LLM_BACKEND: str = "gemini"
+    FAKE_LLM_DELAY_SECONDS: float = 0.0
+    # Share of fake calls that fail (retryable) / take 10x the delay, for load tests
+    FAKE_LLM_FAILURE_RATE: float = 0.0
+    FAKE_LLM_SLOW_RATE: float = 0.0
+    #LLM client (app/services/llm_client.py)
+    # Calls in flight at once, and the threads running blocking Gemini calls
+    LLM_MAX_CONCURRENCY: int = 8
+    LLM_EXECUTOR_WORKERS: int = 8
+    # Per-attempt timeout, and the deadline of a whole call including retries
+    LLM_TIMEOUT_SECONDS: float = 30.0
+    LLM_DEADLINE_SECONDS: float = 60.0
+    # Retries of transient errors (timeouts, 429 / 5xx), full-jitter exponential backoff
+    LLM_MAX_RETRIES: int = 2
+    LLM_RETRY_BASE_SECONDS: float = 0.5
+    LLM_RETRY_MAX_SECONDS: float = 8.0
+    # Hedging: a second request when the first is slower than this quantile of recent calls
+    LLM_HEDGE_ENABLED: bool = False
+    LLM_HEDGE_QUANTILE: float = 0.95
+    LLM_HEDGE_MIN_SAMPLES: int = 20
+    # Circuit breaker: open after this many consecutive failures, retry after the reset time
+    LLM_BREAKER_FAILURES: int = 5
+    LLM_BREAKER_RESET_SECONDS: float = 30.0
+    #Answer cache (keyed by normalized query, ordered chunk ids, model, prompt version)
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_MAX_ENTRIES: int = 512
+    ANSWER_CACHE_TTL_SECONDS: float = 3600.0
+    # Semantic mode: reuse an answer for the same chunks when the query embeddings are at
+    # least this similar (cosine). None disables it.
+    ANSWER_CACHE_SIMILARITY: Optional[float] = None
+    #Query embedding micro-batching (/search)
+    EMBED_BATCH_MAX_SIZE: int = 32
+    EMBED_BATCH_MAX_WAIT_MS: float = 5.0
+    #Search executors (bounded thread pools for blocking model / vector-store calls)
+    SEARCH_EMBEDDING_EXECUTOR_WORKERS: int = 2
+    SEARCH_VECTOR_EXECUTOR_WORKERS: int = 4
+    # How often a running /search checks whether the client is still connected
+    SEARCH_DISCONNECT_POLL_SECONDS: float = 0.25
+    #Hybrid search (in-process BM25 index fused with vector results by reciprocal rank fusion)
+    # Default /search mode: "vector" or "hybrid"
+    SEARCH_MODE: str = "vector"
+    LEXICAL_INDEX_ENABLED: bool = True
+    # How often the API process picks up index writes from the chunks table (BM25 index
+    # refresh + search cache invalidation); bounds how stale cached results can be.
+    INDEX_SYNC_INTERVAL_SECONDS: float = 10.0
+    BM25_K1: float = 1.2
+    BM25_B: float = 0.75
+    # Each retriever returns top_k * this many candidates before fusion
+    HYBRID_CANDIDATE_MULTIPLIER: int = 3
+    RRF_K: int = 60
+    #Search result cache (query-embedding LRU + hit-list LRU keyed by index version)
+    SEARCH_CACHE_ENABLED: bool = True
+    SEARCH_CACHE_MAX_EMBEDDINGS: int = 4096
+    SEARCH_CACHE_MAX_RESULTS: int = 1024
+    #Reranking (local cross-encoder over the retrieved candidates; only the best top_k reach the LLM)
+    # Default for requests that do not set "rerank"
+    RERANK_ENABLED: bool = False
+    RERANK_MODEL: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    # Candidates retrieved and scored per query, and the hits kept when the request has no top_k
+    RERANK_CANDIDATES: int = 24
+    RERANK_TOP_K: int = 3
+    # Per-request budget for scoring; past it the candidates keep their retrieval order
+    RERANK_TIMEOUT_MS: float = 200.0
+    RERANK_BATCH_SIZE: int = 32
+    RERANK_CACHE_MAX_ENTRIES: int = 8192
+    SEARCH_RERANK_EXECUTOR_WORKERS: int = 1
+    #Context packing (hits -> prompt context): merge overlapping / adjacent chunks of a document,
+    # drop near duplicates, and keep the best-ranked hits within a token budget
+    CONTEXT_PACKING_ENABLED: bool = True
+    # Budget in embedding-tokenizer tokens
+    CONTEXT_MAX_TOKENS: int = 2048
+    # Character 5-gram Jaccard similarity from which two chunks count as duplicates
+    CONTEXT_DEDUP_SIMILARITY: float = 0.9
+    SEARCH_CONTEXT_EXECUTOR_WORKERS: int = 2
+    #Search hydration (hits -> chunk rows): "sql" (one projected query), "cache" (row LRU in
+    # front of it) or "vector" (trust Chroma's stored text / metadata when its content_hash
+    # matches, the rest via the row cache)
+    SEARCH_HYDRATION: str = "cache"
+    CHUNK_ROW_CACHE_MAX_ENTRIES: int = 20_000
+    #Vector index backend: "chroma", or "mmap" (embedded memory-mapped NumPy matrix under
+    # VECTOR_DB_URL, rows grouped per document; exact search)
+    VECTOR_BACKEND: str = "chroma"
+    # Storage of the mmap backend: "float32", "float16" or "int8" (per-dimension calibrated).
+    # float16 / int8 keep a float32 copy on disk and rescore the best
+    # top_k * VECTOR_RESCORE_MULTIPLIER candidates with it (1 = no rescoring).
+    # See benchmarks/bench_quantization.py for recall vs. memory.
+    VECTOR_MMAP_DTYPE: str = "float32"
+    VECTOR_RESCORE_MULTIPLIER: int = 4
+    # Store chunk text in Chroma as well. Off: Postgres is the only copy ("vector"
+    # hydration then always falls back).
+    VECTOR_STORE_DOCUMENTS: bool = True
+    # Partitioned index: one collection per user, and one per large document, with a routing
+    # table under VECTOR_DB_URL. Off: every vector goes to the single rag_chunks collection.
+    VECTOR_PARTITIONING: bool = False
+    # A document gets a partition of its own from this many chunks (previous run) or this file size
+    VECTOR_PARTITION_LARGE_DOCUMENT_CHUNKS: int = 5_000
+    VECTOR_PARTITION_LARGE_DOCUMENT_BYTES: int = 50 * 1024 * 1024
+    #Batch search (/search/batch)
+    SEARCH_BATCH_MAX_QUERIES: int = 256
+    # Concurrent LLM calls when a batch asks for answers
+    SEARCH_BATCH_ANSWER_CONCURRENCY: int = 4
+    # Batch retrieval runs on its own pool, so evaluation batches never queue in front of
+    # interactive /search query encoding
+    SEARCH_BATCH_EXECUTOR_WORKERS: int = 1
+    #Embedding cache (memory-mapped, keyed by model + normalize flag + text hash)
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_DIR: str = str(Path(__file__).resolve().parent.parent / "embedding_cache")
+    EMBEDDING_CACHE_CAPACITY: int = 200_000  # max cached vectors (LRU)
+    #Job Queue
+    # Defaults to DATABASE_URL_DEV. Point it at e.g. "sqlite:///./jobs.db" to run the queue locally.
+    JOB_QUEUE_DATABASE_URL: Optional[str] = None
+    # Number of concurrent job slots per stage in one worker process, e.g. {"ingest": 2}
+    JOB_STAGE_CONCURRENCY: Dict[str, int] = {"ingest": 2}
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_VISIBILITY_TIMEOUT_SECONDS: int = 600
+    JOB_RETRY_BACKOFF_SECONDS: float = 5.0
+    JOB_RETRY_BACKOFF_MAX_SECONDS: float = 300.0
+    JOB_POLL_INTERVAL_SECONDS: float = 1.0
 
     @field_validator("CORS_ORIGINS", mode="before")
     @classmethod
@@ -0,0 +1,47 @@
+# app/utils/executors.py
+
+from __future__ import annotations
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+
+from app.utils.config import settings
+
+
+def _max_workers(name: str) -> int:
+    sizes = {
+        "embedding": settings.SEARCH_EMBEDDING_EXECUTOR_WORKERS,
+        "vector": settings.SEARCH_VECTOR_EXECUTOR_WORKERS,
+        "rerank": settings.SEARCH_RERANK_EXECUTOR_WORKERS,
+        "context": settings.SEARCH_CONTEXT_EXECUTOR_WORKERS,
+        "batch": settings.SEARCH_BATCH_EXECUTOR_WORKERS,
+        "llm": settings.LLM_EXECUTOR_WORKERS,
+        "upload": settings.UPLOAD_EXECUTOR_WORKERS,
+    }
+    return max(int(sizes.get(name, 4)), 1)
+
+
+_EXECUTORS: Dict[str, ThreadPoolExecutor] = {}
+_EXECUTORS_LOCK = threading.Lock()
+
+def get_executor(name: str) -> ThreadPoolExecutor:
+    """
+    Named, size-limited thread pool for blocking calls made from async code.
+
+    Keeping model inference and vector-store queries on their own pools (instead of the
+    default loop executor) bounds how many of each run at once and keeps them from
+    starving each other or the rest of the app.
+    """
+    with _EXECUTORS_LOCK:
+        executor = _EXECUTORS.get(name)
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=_max_workers(name), thread_name_prefix=name)
+            _EXECUTORS[name] = executor
+        return executor
+
+def shutdown_executors() -> None:
+    with _EXECUTORS_LOCK:
+        for executor in _EXECUTORS.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+        _EXECUTORS.clear()
@@ -0,0 +1,17 @@
+# app/utils/hashing.py
+import hashlib
+
+_CHUNK_SIZE = 1024 * 1024  # 1 MiB
+
+def chunk_content_hash(text: str) -> str:
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+def sha256_file(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while True:
+            block = f.read(_CHUNK_SIZE)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
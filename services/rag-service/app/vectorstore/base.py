@@ -0,0 +1,88 @@
+# app/vectorstore/base.py
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, List, Optional, Protocol, runtime_checkable
+
+from app.vectorstore.schemas import ChunkVectorMeta
+
+
+@dataclass
+class VectorHit:
+    id: str
+    # Cosine distance to the query; None for a hybrid hit only the lexical index holds.
+    distance: Optional[float]
+    document: Optional[str]
+    metadata: dict[str, Any]
+    # Fused retrieval score (hybrid search); None for plain vector search.
+    score: Optional[float] = None
+
+
+@runtime_checkable
+class VectorRepository(Protocol):
+    """
+    Vector index used by ingestion and search. Postgres stays the source of truth;
+    an implementation only has to be a rebuildable index over chunk embeddings.
+
+    Distances are cosine distances (0 = same direction). Every write bumps the index
+    version of the documents it touches (app.vectorstore.index_version).
+
+    user_id restricts reads to vectors whose metadata names that owner (vectors written
+    without one never match); document_id on existing_ids is a routing hint only.
+    """
+
+    store_documents: bool
+
+    def upsert_chunks(
+        self,
+        *,
+        chunk_ids: List[str],
+        embeddings: List[list[float]],
+        documents: List[str],
+        metadatas: List[ChunkVectorMeta],
+    ) -> None: ...
+
+    def update_metadatas(self, *, chunk_ids: List[str], metadatas: List[ChunkVectorMeta]) -> None: ...
+
+    def existing_ids(self, chunk_ids: List[str], document_id: Optional[str] = None) -> set[str]: ...
+
+    def delete_by_ids(self, chunk_ids: List[str], document_id: Optional[str] = None) -> None: ...
+
+    def delete_by_document(self, document_id: str) -> None: ...
+
+    def query(
+        self,
+        *,
+        query_embedding: list[float],
+        top_k: int = 5,
+        document_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+    ) -> List[VectorHit]: ...
+
+    def query_many(
+        self,
+        *,
+        query_embeddings: List[list[float]],
+        top_k: int = 5,
+        document_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+    ) -> List[List[VectorHit]]: ...
+
+    def get_hits(
+        self,
+        *,
+        chunk_ids: List[str],
+        query_embedding: list[float],
+        user_id: Optional[str] = None,
+    ) -> List[VectorHit]: ...
+
+    def get_hits_many(
+        self,
+        *,
+        chunk_ids: List[List[str]],
+        query_embeddings: List[list[float]],
+        user_id: Optional[str] = None,
+    ) -> List[List[VectorHit]]: ...
+
+    def count(self) -> int: ...
@@ -2,31 +2,28 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
 from typing import Any, Optional, List
 
 import chromadb
+import numpy as np
 from chromadb.api.models.Collection import Collection
 
+from app.vectorstore.base import VectorHit
+from app.vectorstore.index_version import index_versions
 from app.vectorstore.schemas import ChunkVectorMeta
 
 
-@dataclass
-class VectorHit:
-    id: str
-    distance: float
-    document: Optional[str]
-    metadata: dict[str, Any]
-
-
 class ChromaVectorRepository:
     """
-    A thin wrapper over Chroma.
+    A thin wrapper over Chroma (VectorRepository implementation).
     - Keep Postgres as source of truth.
     - Treat Chroma as rebuildable index.
     """
 
-    def __init__(self, persist_dir: str, collection_name: str):
+    def __init__(self, persist_dir: str, collection_name: str, store_documents: bool = True):
+        # store_documents=False keeps chunk text only in Postgres (no duplicate copy in Chroma);
+        # hits then carry document=None and search hydrates text from Postgres.
+        self.store_documents = store_documents
         self._client = chromadb.PersistentClient(path=persist_dir)
         self._collection: Collection = self._client.get_or_create_collection(
             name=collection_name,
@@ -37,6 +34,9 @@ class ChromaVectorRepository:
     def collection(self) -> Collection:
         return self._collection
 
+    def count(self) -> int:
+        return self._collection.count()
+
     def upsert_chunks(
         self,
         *,
@@ -62,9 +62,38 @@ class ChromaVectorRepository:
         self._collection.add(
             ids=ids,
             embeddings=embeddings,
-            documents=documents,
+            documents=documents if self.store_documents else None,
             metadatas=metas,
         )
+        self._bump_versions(metadatas)
+
+    def update_metadatas(self, *, chunk_ids: List[str], metadatas: List[ChunkVectorMeta]) -> None:
+        """
+        Update positional metadata of existing vectors without touching their embeddings.
+        """
+        if not chunk_ids:
+            return
+        self._collection.update(
+            ids=[str(x) for x in chunk_ids],
+            metadatas=[m.model_dump(exclude_none=True) for m in metadatas],
+        )
+        self._bump_versions(metadatas)
+
+    def existing_ids(self, chunk_ids: List[str], document_id: Optional[str] = None) -> set[str]:
+        if not chunk_ids:
+            return set()
+        res = self._collection.get(ids=[str(x) for x in chunk_ids], include=[])
+        return set(res.get("ids") or [])
+
+    def delete_by_ids(self, chunk_ids: List[str], document_id: Optional[str] = None) -> None:
+        if not chunk_ids:
+            return
+        self._collection.delete(ids=[str(x) for x in chunk_ids])
+        if document_id is not None:
+            index_versions.bump(document_id)
+        else:
+            # The owning documents are unknown: invalidate every document.
+            index_versions.bump_all()
 
     def query(
         self,
@@ -72,8 +101,9 @@ class ChromaVectorRepository:
         query_embedding: list[float],
         top_k: int = 5,
         document_id: Optional[str] = None,
+        user_id: Optional[str] = None,
     ) -> List[VectorHit]:
-        where = {"document_id": document_id} if document_id else None
+        where = _where(document_id, user_id)
 
         res = self._collection.query(
             query_embeddings=[query_embedding],
@@ -100,8 +130,123 @@ class ChromaVectorRepository:
             )
         return hits
 
+    def query_many(
+        self,
+        *,
+        query_embeddings: List[list[float]],
+        top_k: int = 5,
+        document_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+    ) -> List[List[VectorHit]]:
+        """
+        Batched query: every embedding goes to Chroma in one collection.query call.
+        Returns one hit list per query embedding, in order.
+        """
+        if not query_embeddings:
+            return []
+        where = _where(document_id, user_id)
+
+        res = self._collection.query(
+            query_embeddings=list(query_embeddings),
+            n_results=top_k,
+            where=where,
+            include=["metadatas", "documents", "distances"],
+        )
+
+        all_ids = res.get("ids") or []
+        all_dists = res.get("distances") or []
+        all_docs = res.get("documents") or []
+        all_metas = res.get("metadatas") or []
+
+        results: List[List[VectorHit]] = []
+        for q in range(len(query_embeddings)):
+            ids = all_ids[q] if q < len(all_ids) else []
+            dists = all_dists[q] if q < len(all_dists) else []
+            docs = all_docs[q] if q < len(all_docs) else []
+            metas = all_metas[q] if q < len(all_metas) else []
+            results.append([
+                VectorHit(
+                    id=_id,
+                    distance=float(dists[i]) if dists and i < len(dists) else 0.0,
+                    document=docs[i] if docs and i < len(docs) else None,
+                    metadata=metas[i] if metas and i < len(metas) else {},
+                )
+                for i, _id in enumerate(ids)
+            ])
+        return results
+
+    def get_hits(self, *, chunk_ids: List[str], query_embedding: list[float], user_id: Optional[str] = None) -> List[VectorHit]:
+        """
+        Fetch stored vectors by id and score them against the query (cosine distance),
+        for candidates found by another retriever.
+        """
+        return self.get_hits_many(chunk_ids=[chunk_ids], query_embeddings=[query_embedding], user_id=user_id)[0]
+
+    def get_hits_many(
+        self,
+        *,
+        chunk_ids: List[List[str]],
+        query_embeddings: List[list[float]],
+        user_id: Optional[str] = None,
+    ) -> List[List[VectorHit]]:
+        """
+        get_hits for several queries at once: the union of ids is fetched in one
+        collection.get, then each query's ids are scored against its own embedding.
+        With user_id, ids owned by another user are left out.
+        """
+        union = list(dict.fromkeys(str(x) for ids in chunk_ids for x in ids))
+        if not union:
+            return [[] for _ in chunk_ids]
+        res = self._collection.get(
+            ids=union,
+            where=_where(None, user_id),
+            include=["embeddings", "metadatas", "documents"],
+        )
+        ids = res.get("ids") or []
+        embeddings = res.get("embeddings")
+        docs = res.get("documents") or []
+        metas = res.get("metadatas") or []
+        row_by_id = {_id: i for i, _id in enumerate(ids)}
+
+        matrix = None
+        norms = None
+        if embeddings is not None and len(embeddings):
+            matrix = np.asarray(embeddings, dtype=np.float32)
+            norms = np.linalg.norm(matrix, axis=1)
+
+        results: List[List[VectorHit]] = []
+        for wanted, query_embedding in zip(chunk_ids, query_embeddings):
+            rows = [row_by_id[str(x)] for x in wanted if str(x) in row_by_id]
+            distances = [0.0] * len(rows)
+            if matrix is not None and rows:
+                q = np.asarray(query_embedding, dtype=np.float32)
+                denom = norms[rows] * (np.linalg.norm(q) or 1.0)
+                distances = (1.0 - (matrix[rows] @ q) / np.where(denom == 0, 1.0, denom)).tolist()
+            results.append([
+                VectorHit(
+                    id=ids[row],
+                    distance=float(distances[i]),
+                    document=docs[row] if row < len(docs) else None,
+                    metadata=metas[row] if row < len(metas) and metas[row] else {},
+                )
+                for i, row in enumerate(rows)
+            ])
+        return results
+
     def delete_by_document(self, document_id: str) -> None:
         """
         Delete all vectors belonging to a document.
         """
         self._collection.delete(where={"document_id": document_id})
+        index_versions.bump(document_id)
+
+    def _bump_versions(self, metadatas: List[ChunkVectorMeta]) -> None:
+        for document_id in {m.document_id for m in metadatas}:
+            index_versions.bump(document_id)
+
+
+def _where(document_id: Optional[str], user_id: Optional[str]) -> Optional[dict]:
+    clauses = [{k: str(v)} for k, v in (("document_id", document_id), ("user_id", user_id)) if v]
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
@@ -0,0 +1,73 @@
+# app/vectorstore/index_version.py
+
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict, Mapping, Optional
+
+
+class IndexVersions:
+    """
+    Monotonic version counters for the vector index: one global, one per document.
+
+    Every write that can change search results bumps the document's counter and the
+    global one. Caches put the version in their keys, so a write makes old entries
+    unreachable instead of having to find and delete them.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._global = 0
+        self._epoch = 0  # bumped when writes cannot be attributed to a document
+        self._documents: Dict[str, int] = {}
+        self._signatures: Dict[str, Any] = {}
+        self._initialized = False
+
+    def bump(self, document_id: Optional[str] = None) -> None:
+        with self._lock:
+            self._global += 1
+            if document_id is not None:
+                key = str(document_id)
+                self._documents[key] = self._documents.get(key, 0) + 1
+
+    def bump_all(self) -> None:
+        with self._lock:
+            self._global += 1
+            self._epoch += 1
+
+    def get(self, document_id: Optional[str] = None) -> int:
+        """
+        Version for results filtered to document_id, or for unfiltered results (global).
+        """
+        with self._lock:
+            if document_id is None:
+                return self._global
+            # Both terms only grow, so the sum never repeats a previous value.
+            return self._epoch + self._documents.get(str(document_id), 0)
+
+    def observe(self, signatures: Mapping[Any, Any]) -> int:
+        """
+        Feed per-document change markers read from the database (writes made by other
+        processes, e.g. the ingestion worker). Documents whose marker changed or that
+        disappeared are bumped; returns how many were.
+        """
+        current = {str(k): v for k, v in signatures.items()}
+        with self._lock:
+            first = not self._initialized
+            self._initialized = True
+            changed = [
+                doc_id for doc_id in set(current) | set(self._signatures)
+                if current.get(doc_id) != self._signatures.get(doc_id)
+            ]
+            self._signatures = current
+        if first:
+            # Baseline (an empty table is a baseline too): results cached before the first
+            # sync were computed against an unseen state, so they are all invalidated at once.
+            self.bump_all()
+            return 0
+        for doc_id in changed:
+            self.bump(doc_id)
+        return len(changed)
+
+
+index_versions = IndexVersions()
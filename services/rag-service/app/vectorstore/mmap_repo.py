@@ -0,0 +1,623 @@
+# app/vectorstore/mmap_repo.py
+
+from __future__ import annotations
+
+import bisect
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.vectorstore.base import VectorHit
+from app.vectorstore.index_version import index_versions
+from app.vectorstore.quantization import STORAGE_DTYPES, Int8Calibration
+from app.vectorstore.schemas import ChunkVectorMeta
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX: single writer process assumed
+    fcntl = None
+
+MANIFEST = "manifest.json"
+LOCK_FILE = ".lock"
+SEGMENT_DIR = "segments"
+
+# (vector, stored text, metadata dict) of one incoming row
+_Row = Tuple[np.ndarray, Optional[str], Dict[str, Any]]
+
+
+@dataclass
+class _Segment:
+    """
+    One document's rows: matrix rows [start, start + len(ids)) of the data file.
+    """
+    start: int
+    rev: int
+    ids: List[str]
+    metadatas: List[Dict[str, Any]]
+    documents: List[Optional[str]]
+
+
+@dataclass
+class _View:
+    """
+    Immutable snapshot readers work on: a new one is built after every reload.
+    """
+    segments: Dict[str, _Segment]
+    # rows as stored (float32 / float16 / int8 codes)
+    matrix: Optional[np.ndarray]
+    # float32 copy on disk for compressed storage (rescoring, rewrites); None for float32
+    full: Optional[np.ndarray]
+    calibration: Optional[Int8Calibration]
+    # segment starts (sorted) and their document ids, for row -> document lookups
+    starts: List[int]
+    owners: List[str]
+    # chunk id -> (document id, position in its segment)
+    rows: Dict[str, Tuple[str, int]]
+
+
+class MmapVectorRepository:
+    """
+    Embedded VectorRepository: embeddings live in one memory-mapped matrix file
+    (float32, float16 or int8), L2-normalized, with each document's rows stored contiguously.
+
+    - document_id-filtered queries are an exact, vectorized dot product over that
+      document's slice (no HNSW, no metadata filter);
+    - unfiltered queries scan the live rows in blocks and keep a running top-k;
+    - writes are log-structured: a changed document's rows are re-appended at the end and
+      its old rows become garbage, reclaimed by compaction into a new data file;
+    - per-document ids / metadata / text live in segment files and manifest.json maps
+      documents to row ranges; both are replaced atomically, so several processes can map
+      the same files, and readers re-map (and re-read changed segments) when it changes;
+    - compressed storage (float16, or int8 with per-dimension calibration) keeps a float32
+      copy in a second file with the same row layout. Queries rank on the compressed rows,
+      then rescore the best top_k * rescore_multiplier candidates against the float32 rows,
+      so only the compressed matrix has to stay in memory.
+    """
+
+    def __init__(
+        self,
+        persist_dir: str,
+        collection_name: str,
+        store_documents: bool = True,
+        dtype: str = "float32",
+        block_rows: int = 65_536,
+        compact_min_rows: int = 10_000,
+        rescore_multiplier: int = 4,
+    ):
+        if dtype not in STORAGE_DTYPES:
+            raise ValueError(f"Unsupported vector dtype: {dtype}")
+        self.store_documents = store_documents
+        self.rescore_multiplier = max(int(rescore_multiplier), 1)
+        self.block_rows = max(int(block_rows), 1)
+        self.compact_min_rows = compact_min_rows
+        self.dir = os.path.join(persist_dir, collection_name)
+        os.makedirs(os.path.join(self.dir, SEGMENT_DIR), exist_ok=True)
+
+        self._lock = threading.RLock()
+        # manifest: dim, dtype, data_file, full_file, calibration, generation, rows,
+        # documents {doc_id: {start, count, rev}}. An existing collection keeps its dtype.
+        self._manifest: Dict[str, Any] = {
+            "dim": None,
+            "dtype": dtype,
+            "data_file": "vectors.0.bin",
+            "full_file": "full.0.bin" if dtype != "float32" else None,
+            "calibration": None,
+            "generation": 0,
+            "rows": 0,
+            "documents": {},
+        }
+        self._stamp: Optional[Tuple[int, int, int]] = None
+        self._view = _View({}, None, None, None, [], [], {})
+        self._reload()
+
+    # -------------------------
+    # Reads
+    # -------------------------
+
+    def count(self) -> int:
+        return len(self._current().rows)
+
+    def existing_ids(self, chunk_ids: List[str], document_id: Optional[str] = None) -> set[str]:
+        rows = self._current().rows
+        return {str(x) for x in chunk_ids if str(x) in rows}
+
+    def query(
+        self,
+        *,
+        query_embedding: list[float],
+        top_k: int = 5,
+        document_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+    ) -> List[VectorHit]:
+        return self.query_many(query_embeddings=[query_embedding], top_k=top_k, document_id=document_id, user_id=user_id)[0]
+
+    def query_many(
+        self,
+        *,
+        query_embeddings: List[list[float]],
+        top_k: int = 5,
+        document_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+    ) -> List[List[VectorHit]]:
+        if not query_embeddings:
+            return []
+        view = self._current()
+        if view.matrix is None or top_k <= 0:
+            return [[] for _ in query_embeddings]
+        queries = _normalize(np.asarray(query_embeddings, dtype=np.float32))
+
+        if document_id:
+            seg = view.segments.get(str(document_id))
+            if seg is None or not seg.ids or not _owned_by(seg, user_id):
+                return [[] for _ in query_embeddings]
+            ranges = [(seg.start, seg.start + len(seg.ids))]
+        else:
+            ranges = self._live_ranges(view, user_id)
+
+        # Compressed rows only rank candidates; the float32 copy decides the final order.
+        rescore = view.full is not None and self.rescore_multiplier > 1
+        candidates = top_k * self.rescore_multiplier if rescore else top_k
+
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        for lo, hi in ranges:
+            for block_lo in range(lo, hi, self.block_rows):
+                block_hi = min(block_lo + self.block_rows, hi)
+                scores = self._scores(view, view.matrix[block_lo:block_hi], queries)
+                rows = np.broadcast_to(np.arange(block_lo, block_hi, dtype=np.int64), scores.shape)
+                best_scores, best_rows = _merge_top_k(best_scores, best_rows, scores, rows, candidates)
+
+        if rescore:
+            for q in range(len(queries)):
+                live = np.isfinite(best_scores[q])
+                rows = np.sort(best_rows[q][live])
+                best_scores[q, :] = -np.inf
+                best_scores[q, :len(rows)] = np.asarray(view.full[rows], dtype=np.float32) @ queries[q]
+                best_rows[q, :len(rows)] = rows
+            keep = min(top_k, best_scores.shape[1])
+            order = np.argsort(-best_scores, axis=1)[:, :keep]
+            best_scores = np.take_along_axis(best_scores, order, axis=1)
+            best_rows = np.take_along_axis(best_rows, order, axis=1)
+
+        results: List[List[VectorHit]] = []
+        for q in range(len(queries)):
+            order = np.argsort(-best_scores[q])
+            results.append([
+                self._hit(view, int(best_rows[q, i]), float(best_scores[q, i]))
+                for i in order
+                if np.isfinite(best_scores[q, i])
+            ])
+        return results
+
+    def get_hits(self, *, chunk_ids: List[str], query_embedding: list[float], user_id: Optional[str] = None) -> List[VectorHit]:
+        return self.get_hits_many(chunk_ids=[chunk_ids], query_embeddings=[query_embedding], user_id=user_id)[0]
+
+    def get_hits_many(
+        self,
+        *,
+        chunk_ids: List[List[str]],
+        query_embeddings: List[list[float]],
+        user_id: Optional[str] = None,
+    ) -> List[List[VectorHit]]:
+        view = self._current()
+        results: List[List[VectorHit]] = []
+        for wanted, query_embedding in zip(chunk_ids, query_embeddings):
+            rows = [
+                self._global_row(view, str(x))
+                for x in wanted
+                if str(x) in view.rows and _owned_by(view.segments[view.rows[str(x)][0]], user_id)
+            ]
+            if not rows or view.matrix is None:
+                results.append([])
+                continue
+            q = _normalize(np.asarray([query_embedding], dtype=np.float32))[0]
+            scores = np.asarray(self._float_rows(view)[rows], dtype=np.float32) @ q
+            results.append([self._hit(view, row, float(score)) for row, score in zip(rows, scores)])
+        return results
+
+    # -------------------------
+    # Writes
+    # -------------------------
+
+    def upsert_chunks(
+        self,
+        *,
+        chunk_ids: List[str],
+        embeddings: List[list[float]],
+        documents: List[str],
+        metadatas: List[ChunkVectorMeta],
+    ) -> None:
+        if not chunk_ids:
+            return
+        vectors = _normalize(np.asarray(embeddings, dtype=np.float32))
+        incoming: Dict[str, Dict[str, _Row]] = {}
+        for cid, vec, doc, meta in zip(chunk_ids, vectors, documents, metadatas):
+            incoming.setdefault(str(meta.document_id), {})[str(cid)] = (
+                vec,
+                doc if self.store_documents else None,
+                meta.model_dump(exclude_none=True),
+            )
+
+        with self._writing() as (manifest, changed):
+            dim = manifest["dim"]
+            if dim is None:
+                manifest["dim"] = dim = int(vectors.shape[1])
+            elif vectors.shape[1] != dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match the index ({dim})")
+
+            # An id moving to another document leaves its old document.
+            rows = self._view.rows
+            moved = {cid for doc_rows in incoming.values() for cid in doc_rows}
+            for doc_id in {rows[cid][0] for cid in moved if cid in rows} - set(incoming):
+                self._rewrite(manifest, changed, doc_id, drop=moved)
+
+            for doc_id, doc_rows in incoming.items():
+                self._rewrite(manifest, changed, doc_id, drop=set(doc_rows), add=doc_rows)
+            self._maybe_compact(manifest)
+        for doc_id in incoming:
+            index_versions.bump(doc_id)
+
+    def update_metadatas(self, *, chunk_ids: List[str], metadatas: List[ChunkVectorMeta]) -> None:
+        """
+        Update positional metadata of existing vectors without touching their embeddings.
+        """
+        if not chunk_ids:
+            return
+        with self._writing() as (manifest, changed):
+            for cid, meta in zip(chunk_ids, metadatas):
+                doc_id = str(meta.document_id)
+                seg = changed.get(doc_id) or self._view.segments.get(doc_id)
+                if seg is None or str(cid) not in seg.ids:
+                    continue
+                if doc_id not in changed:
+                    seg = changed[doc_id] = _Segment(seg.start, _next_rev(manifest), seg.ids, list(seg.metadatas), seg.documents)
+                    manifest["documents"][doc_id] = {"start": seg.start, "count": len(seg.ids), "rev": seg.rev}
+                seg.metadatas[seg.ids.index(str(cid))] = meta.model_dump(exclude_none=True)
+            touched = list(changed)
+        for doc_id in touched:
+            index_versions.bump(doc_id)
+
+    def delete_by_ids(self, chunk_ids: List[str], document_id: Optional[str] = None) -> None:
+        if not chunk_ids:
+            return
+        drop = {str(x) for x in chunk_ids}
+        with self._writing() as (manifest, changed):
+            rows = self._view.rows
+            for doc_id in {rows[cid][0] for cid in drop if cid in rows}:
+                self._rewrite(manifest, changed, doc_id, drop=drop)
+            self._maybe_compact(manifest)
+            touched = list(changed)
+        for doc_id in touched:
+            index_versions.bump(doc_id)
+
+    def delete_by_document(self, document_id: str) -> None:
+        """
+        Delete all vectors belonging to a document.
+        """
+        with self._writing() as (manifest, changed):
+            if manifest["documents"].pop(str(document_id), None) is not None:
+                changed[str(document_id)] = None
+            self._maybe_compact(manifest)
+        index_versions.bump(str(document_id))
+
+    # -------------------------
+    # Internals
+    # -------------------------
+
+    def _rewrite(
+        self,
+        manifest: Dict[str, Any],
+        changed: Dict[str, Optional[_Segment]],
+        doc_id: str,
+        drop: set,
+        add: Optional[Dict[str, _Row]] = None,
+    ) -> None:
+        """
+        Re-append a document's segment without the `drop` ids and with the `add` rows.
+        """
+        old = self._view.segments.get(doc_id)
+        keep = [i for i, cid in enumerate(old.ids) if cid not in drop] if old else []
+        add = add or {}
+
+        parts = []
+        if keep:
+            parts.append(np.asarray(self._float_rows(self._view)[[old.start + i for i in keep]], dtype=np.float32))
+        if add:
+            parts.append(np.stack([vec for vec, _, _ in add.values()]))
+        if not parts:
+            manifest["documents"].pop(doc_id, None)
+            changed[doc_id] = None
+            return
+
+        seg = _Segment(
+            start=self._append(manifest, np.concatenate(parts)),
+            rev=_next_rev(manifest),
+            ids=[old.ids[i] for i in keep] + list(add),
+            metadatas=[old.metadatas[i] for i in keep] + [meta for _, _, meta in add.values()],
+            documents=[old.documents[i] for i in keep] + [doc for _, doc, _ in add.values()],
+        )
+        manifest["documents"][doc_id] = {"start": seg.start, "count": len(seg.ids), "rev": seg.rev}
+        changed[doc_id] = seg
+
+    def _append(self, manifest: Dict[str, Any], vectors: np.ndarray) -> int:
+        start = manifest["rows"]
+        dtype = manifest["dtype"]
+        if dtype == "int8":
+            if manifest["calibration"] is None:
+                # First rows calibrate the quantizer; compaction recalibrates on all rows.
+                manifest["calibration"] = Int8Calibration.fit(vectors).to_dict()
+            stored = Int8Calibration.from_dict(manifest["calibration"]).quantize(vectors)
+        else:
+            stored = vectors.astype(dtype)
+        _write_rows(os.path.join(self.dir, manifest["data_file"]), start, stored)
+        if manifest["full_file"]:
+            _write_rows(os.path.join(self.dir, manifest["full_file"]), start, vectors.astype(np.float32))
+        manifest["rows"] = start + len(vectors)
+        return start
+
+    def recalibrate(self) -> None:
+        """
+        Rewrite the collection now, fitting the int8 quantizer on all current rows
+        (compaction does this too). Useful after a small first batch calibrated it.
+        """
+        with self._writing() as (manifest, _):
+            self._maybe_compact(manifest, force=True)
+
+    def _maybe_compact(self, manifest: Dict[str, Any], force: bool = False) -> None:
+        live = sum(entry["count"] for entry in manifest["documents"].values())
+        garbage = manifest["rows"] - live
+        if not force and garbage <= max(live, self.compact_min_rows):
+            return
+        if not manifest["rows"]:
+            return
+
+        old = self._float_matrix(manifest)
+        entries = list(manifest["documents"].values())
+        if manifest["dtype"] == "int8" and entries:
+            sample = np.concatenate([np.asarray(old[e["start"]:e["start"] + e["count"]]) for e in entries])
+            if len(sample) > 100_000:
+                sample = sample[np.random.default_rng(0).choice(len(sample), 100_000, replace=False)]
+            manifest["calibration"] = Int8Calibration.fit(sample).to_dict()
+
+        manifest["_obsolete"] = [manifest["data_file"], manifest["full_file"]]
+        manifest["generation"] += 1
+        manifest["data_file"] = f"vectors.{manifest['generation']}.bin"
+        if manifest["full_file"]:
+            manifest["full_file"] = f"full.{manifest['generation']}.bin"
+        manifest["rows"] = 0
+        # Row ranges live in the manifest only; segment files (ids / metadata) stay as they are.
+        for entry in entries:
+            block = np.asarray(old[entry["start"]:entry["start"] + entry["count"]], dtype=np.float32)
+            entry["start"] = self._append(manifest, block)
+
+    def _matrix(self, manifest: Dict[str, Any], full: bool = False) -> np.ndarray:
+        # The data file as of `manifest` (which may be ahead of the current view mid-write).
+        return np.memmap(
+            os.path.join(self.dir, manifest["full_file"] if full else manifest["data_file"]),
+            dtype=np.float32 if full else manifest["dtype"],
+            mode="r",
+            shape=(manifest["rows"], manifest["dim"]),
+        )
+
+    def _float_matrix(self, manifest: Dict[str, Any]) -> np.ndarray:
+        return self._matrix(manifest, full=bool(manifest["full_file"]))
+
+    @staticmethod
+    def _float_rows(view: _View) -> np.ndarray:
+        return view.full if view.full is not None else view.matrix
+
+    @staticmethod
+    def _scores(view: _View, block: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        if view.calibration is not None:
+            return view.calibration.scores(np.asarray(block), queries)
+        return queries @ np.asarray(block, dtype=np.float32).T
+
+    def _segment_path(self, doc_id: str, rev: int) -> str:
+        name = hashlib.sha1(doc_id.encode("utf-8")).hexdigest()
+        return os.path.join(self.dir, SEGMENT_DIR, f"{name}.{rev}.json")
+
+    @contextmanager
+    def _writing(self) -> Iterator[Tuple[Dict[str, Any], Dict[str, Optional[_Segment]]]]:
+        """
+        Serialize writers (threads and processes), start from the latest manifest and
+        publish the edit atomically: changed segment files first, then the manifest.
+        Yields (manifest copy, changed segments: doc_id -> new segment, None = removed).
+        """
+        with self._lock, self._file_lock():
+            self._reload()
+            manifest = {**self._manifest, "documents": {k: dict(v) for k, v in self._manifest["documents"].items()}}
+            changed: Dict[str, Optional[_Segment]] = {}
+            yield manifest, changed
+
+            for doc_id, seg in changed.items():
+                if seg is None:
+                    continue
+                _write_json(self._segment_path(doc_id, seg.rev), {"document_id": doc_id, "ids": seg.ids, "metadatas": seg.metadatas, "documents": seg.documents})
+
+            obsolete = manifest.pop("_obsolete", None)
+            _write_json(os.path.join(self.dir, MANIFEST), manifest)
+
+            # Old files: processes that still map / have not re-read them retry on reload.
+            for doc_id in changed:
+                old = self._view.segments.get(doc_id)
+                entry = manifest["documents"].get(doc_id)
+                if old is not None and (entry is None or entry["rev"] != old.rev):
+                    _remove(self._segment_path(doc_id, old.rev))
+            for name in obsolete or ():
+                if name:
+                    _remove(os.path.join(self.dir, name))
+            self._reload()
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.dir, LOCK_FILE), "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _current(self) -> _View:
+        self._reload()
+        return self._view
+
+    def _reload(self) -> None:
+        """
+        Re-read the manifest, re-map the data file and re-read changed segment files if
+        another writer replaced the manifest (one stat per call otherwise).
+        """
+        path = os.path.join(self.dir, MANIFEST)
+        with self._lock:
+            for _ in range(5):
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    return
+                stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+                if stamp == self._stamp:
+                    return
+                try:
+                    with open(path, encoding="utf-8") as f:
+                        manifest = json.load(f)
+                    self._view = self._build_view(manifest)
+                except FileNotFoundError:
+                    # A file named by this manifest was replaced meanwhile: read it again.
+                    continue
+                self._manifest = manifest
+                self._stamp = stamp
+                return
+
+    def _build_view(self, manifest: Dict[str, Any]) -> _View:
+        has_rows = bool(manifest["rows"] and manifest["dim"])
+        matrix = self._matrix(manifest) if has_rows else None
+        full = self._matrix(manifest, full=True) if has_rows and manifest["full_file"] else None
+        calibration = Int8Calibration.from_dict(manifest["calibration"]) if manifest["calibration"] else None
+        previous = self._view.segments
+        segments: Dict[str, _Segment] = {}
+        reloaded: List[str] = []
+        for doc_id, entry in manifest["documents"].items():
+            seg = previous.get(doc_id)
+            if seg is None or seg.rev != entry["rev"]:
+                with open(self._segment_path(doc_id, entry["rev"]), encoding="utf-8") as f:
+                    data = json.load(f)
+                seg = _Segment(entry["start"], entry["rev"], data["ids"], data["metadatas"], data["documents"])
+                reloaded.append(doc_id)
+            elif seg.start != entry["start"]:
+                seg = _Segment(entry["start"], seg.rev, seg.ids, seg.metadatas, seg.documents)
+            segments[doc_id] = seg
+
+        # Update the id -> row map for the documents that changed only.
+        rows = dict(self._view.rows)
+        for doc_id, seg in previous.items():
+            if doc_id not in segments or segments[doc_id].rev != seg.rev:
+                for cid in seg.ids:
+                    if rows.get(cid, (None,))[0] == doc_id:
+                        del rows[cid]
+        for doc_id in reloaded:
+            rows.update((cid, (doc_id, i)) for i, cid in enumerate(segments[doc_id].ids))
+
+        ordered = sorted(segments.items(), key=lambda item: item[1].start)
+        return _View(
+            segments=segments,
+            matrix=matrix,
+            full=full,
+            calibration=calibration,
+            starts=[seg.start for _, seg in ordered],
+            owners=[doc_id for doc_id, _ in ordered],
+            rows=rows,
+        )
+
+    @staticmethod
+    def _live_ranges(view: _View, user_id: Optional[str] = None) -> List[Tuple[int, int]]:
+        # Adjacent segments merge into one range, so blocks span document boundaries.
+        ranges: List[Tuple[int, int]] = []
+        for start, doc_id in zip(view.starts, view.owners):
+            seg = view.segments[doc_id]
+            if not _owned_by(seg, user_id):
+                continue
+            end = start + len(seg.ids)
+            if ranges and ranges[-1][1] == start:
+                ranges[-1] = (ranges[-1][0], end)
+            elif end > start:
+                ranges.append((start, end))
+        return ranges
+
+    @staticmethod
+    def _global_row(view: _View, chunk_id: str) -> int:
+        doc_id, i = view.rows[chunk_id]
+        return view.segments[doc_id].start + i
+
+    @staticmethod
+    def _hit(view: _View, row: int, score: float) -> VectorHit:
+        seg = view.segments[view.owners[bisect.bisect_right(view.starts, row) - 1]]
+        i = row - seg.start
+        return VectorHit(
+            id=seg.ids[i],
+            distance=1.0 - score,
+            document=seg.documents[i],
+            metadata=dict(seg.metadatas[i]),
+        )
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1.0, norms)
+
+
+def _owned_by(seg: _Segment, user_id: Optional[str]) -> bool:
+    # All rows of a document share its owner; no user_id means no filter.
+    return user_id is None or bool(seg.metadatas) and seg.metadatas[0].get("user_id") == str(user_id)
+
+
+def _merge_top_k(
+    best_scores: np.ndarray,
+    best_rows: np.ndarray,
+    scores: np.ndarray,
+    rows: np.ndarray,
+    top_k: int,
+) -> Tuple[np.ndarray, np.ndarray]:
+    # Running per-query top-k: candidates = previous best + this block.
+    scores = np.concatenate([best_scores, scores], axis=1)
+    rows = np.concatenate([best_rows, rows], axis=1)
+    if scores.shape[1] <= top_k:
+        return scores, rows
+    keep = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+    return np.take_along_axis(scores, keep, axis=1), np.take_along_axis(rows, keep, axis=1)
+
+
+def _next_rev(manifest: Dict[str, Any]) -> int:
+    # Collection-wide, never reused: a re-created document cannot match a stale cached segment.
+    rev = manifest.get("next_rev", 0)
+    manifest["next_rev"] = rev + 1
+    return rev
+
+
+def _write_rows(path: str, start: int, rows: np.ndarray) -> None:
+    with open(path, "r+b" if os.path.exists(path) else "w+b") as f:
+        # Write at the manifest's end, not the file's: a crashed writer may have left a tail.
+        f.seek(start * rows.shape[1] * rows.dtype.itemsize)
+        f.write(np.ascontiguousarray(rows).tobytes())
+
+
+def _write_json(path: str, data: Any) -> None:
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        # dumps, not dump: json.dump streams through the pure-Python encoder
+        f.write(json.dumps(data, ensure_ascii=False))
+    os.replace(tmp, path)
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,303 @@
+# app/vectorstore/partition_router.py
+
+from __future__ import annotations
+
+import heapq
+import json
+import os
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from app.vectorstore.base import VectorHit, VectorRepository
+from app.vectorstore.schemas import ChunkVectorMeta
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX: single writer process assumed
+    fcntl = None
+
+ROUTES_FILE = "partitions.json"
+LOCK_FILE = ".partitions.lock"
+
+
+class PartitionedVectorRepository:
+    """
+    VectorRepository that shards vectors over several collections of one backend:
+
+    - each user's documents share a partition (<base>__user_<user_id>);
+    - a large document gets a partition of its own (<base>__doc_<document_id>), so
+      document-scoped queries on it never compete with the rest of the user's rows;
+    - documents with no route (indexed before partitioning, or without an owner) stay in
+      the base collection.
+
+    The routing table (document -> owner, partition) is a JSON file next to the
+    collections, replaced atomically under a file lock like the mmap manifest, so every
+    process sees the same routes. A route is sticky: a document stays in its partition
+    until delete_by_document drops its vectors and its route.
+
+    Queries go to the partitions of their scope (the document's, the user's, or all of
+    them) and the per-partition top-k lists are merged by distance.
+    """
+
+    def __init__(
+        self,
+        repo_for: Callable[[str], VectorRepository],
+        persist_dir: str,
+        base_collection: str,
+        store_documents: bool = True,
+    ):
+        self.repo_for = repo_for
+        self.base_collection = base_collection
+        self.store_documents = store_documents
+        os.makedirs(persist_dir, exist_ok=True)
+        self._path = os.path.join(persist_dir, f"{base_collection}.{ROUTES_FILE}")
+        self._lock_path = os.path.join(persist_dir, f"{base_collection}{LOCK_FILE}")
+        self._lock = threading.RLock()
+        # document_id -> {"user_id": ..., "partition": ...}
+        self._routes: Dict[str, Dict[str, Optional[str]]] = {}
+        self._stamp: Optional[Tuple[int, int, int]] = None
+        self._reload()
+
+    # -------------------------
+    # Routing
+    # -------------------------
+
+    def user_partition(self, user_id: str) -> str:
+        return f"{self.base_collection}__user_{user_id}"
+
+    def document_partition(self, document_id: str) -> str:
+        return f"{self.base_collection}__doc_{document_id}"
+
+    def assign(self, document_id: str, user_id: Optional[str], large: bool = False) -> str:
+        """
+        Route a document before its vectors are written; returns its partition.
+        An existing route wins (its vectors already live there).
+        """
+        document_id = str(document_id)
+        route = self._current().get(document_id)
+        if route is not None:
+            return route["partition"]
+        if large:
+            partition = self.document_partition(document_id)
+        elif user_id:
+            partition = self.user_partition(str(user_id))
+        else:
+            return self.base_collection
+        with self._writing() as routes:
+            route = routes.setdefault(document_id, {"user_id": str(user_id) if user_id else None, "partition": partition})
+        return route["partition"]
+
+    def partition_of(self, document_id: str) -> str:
+        route = self._current().get(str(document_id))
+        return route["partition"] if route is not None else self.base_collection
+
+    def partitions(self, *, document_id: Optional[str] = None, user_id: Optional[str] = None) -> List[str]:
+        """
+        Partitions a read with this scope has to visit. The base collection is always
+        part of a user scope: documents indexed before partitioning still match on their user_id.
+        A document routed to another owner is out of the user's scope: no partitions.
+        """
+        routes = self._current()
+        if document_id:
+            route = routes.get(str(document_id))
+            if route is None:
+                return [self.base_collection]
+            if user_id is not None and route["user_id"] != str(user_id):
+                return []
+            return [route["partition"]]
+        found = {
+            r["partition"]
+            for r in routes.values()
+            if user_id is None or r["user_id"] == str(user_id)
+        }
+        return [self.base_collection] + sorted(found - {self.base_collection})
+
+    def documents_of(self, user_id: str) -> List[str]:
+        return [doc_id for doc_id, r in self._current().items() if r["user_id"] == str(user_id)]
+
+    def stats(self) -> Dict[str, Any]:
+        routes = self._current()
+        by_partition: Dict[str, int] = defaultdict(int)
+        for r in routes.values():
+            by_partition[r["partition"]] += 1
+        return {
+            "documents": len(routes),
+            "partitions": len(by_partition) + 1,
+            "document_partitions": sum(1 for p in by_partition if p.startswith(f"{self.base_collection}__doc_")),
+        }
+
+    # -------------------------
+    # VectorRepository
+    # -------------------------
+
+    def count(self) -> int:
+        return sum(self.repo_for(p).count() for p in self.partitions())
+
+    def existing_ids(self, chunk_ids: List[str], document_id: Optional[str] = None) -> set[str]:
+        found: set[str] = set()
+        for partition in self.partitions(document_id=document_id):
+            found |= self.repo_for(partition).existing_ids(chunk_ids)
+        return found
+
+    def upsert_chunks(
+        self,
+        *,
+        chunk_ids: List[str],
+        embeddings: List[list[float]],
+        documents: List[str],
+        metadatas: List[ChunkVectorMeta],
+    ) -> None:
+        routed: Dict[str, str] = {}
+        groups: Dict[str, List[int]] = defaultdict(list)
+        for i, meta in enumerate(metadatas):
+            if meta.document_id not in routed:
+                # Writers that did not assign() first are routed by the owner in the metadata.
+                routed[meta.document_id] = self.assign(meta.document_id, meta.user_id)
+            groups[routed[meta.document_id]].append(i)
+        for partition, idx in groups.items():
+            self.repo_for(partition).upsert_chunks(
+                chunk_ids=[chunk_ids[i] for i in idx],
+                embeddings=[embeddings[i] for i in idx],
+                documents=[documents[i] for i in idx],
+                metadatas=[metadatas[i] for i in idx],
+            )
+
+    def update_metadatas(self, *, chunk_ids: List[str], metadatas: List[ChunkVectorMeta]) -> None:
+        groups: Dict[str, List[int]] = defaultdict(list)
+        routes = self._current()
+        for i, meta in enumerate(metadatas):
+            route = routes.get(meta.document_id)
+            groups[route["partition"] if route is not None else self.base_collection].append(i)
+        for partition, idx in groups.items():
+            self.repo_for(partition).update_metadatas(
+                chunk_ids=[chunk_ids[i] for i in idx],
+                metadatas=[metadatas[i] for i in idx],
+            )
+
+    def delete_by_ids(self, chunk_ids: List[str], document_id: Optional[str] = None) -> None:
+        for partition in self.partitions(document_id=document_id):
+            self.repo_for(partition).delete_by_ids(chunk_ids, document_id=document_id)
+
+    def delete_by_document(self, document_id: str) -> None:
+        document_id = str(document_id)
+        self.repo_for(self.partition_of(document_id)).delete_by_document(document_id)
+        if document_id in self._current():
+            with self._writing() as routes:
+                routes.pop(document_id, None)
+
+    def query(
+        self,
+        *,
+        query_embedding: list[float],
+        top_k: int = 5,
+        document_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+    ) -> List[VectorHit]:
+        return self.query_many(query_embeddings=[query_embedding], top_k=top_k, document_id=document_id, user_id=user_id)[0]
+
+    def query_many(
+        self,
+        *,
+        query_embeddings: List[list[float]],
+        top_k: int = 5,
+        document_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+    ) -> List[List[VectorHit]]:
+        if not query_embeddings:
+            return []
+        partitions = self.partitions(document_id=document_id, user_id=user_id)
+        if not partitions:
+            return [[] for _ in query_embeddings]
+        # Every partition still filters on the owner: the route alone is not an access check.
+        per_partition = [
+            self.repo_for(partition).query_many(
+                query_embeddings=query_embeddings,
+                top_k=top_k,
+                document_id=document_id,
+                user_id=user_id,
+            )
+            for partition in partitions
+        ]
+        return [_merge(lists, top_k) for lists in zip(*per_partition)]
+
+    def get_hits(self, *, chunk_ids: List[str], query_embedding: list[float], user_id: Optional[str] = None) -> List[VectorHit]:
+        return self.get_hits_many(chunk_ids=[chunk_ids], query_embeddings=[query_embedding], user_id=user_id)[0]
+
+    def get_hits_many(
+        self,
+        *,
+        chunk_ids: List[List[str]],
+        query_embeddings: List[list[float]],
+        user_id: Optional[str] = None,
+    ) -> List[List[VectorHit]]:
+        results: List[List[VectorHit]] = [[] for _ in chunk_ids]
+        remaining = [list(dict.fromkeys(str(x) for x in ids)) for ids in chunk_ids]
+        for partition in self.partitions(user_id=user_id):
+            if not any(remaining):
+                break
+            found = self.repo_for(partition).get_hits_many(
+                chunk_ids=remaining,
+                query_embeddings=query_embeddings,
+                user_id=user_id,
+            )
+            for i, hits in enumerate(found):
+                results[i].extend(hits)
+                seen = {h.id for h in hits}
+                remaining[i] = [x for x in remaining[i] if x not in seen]
+        return results
+
+    # -------------------------
+    # Internals
+    # -------------------------
+
+    def _current(self) -> Dict[str, Dict[str, Optional[str]]]:
+        self._reload()
+        return self._routes
+
+    def _reload(self) -> None:
+        with self._lock:
+            try:
+                st = os.stat(self._path)
+            except FileNotFoundError:
+                return
+            stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+            if stamp == self._stamp:
+                return
+            with open(self._path, encoding="utf-8") as f:
+                self._routes = json.load(f)["documents"]
+            self._stamp = stamp
+
+    @contextmanager
+    def _writing(self) -> Iterator[Dict[str, Dict[str, Optional[str]]]]:
+        """
+        Serialize route edits across threads and processes: start from the latest table,
+        yield a copy to edit, then publish it atomically.
+        """
+        with self._lock, self._file_lock():
+            self._reload()
+            routes = {k: dict(v) for k, v in self._routes.items()}
+            yield routes
+            tmp = f"{self._path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(json.dumps({"documents": routes}))
+            os.replace(tmp, self._path)
+            self._reload()
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        if fcntl is None:
+            yield
+            return
+        with open(self._lock_path, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _merge(lists: Tuple[List[VectorHit], ...], top_k: int) -> List[VectorHit]:
+    # Each list is already sorted by distance.
+    return list(heapq.merge(*lists, key=lambda h: h.distance))[:top_k]
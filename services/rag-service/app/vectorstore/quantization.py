@@ -0,0 +1,62 @@
+# app/vectorstore/quantization.py
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, List
+
+import numpy as np
+
+# Storage dtypes of the mmap backend; everything but float32 keeps a full-precision copy for rescoring.
+STORAGE_DTYPES = ("float32", "float16", "int8")
+
+
+@dataclass
+class Int8Calibration:
+    """
+    Per-dimension scalar quantization: x ~= (code + 128) * scale + offset, code in int8.
+
+    offset / scale come from low / high percentiles of each dimension over a calibration
+    sample, so a few outliers do not waste the 256 levels of the other values.
+    """
+
+    offset: np.ndarray
+    scale: np.ndarray
+
+    @classmethod
+    def fit(cls, sample: np.ndarray, clip_percentile: float = 0.1, min_rows: int = 256) -> "Int8Calibration":
+        sample = np.asarray(sample, dtype=np.float32)
+        if len(sample) < min_rows:
+            # Too few rows to estimate ranges: cover [-1, 1], the range of unit-vector components.
+            dim = sample.shape[1]
+            return cls(offset=np.full(dim, -1.0, dtype=np.float32), scale=np.full(dim, 2.0 / 255.0, dtype=np.float32))
+        lo = np.percentile(sample, clip_percentile, axis=0)
+        hi = np.percentile(sample, 100.0 - clip_percentile, axis=0)
+        scale = np.maximum(hi - lo, 1e-6) / 255.0
+        return cls(offset=lo.astype(np.float32), scale=scale.astype(np.float32))
+
+    def quantize(self, vectors: np.ndarray) -> np.ndarray:
+        codes = np.rint((np.asarray(vectors, dtype=np.float32) - self.offset) / self.scale) - 128.0
+        return np.clip(codes, -128, 127).astype(np.int8)
+
+    def dequantize(self, codes: np.ndarray) -> np.ndarray:
+        return (codes.astype(np.float32) + 128.0) * self.scale + self.offset
+
+    def scores(self, codes: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        """
+        queries @ dequantize(codes).T without materializing the dequantized block:
+        q . x = (q * scale) . code + (q * scale) . 128 + q . offset
+        """
+        scaled = queries * self.scale
+        bias = 128.0 * scaled.sum(axis=1) + queries @ self.offset
+        return scaled @ codes.astype(np.float32).T + bias[:, None]
+
+    def to_dict(self) -> Dict[str, List[float]]:
+        return {"offset": self.offset.tolist(), "scale": self.scale.tolist()}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Int8Calibration":
+        return cls(
+            offset=np.asarray(data["offset"], dtype=np.float32),
+            scale=np.asarray(data["scale"], dtype=np.float32),
+        )
@@ -1,13 +1,16 @@
 # app/vectorstore/schemas.py
 
+import json
 from pydantic import BaseModel, Field
-from typing import Optional, Literal
+from typing import Any, Dict, List, Optional, Literal
 
 
 class ChunkVectorMeta(BaseModel):
     schema_ver: Literal["1"] = "1"
 
     document_id: str = Field(..., description="Source document UUID")
+    # Document owner: user-scoped search filters on it, partitioning routes on it
+    user_id: Optional[str] = None
     chunk_id: str = Field(..., description="Chunk UUID (primary link key)")
     chunk_index: int = Field(..., description="Order of chunk in document")
 
@@ -19,6 +22,25 @@ class ChunkVectorMeta(BaseModel):
 
     # page-based positioning (PDF / OCR)
     page: Optional[int] = None
+    # (page, bbox) of every OCR line the chunk covers, in reading order, JSON-encoded
+    # (vector store metadata values are scalars); see encode_spans / decode_spans
+    spans: Optional[str] = None
+
+    # SHA-256 of the chunk text: the per-chunk version search hydration checks before
+    # trusting the stored document instead of reading Postgres
+    content_hash: Optional[str] = None
 
     class Config:
         extra = "forbid"
+
+
+def encode_spans(spans: Optional[List[Dict[str, Any]]]) -> Optional[str]:
+    if not spans:
+        return None
+    return json.dumps(spans, separators=(",", ":"))
+
+
+def decode_spans(value: Any) -> List[Dict[str, Any]]:
+    if not isinstance(value, str) or not value:
+        return []
+    return json.loads(value)
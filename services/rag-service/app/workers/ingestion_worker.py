@@ -0,0 +1,183 @@
+# app/workers/ingestion_worker.py
+"""
+Ingestion worker entry point. Runs OCR / chunking / embedding outside the API process.
+
+    poetry run python -m app.workers.ingestion_worker
+
+Each stage gets JOB_STAGE_CONCURRENCY[stage] job slots (threads). Start more worker
+processes to scale out; claiming is safe across processes and hosts.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import signal
+import socket
+import threading
+import traceback
+from typing import Callable, Dict, List, Optional
+from uuid import uuid4
+
+from app.constants.status import DocumentStatus, JobStage
+from app.db.schema_upgrade import upgrade_schema
+from app.db.session import engine, session_scope
+from app.pipelines.document_pipeline import process_document_pipeline
+from app.pipelines.streaming_pipeline import process_document_pipeline_streaming
+from app.repositories.document_repository import DocumentRepository
+from app.services.model_registry import registry
+from app.services.job_queue_service import (
+    ClaimedJob,
+    claim_job,
+    complete_job,
+    extend_job_lease,
+    fail_job,
+)
+from app.utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _run_ingest(job: ClaimedJob) -> None:
+    lang = job.payload.get("lang", "en")
+    if settings.PIPELINE_MODE == "streaming":
+        process_document_pipeline_streaming(str(job.document_id), lang)
+    else:
+        process_document_pipeline(str(job.document_id), lang)
+
+
+# stage -> handler. A handler raises to signal a failed attempt.
+STAGE_HANDLERS: Dict[str, Callable[[ClaimedJob], None]] = {
+    JobStage.INGEST.value: _run_ingest,
+}
+
+
+class IngestionWorker:
+    def __init__(
+        self,
+        stage_concurrency: Optional[Dict[str, int]] = None,
+        worker_id: Optional[str] = None,
+    ):
+        self.stage_concurrency = stage_concurrency or settings.JOB_STAGE_CONCURRENCY
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        for stage, slots in self.stage_concurrency.items():
+            if stage not in STAGE_HANDLERS:
+                raise ValueError(f"No handler registered for stage: {stage}")
+            for slot in range(max(int(slots), 0)):
+                t = threading.Thread(
+                    target=self._slot_loop,
+                    args=(stage,),
+                    name=f"{stage}-{slot}",
+                    daemon=True,
+                )
+                t.start()
+                self._threads.append(t)
+        logger.info("Worker %s started with %s", self.worker_id, self.stage_concurrency)
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def join(self) -> None:
+        for t in self._threads:
+            t.join()
+
+    def run_forever(self) -> None:
+        self.start()
+        # Sleep in short intervals so signal handlers get a chance to run.
+        while not self._stop.wait(1.0):
+            pass
+        logger.info("Worker %s stopping; waiting for running jobs to finish", self.worker_id)
+        self.join()
+
+    def _slot_loop(self, stage: str) -> None:
+        while not self._stop.is_set():
+            try:
+                job = claim_job(stage, self.worker_id)
+            except Exception:
+                logger.exception("Failed to claim a %s job", stage)
+                job = None
+
+            if job is None:
+                self._stop.wait(settings.JOB_POLL_INTERVAL_SECONDS)
+                continue
+
+            try:
+                self.run_job(job)
+            except Exception:
+                # Typically the queue DB going away while the outcome is recorded. The job's
+                # lease expires and it is claimed again; this slot backs off and keeps serving.
+                logger.exception("Failed to record the outcome of job %s", job.id)
+                self._stop.wait(settings.JOB_POLL_INTERVAL_SECONDS)
+
+    def run_job(self, job: ClaimedJob) -> None:
+        handler = STAGE_HANDLERS[job.stage]
+        heartbeat_stop = threading.Event()
+        heartbeat = threading.Thread(
+            target=self._heartbeat_loop,
+            args=(job, heartbeat_stop),
+            daemon=True,
+        )
+        heartbeat.start()
+
+        logger.info("Job %s (%s) attempt %d/%d started", job.id, job.stage, job.attempts, job.max_attempts)
+        try:
+            handler(job)
+        except Exception as e:
+            logger.error("Job %s failed: %s\n%s", job.id, e, traceback.format_exc())
+            exhausted = fail_job(job, self.worker_id, str(e))
+            if exhausted:
+                self._mark_document_failed(job, str(e))
+            return
+        finally:
+            heartbeat_stop.set()
+
+        if not complete_job(job.id, self.worker_id):
+            logger.warning("Job %s finished after its lease was taken over", job.id)
+        else:
+            logger.info("Job %s succeeded", job.id)
+
+    def _heartbeat_loop(self, job: ClaimedJob, stop: threading.Event) -> None:
+        # Renew the lease well before it expires so long OCR runs are not picked up twice.
+        interval = max(settings.JOB_VISIBILITY_TIMEOUT_SECONDS / 3, 1.0)
+        while not stop.wait(interval):
+            try:
+                if not extend_job_lease(job.id, self.worker_id):
+                    return
+            except Exception:
+                logger.exception("Failed to extend lease of job %s", job.id)
+
+    def _mark_document_failed(self, job: ClaimedJob, error_message: str) -> None:
+        try:
+            with session_scope() as db:
+                DocumentRepository(db).update_document(
+                    job.document_id,
+                    status=DocumentStatus.FAILED,
+                    error_message=error_message,
+                )
+        except Exception:
+            logger.exception("Failed to mark document %s as failed", job.document_id)
+
+
+def main() -> None:
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s [%(threadName)s] %(name)s: %(message)s",
+    )
+    # Databases created before newer columns existed get them first (docs/db_schema.md).
+    upgrade_schema(engine)
+    # Load models (embedder, tokenizer, OCR engines / pool) once, before claiming any job.
+    registry.warm_up(ocr_langs=settings.WARMUP_OCR_LANGS)
+    logger.info("Models ready: %s", registry.readiness())
+
+    worker = IngestionWorker()
+    signal.signal(signal.SIGINT, lambda *_: worker.stop())
+    signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+    worker.run_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# benchmarks/bench_chunk_mapping.py
+"""
+Chunk-to-layout mapping benchmark on a synthetic 1,000-page OCR result.
+
+Compares the previous chunk_text mapping (string += and a linear scan of every OCR line
+per chunk) with the bisect-based offset index now used by chunk_service.chunk_text.
+
+Run from services/rag-service (needs the same environment / .env as the app):
+    python -m benchmarks.bench_chunk_mapping [--pages 1000] [--lines-per-page 40]
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from typing import Any, Dict, List
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from app.services.chunk_service import build_offset_index, chunk_text, find_line_spans
+from app.utils.config import settings
+
+_WORDS = "retrieval augmented generation document layout page chunk vector index query answer".split()
+
+
+def make_ocr_result(pages: int, lines_per_page: int, seed: int = 0) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    lines = []
+    for page in range(1, pages + 1):
+        for i in range(lines_per_page):
+            text = " ".join(rng.choice(_WORDS) for _ in range(rng.randint(6, 14))) + "."
+            y = 40 + i * 20
+            lines.append({
+                "text": text,
+                "page": page,
+                "bbox": [[40, y], [560, y], [560, y + 16], [40, y + 16]],
+                "y_center": y + 8,
+            })
+    return lines
+
+
+def _split(full_text: str):
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=settings.MAX_CHUNK_SIZE,
+        chunk_overlap=settings.CHUNK_OVERLAP,
+        add_start_index=True,
+        separators=["\n\n", "\n", ". ", "! ", "? ", "; ", ", ", " ", ""],
+        length_function=len,
+    )
+    return [
+        (doc.metadata.get("start_index", 0), len(doc.page_content.strip()))
+        for doc in splitter.create_documents([full_text])
+    ]
+
+
+def legacy_mapping(lines: List[Dict[str, Any]], chunks) -> List[Any]:
+    # Previous implementation: quadratic string building + linear scan per chunk.
+    full_text = ""
+    offset_to_metadata = []
+    for item in lines:
+        start_pos = len(full_text)
+        full_text += item["text"] + " "
+        offset_to_metadata.append({"start": start_pos, "end": len(full_text), "page": item["page"], "bbox": item["bbox"]})
+
+    out = []
+    for start_idx, _ in chunks:
+        page, bbox = 1, []
+        for meta in offset_to_metadata:
+            if meta["start"] <= start_idx < meta["end"]:
+                page, bbox = meta["page"], meta["bbox"]
+                break
+        out.append((page, bbox))
+    return out
+
+
+def indexed_mapping(lines: List[Dict[str, Any]], chunks) -> List[Any]:
+    _, line_starts = build_offset_index(lines)
+    out = []
+    for start_idx, length in chunks:
+        spans = find_line_spans(lines, line_starts, start_idx, start_idx + length)
+        out.append((spans[0]["page"], spans[0]["bbox"]) if spans else (1, []))
+    return out
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--lines-per-page", type=int, default=40)
+    args = parser.parse_args()
+
+    lines = make_ocr_result(args.pages, args.lines_per_page)
+    full_text, _ = build_offset_index(lines)
+    chunks, split_seconds = _timed(_split, full_text)
+
+    legacy, legacy_seconds = _timed(legacy_mapping, lines, chunks)
+    indexed, indexed_seconds = _timed(indexed_mapping, lines, chunks)
+    assert legacy == indexed, "first-character page/bbox must match the previous implementation"
+
+    results, total_seconds = _timed(chunk_text, lines, "en")
+    multi_page = sum(1 for c in results if len({s["page"] for s in c["spans"]}) > 1)
+
+    print(f"OCR lines: {len(lines):,} on {args.pages:,} pages, chunks: {len(chunks):,}")
+    print(f"splitter (same for both):    {split_seconds * 1000:10.1f} ms")
+    print(f"legacy mapping:              {legacy_seconds * 1000:10.1f} ms")
+    print(f"offset index (bisect):       {indexed_seconds * 1000:10.1f} ms")
+    print(f"speedup:                     {legacy_seconds / max(indexed_seconds, 1e-9):10.1f}x")
+    print(f"chunk_text end to end:       {total_seconds * 1000:10.1f} ms ({multi_page} chunks cross a page boundary)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# benchmarks/bench_quantization.py
+"""
+Recall vs. memory report for the storage modes of the mmap vector backend.
+
+Embeddings come from our own index (--source chroma: the rag_chunks collection under
+VECTOR_DB_URL and every per-user / per-document partition routed off it), from a saved
+.npy matrix (--npy), or are synthetic. The last --queries
+vectors are held out and used as queries; ground truth is exact float32 search over the
+rest. Every mode is loaded into a fresh MmapVectorRepository and reports:
+- resident bytes per vector (the matrix that has to stay in memory; the float32 copy used
+  for rescoring stays on disk and is only touched for the candidates)
+- recall@k against the exact top-k, and mean query latency
+
+Run from services/rag-service:
+    python -m benchmarks.bench_quantization [--source chroma|synthetic] [--npy FILE] [--limit 100000] [--top-k 8]
+"""
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from typing import List, Tuple
+
+import numpy as np
+
+from app.vectorstore.mmap_repo import MmapVectorRepository
+from app.vectorstore.schemas import ChunkVectorMeta
+
+# (label, storage dtype, rescore multiplier)
+MODES: List[Tuple[str, str, int]] = [
+    ("float32", "float32", 1),
+    ("float16", "float16", 1),
+    ("float16 + rescore x4", "float16", 4),
+    ("int8", "int8", 1),
+    ("int8 + rescore x2", "int8", 2),
+    ("int8 + rescore x4", "int8", 4),
+]
+
+
+def load_embeddings(args: argparse.Namespace) -> np.ndarray:
+    if args.npy:
+        return np.load(args.npy).astype(np.float32)[:args.limit]
+    if args.source == "chroma":
+        return _chroma_embeddings(args.limit)
+    rng = np.random.default_rng(0)
+    # Clustered synthetic data: closer to sentence embeddings than isotropic noise.
+    centers = rng.normal(size=(64, args.dim))
+    labels = rng.integers(0, len(centers), size=args.limit)
+    return (centers[labels] + 0.6 * rng.normal(size=(args.limit, args.dim))).astype(np.float32)
+
+
+def _chroma_embeddings(limit: int) -> np.ndarray:
+    from app.services.model_registry import DEFAULT_COLLECTION
+    from app.utils.config import settings
+    from app.vectorstore.chroma_repo import ChromaVectorRepository
+    from app.vectorstore.partition_router import PartitionedVectorRepository
+
+    def repo_for(collection_name: str) -> ChromaVectorRepository:
+        return ChromaVectorRepository(persist_dir=settings.VECTOR_DB_URL, collection_name=collection_name)
+
+    # The base collection plus every routed partition (VECTOR_PARTITIONING)
+    router = PartitionedVectorRepository(repo_for=repo_for, persist_dir=settings.VECTOR_DB_URL, base_collection=DEFAULT_COLLECTION)
+    parts = []
+    remaining = limit
+    for partition in router.partitions():
+        if remaining <= 0:
+            break
+        res = repo_for(partition).collection.get(include=["embeddings"], limit=remaining)
+        if res["embeddings"] is not None and len(res["embeddings"]):
+            parts.append(np.asarray(res["embeddings"], dtype=np.float32))
+            remaining -= len(parts[-1])
+    return np.concatenate(parts) if parts else np.zeros((0, 0), dtype=np.float32)
+
+
+def _normalize(m: np.ndarray) -> np.ndarray:
+    return m / np.maximum(np.linalg.norm(m, axis=1, keepdims=True), 1e-12)
+
+
+def run_mode(vectors: np.ndarray, queries: np.ndarray, truth: np.ndarray, dtype: str, rescore: int, top_k: int) -> Tuple[float, float, float]:
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = MmapVectorRepository(tmp, "bench", dtype=dtype, rescore_multiplier=rescore, store_documents=False)
+        # Documents of 500 chunks, like a mid-sized PDF
+        for lo in range(0, len(vectors), 500):
+            ids = [str(i) for i in range(lo, min(lo + 500, len(vectors)))]
+            repo.upsert_chunks(
+                chunk_ids=ids,
+                embeddings=vectors[lo:lo + 500],
+                documents=[""] * len(ids),
+                metadatas=[ChunkVectorMeta(document_id=f"d{lo}", chunk_id=cid, chunk_index=i) for i, cid in enumerate(ids)],
+            )
+        if dtype == "int8":
+            repo.recalibrate()
+
+        start = time.perf_counter()
+        found = [[int(h.id) for h in repo.query(query_embedding=q, top_k=top_k)] for q in queries]
+        query_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+        recall = float(np.mean([len(set(f) & set(t)) / top_k for f, t in zip(found, truth.tolist())]))
+        bytes_per_vector = vectors.shape[1] * np.dtype(dtype).itemsize
+        return recall, bytes_per_vector, query_ms
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", choices=["chroma", "synthetic"], default="synthetic")
+    parser.add_argument("--npy", help="saved (n, dim) embedding matrix")
+    parser.add_argument("--limit", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=384, help="synthetic only")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=8)
+    args = parser.parse_args()
+
+    data = load_embeddings(args)
+    if len(data) <= args.queries:
+        raise SystemExit(f"Need more than {args.queries} embeddings, got {len(data)}")
+    vectors, queries = data[:-args.queries], data[-args.queries:]
+    # Exact float32 ground truth
+    scores = _normalize(queries) @ _normalize(vectors).T
+    truth = np.argsort(-scores, axis=1)[:, :args.top_k]
+
+    print(f"vectors: {len(vectors):,} x {vectors.shape[1]}, queries: {len(queries)}, recall@{args.top_k}")
+    print(f"{'mode':<24}{'bytes/vector':>14}{'resident MB':>14}{'vs float32':>12}{'recall':>10}{'query ms':>10}")
+    for label, dtype, rescore in MODES:
+        recall, bpv, query_ms = run_mode(vectors, queries, truth, dtype, rescore, args.top_k)
+        resident_mb = bpv * len(vectors) / 2**20
+        ratio = vectors.shape[1] * 4 / bpv
+        print(f"{label:<24}{bpv:>14,}{resident_mb:>14.1f}{ratio:>11.1f}x{recall:>10.4f}{query_ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
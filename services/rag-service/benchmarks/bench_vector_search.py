@@ -0,0 +1,97 @@
+# benchmarks/bench_vector_search.py
+"""
+Query latency of the memory-mapped vector backend on synthetic embeddings.
+
+Measures a document_id-filtered query (exact dot product over that document's slice)
+and an unfiltered query (blocked top-k over every row), and checks both against a
+brute-force NumPy reference. With --chroma, the same data is loaded into a Chroma
+collection and its filtered / unfiltered queries are timed too.
+
+Run from services/rag-service:
+    python -m benchmarks.bench_vector_search [--documents 200] [--chunks 500] [--dim 384] [--chroma]
+"""
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from app.vectorstore.mmap_repo import MmapVectorRepository
+from app.vectorstore.schemas import ChunkVectorMeta
+
+
+def _load(repo, vectors: np.ndarray, documents: int, chunks: int) -> None:
+    for d in range(documents):
+        ids = [f"d{d}-c{i}" for i in range(chunks)]
+        repo.upsert_chunks(
+            chunk_ids=ids,
+            embeddings=vectors[d * chunks:(d + 1) * chunks].tolist(),
+            documents=["" for _ in ids],
+            metadatas=[ChunkVectorMeta(document_id=f"d{d}", chunk_id=cid, chunk_index=i) for i, cid in enumerate(ids)],
+        )
+
+
+def _per_query_ms(fn, queries: np.ndarray, **kwargs) -> float:
+    start = time.perf_counter()
+    for q in queries:
+        fn(query_embedding=q.tolist(), **kwargs)
+    return (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--chunks", type=int, default=500, help="chunks per document")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=8)
+    parser.add_argument("--dtype", choices=["float32", "float16"], default="float32")
+    parser.add_argument("--chroma", action="store_true", help="also time a Chroma collection (needs chromadb)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(args.documents * args.chunks, args.dim)).astype(np.float32)
+    queries = rng.normal(size=(args.queries, args.dim)).astype(np.float32)
+    target = f"d{args.documents // 2}"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = MmapVectorRepository(tmp, "bench", dtype=args.dtype)
+        start = time.perf_counter()
+        _load(repo, vectors, args.documents, args.chunks)
+        load_seconds = time.perf_counter() - start
+
+        # Brute-force references for the filtered and the unfiltered query
+        ids = [f"d{d}-c{i}" for d in range(args.documents) for i in range(args.chunks)]
+        normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        lo = (args.documents // 2) * args.chunks
+        for q in queries[:5]:
+            scores = normed @ (q / np.linalg.norm(q))
+            expected = [ids[lo + i] for i in np.argsort(-scores[lo:lo + args.chunks])[:args.top_k]]
+            got = [h.id for h in repo.query(query_embedding=q.tolist(), top_k=args.top_k, document_id=target)]
+            assert got == expected, "filtered query must be exact"
+
+            expected = [ids[i] for i in np.argsort(-scores)[:args.top_k]]
+            got = [h.id for h in repo.query(query_embedding=q.tolist(), top_k=args.top_k)]
+            assert got == expected, "unfiltered query must be exact"
+
+        filtered_ms = _per_query_ms(repo.query, queries, top_k=args.top_k, document_id=target)
+        unfiltered_ms = _per_query_ms(repo.query, queries, top_k=args.top_k)
+
+        print(f"rows: {len(vectors):,} ({args.documents} documents x {args.chunks}), dim {args.dim}, {args.dtype}")
+        print(f"mmap load:                   {load_seconds * 1000:10.1f} ms")
+        print(f"mmap filtered query:         {filtered_ms:10.3f} ms")
+        print(f"mmap unfiltered query:       {unfiltered_ms:10.3f} ms")
+
+        if args.chroma:
+            from app.vectorstore.chroma_repo import ChromaVectorRepository
+
+            chroma = ChromaVectorRepository(persist_dir=f"{tmp}/chroma", collection_name="bench")
+            _load(chroma, vectors, args.documents, args.chunks)
+            print(f"chroma filtered query:       {_per_query_ms(chroma.query, queries, top_k=args.top_k, document_id=target):10.3f} ms")
+            print(f"chroma unfiltered query:     {_per_query_ms(chroma.query, queries, top_k=args.top_k):10.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
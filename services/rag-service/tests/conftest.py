@@ -0,0 +1,39 @@
+# tests/conftest.py
+
+import os
+import tempfile
+
+# Settings are read at import time: point every store at a throwaway directory
+# before any app module is imported.
+_TMP = tempfile.mkdtemp(prefix="rag-service-tests-")
+os.environ.setdefault("ENV", "test")
+os.environ.setdefault("DATABASE_URL_DEV", f"sqlite:///{_TMP}/app.db")
+# The job queue gets its own SQLite file, as a separate queue database would in production.
+os.environ.setdefault("JOB_QUEUE_DATABASE_URL", f"sqlite:///{_TMP}/queue.db")
+os.environ.setdefault("VECTOR_DB_URL", f"{_TMP}/vectors")
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+os.environ.setdefault("LLM_BACKEND", "fake")
+
+import pytest
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _schema():
+    from app.db.base import Base
+    from app.db.models import chunk, document, ingestion_job, ocr_page_cache, ocr_result, user  # noqa: F401
+    from app.db.session import engine, queue_engine
+
+    Base.metadata.create_all(engine)
+    Base.metadata.create_all(queue_engine, tables=[ingestion_job.IngestionJob.__table__])
+    yield
+
+
+@pytest.fixture
+def db():
+    from app.db.session import SessionLocal
+
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
@@ -0,0 +1,134 @@
+# tests/test_answer_cache.py
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.answer_cache import AnswerCache, AnswerService
+from app.services.llm_service import EmptyResponseError, FakeBackendError, FakeLLMService, LLMService
+
+CHUNKS = ["first context piece", "second context piece"]
+
+
+def _ask(service, query="what is it?", chunk_ids=("c1", "c2")):
+    return asyncio.run(service.get_answer(
+        query=query,
+        chunk_ids=list(chunk_ids),
+        chunks=CHUNKS,
+        document_ids=["d1"],
+    ))
+
+
+def _stream(service, query="what is it?", chunk_ids=("c1", "c2")):
+    async def collect():
+        return [p async for p in service.stream_answer(
+            query=query,
+            chunk_ids=list(chunk_ids),
+            chunks=CHUNKS,
+            document_ids=["d1"],
+        )]
+    return asyncio.run(collect())
+
+
+def _gemini_returning(response):
+    service = LLMService.__new__(LLMService)
+    service.model_name = "gemini-test"
+    service.model = SimpleNamespace(generate_content=lambda *args, **kwargs: response)
+    return service
+
+
+def test_repeated_question_is_answered_from_cache():
+    llm = FakeLLMService()
+    service = AnswerService(llm, AnswerCache())
+
+    first = _ask(service)
+    second = _ask(service, query="  what  is it?  ")
+
+    assert first == second
+    assert llm.calls == 1
+
+
+def test_different_chunks_are_a_different_answer():
+    llm = FakeLLMService()
+    service = AnswerService(llm, AnswerCache())
+
+    _ask(service, chunk_ids=("c1", "c2"))
+    _ask(service, chunk_ids=("c2", "c1"))
+
+    assert llm.calls == 2
+
+
+def test_failed_generation_is_not_cached():
+    llm = FakeLLMService(failure_rate=1.0)
+    cache = AnswerCache()
+    service = AnswerService(llm, cache)
+
+    with pytest.raises(FakeBackendError):
+        _ask(service)
+    assert service.lookup("what is it?", ["c1", "c2"]) is None
+    llm.failure_rate = 0.0
+    _ask(service)
+    assert llm.calls == 2
+
+
+@pytest.mark.parametrize("response", [SimpleNamespace(text=""), None])
+def test_empty_model_response_raises(response):
+    with pytest.raises(EmptyResponseError):
+        asyncio.run(_gemini_returning(response).generate_answer("q", CHUNKS))
+
+
+def test_blocked_model_response_raises():
+    class Blocked:
+        @property
+        def text(self):
+            raise ValueError("response was blocked")
+
+    with pytest.raises(EmptyResponseError):
+        asyncio.run(_gemini_returning(Blocked()).generate_answer("q", CHUNKS))
+
+
+def test_empty_model_response_is_not_cached():
+    cache = AnswerCache()
+    service = AnswerService(_gemini_returning(SimpleNamespace(text="")), cache)
+
+    with pytest.raises(EmptyResponseError):
+        _ask(service)
+    assert service.lookup("what is it?", ["c1", "c2"]) is None
+
+
+def test_streamed_answer_is_cached_once_complete():
+    llm = FakeLLMService()
+    service = AnswerService(llm, AnswerCache())
+
+    pieces = _stream(service)
+
+    assert service.lookup("what is it?", ["c1", "c2"]) == "".join(pieces)
+    assert llm.calls == 1
+
+
+def test_abandoned_stream_is_not_cached():
+    llm = FakeLLMService()
+    service = AnswerService(llm, AnswerCache())
+
+    async def first_piece_only():
+        stream = service.stream_answer(query="q", chunk_ids=["c1"], chunks=CHUNKS, document_ids=["d1"])
+        piece = await stream.__anext__()
+        await stream.aclose()
+        return piece
+
+    asyncio.run(first_piece_only())
+
+    assert service.lookup("q", ["c1"]) is None
+
+
+def test_reindexed_document_invalidates_answer():
+    from app.vectorstore.index_version import index_versions
+
+    llm = FakeLLMService()
+    service = AnswerService(llm, AnswerCache())
+    _ask(service)
+    index_versions.bump("d1")
+    _ask(service)
+
+    assert llm.calls == 2
@@ -0,0 +1,118 @@
+# tests/test_chunk_hydration.py
+
+import asyncio
+import uuid
+
+import pytest
+
+from app.db.models.chunk import Chunk
+from app.repositories.chunk_repository import ChunkRepository
+from app.services.chunk_hydration import SqlHydrator, VectorStoreHydrator
+from app.utils.hashing import chunk_content_hash
+from app.vectorstore.base import VectorHit
+from app.vectorstore.index_version import index_versions
+
+
+class CountingHydrator(SqlHydrator):
+    def __init__(self):
+        self.requested = []
+
+    def hydrate(self, hits):
+        self.requested.extend(h.id for h in hits)
+        return super().hydrate(hits)
+
+    async def ahydrate(self, hits):
+        self.requested.extend(h.id for h in hits)
+        return await super().ahydrate(hits)
+
+
+def _store(db, text):
+    document_id, chunk_id = uuid.uuid4(), uuid.uuid4()
+    ChunkRepository(db).bulk_insert([{
+        "id": chunk_id,
+        "document_id": document_id,
+        "chunk_index": 0,
+        "start_offset": 0,
+        "end_offset": len(text),
+        "text": text,
+        "content_hash": chunk_content_hash(text),
+        "embedding_id": str(chunk_id),
+    }])
+    db.commit()
+    return str(document_id), str(chunk_id)
+
+
+def _hit(document_id, chunk_id, text):
+    return VectorHit(
+        id=chunk_id,
+        distance=0.1,
+        document=text,
+        metadata={
+            "chunk_id": chunk_id,
+            "document_id": document_id,
+            "chunk_index": 0,
+            "start_offset": 0,
+            "end_offset": len(text),
+            "content_hash": chunk_content_hash(text),
+        },
+    )
+
+
+def _rewrite(db, chunk_id, text):
+    db.execute(
+        Chunk.__table__.update()
+        .where(Chunk.id == uuid.UUID(chunk_id))
+        .values(text=text, content_hash=chunk_content_hash(text))
+    )
+    db.commit()
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_current_vector_copy_is_trusted(db, use_async):
+    document_id, chunk_id = _store(db, "current text")
+    fallback = CountingHydrator()
+    hydrator = VectorStoreHydrator(fallback=fallback)
+    hits = [_hit(document_id, chunk_id, "current text")]
+
+    rows = asyncio.run(hydrator.ahydrate(hits)) if use_async else hydrator.hydrate(hits)
+
+    assert rows[chunk_id].text == "current text"
+    assert fallback.requested == []
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_vector_copy_that_drifted_from_postgres_falls_back(db, use_async):
+    document_id, chunk_id = _store(db, "old text")
+    _rewrite(db, chunk_id, "new text")
+    fallback = CountingHydrator()
+    hydrator = VectorStoreHydrator(fallback=fallback)
+    # The vector store still holds the old, self-consistent copy.
+    hits = [_hit(document_id, chunk_id, "old text")]
+
+    rows = asyncio.run(hydrator.ahydrate(hits)) if use_async else hydrator.hydrate(hits)
+
+    assert rows[chunk_id].text == "new text"
+    assert fallback.requested == [chunk_id]
+    assert hydrator.stats()["stale"] == 1
+
+
+def test_cached_hash_is_rechecked_after_reindex(db):
+    document_id, chunk_id = _store(db, "old text")
+    hydrator = VectorStoreHydrator(fallback=CountingHydrator())
+    hits = [_hit(document_id, chunk_id, "old text")]
+    assert hydrator.hydrate(hits)[chunk_id].text == "old text"
+
+    _rewrite(db, chunk_id, "new text")
+    index_versions.bump(document_id)
+
+    assert hydrator.hydrate(hits)[chunk_id].text == "new text"
+
+
+def test_chunk_deleted_from_postgres_is_not_returned(db):
+    document_id, chunk_id = _store(db, "gone soon")
+    ChunkRepository(db).delete_by_ids([uuid.UUID(chunk_id)])
+    db.commit()
+
+    rows = VectorStoreHydrator(fallback=CountingHydrator()).hydrate([_hit(document_id, chunk_id, "gone soon")])
+
+    assert chunk_id not in rows
@@ -0,0 +1,66 @@
+# tests/test_chunk_spans.py
+
+import uuid
+
+import pytest
+
+from app.services.chunk_service import chunk_text
+from app.services.chunk_sync_service import ChunkSync
+from app.services.search_service import SearchService
+from app.utils.config import settings
+from app.vectorstore.mmap_repo import MmapVectorRepository
+
+LINES = [
+    {"text": "alpha beta gamma delta", "page": 1, "bbox": [[0, 0], [90, 0], [90, 10], [0, 10]]},
+    {"text": "epsilon zeta eta theta", "page": 1, "bbox": [[0, 20], [90, 20], [90, 30], [0, 30]]},
+    {"text": "iota kappa lambda mu", "page": 2, "bbox": [[0, 0], [80, 0], [80, 10], [0, 10]]},
+    {"text": "nu xi omicron pi rho", "page": 2, "bbox": [[0, 20], [80, 20], [80, 30], [0, 30]]},
+]
+
+
+class ConstantEmbedder:
+    def embed_text(self, text):
+        return [1.0, 0.0, 0.0, 0.0]
+
+    def embed_texts(self, texts):
+        return [self.embed_text(t) for t in texts]
+
+
+@pytest.fixture
+def chunks(monkeypatch):
+    monkeypatch.setattr(settings, "MAX_CHUNK_SIZE", 60)
+    monkeypatch.setattr(settings, "CHUNK_OVERLAP", 0)
+    return chunk_text(LINES, "en")
+
+
+def test_chunk_crossing_a_page_lists_both_pages(chunks):
+    crossing = [c for c in chunks if {s["page"] for s in c["spans"]} == {1, 2}]
+
+    assert len(crossing) == 1
+    assert crossing[0]["page"] == 1
+    assert crossing[0]["spans"] == [{"page": line["page"], "bbox": line["bbox"]} for line in LINES[:3]]
+
+
+def test_search_hit_returns_the_stored_spans(tmp_path, chunks):
+    document_id = uuid.uuid4()
+    repo = MmapVectorRepository(persist_dir=str(tmp_path), collection_name="rag_chunks")
+    sync = ChunkSync(document_id=document_id, embedding_service=ConstantEmbedder(), vector_repo=repo)
+    records = [
+        {
+            "document_id": document_id,
+            "chunk_index": i,
+            "start_offset": c["start"],
+            "end_offset": c["end"],
+            "token_count": None,
+            "text": c["text"],
+        }
+        for i, c in enumerate(chunks)
+    ]
+
+    sync.apply(records, chunks)
+    hits = SearchService(embedding_service=ConstantEmbedder(), vector_repo=repo).search(
+        query="lambda", top_k=len(chunks), document_id=str(document_id)
+    )
+
+    assert sorted((h.chunk_index, str(h.spans)) for h in hits) == [(i, str(c["spans"])) for i, c in enumerate(chunks)]
+    assert any({s["page"] for s in h.spans} == {1, 2} for h in hits)
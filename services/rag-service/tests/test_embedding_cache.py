@@ -0,0 +1,79 @@
+# tests/test_embedding_cache.py
+
+import threading
+
+import numpy as np
+import pytest
+
+from app.services.embedding_cache import EmbeddingCache, text_key
+
+DIM = 4
+
+
+@pytest.fixture
+def open_cache(tmp_path):
+    caches = []
+
+    def open_(capacity=64):
+        cache = EmbeddingCache(str(tmp_path), "model", True, DIM, capacity)
+        caches.append(cache)
+        return cache
+
+    yield open_
+    for cache in caches:
+        cache.close()
+
+
+def _vec(i):
+    return [float(i)] * DIM
+
+
+def test_entries_are_shared_between_processes(open_cache):
+    # Two instances on one directory stand in for two processes: flock locks are per open file.
+    writer, reader = open_cache(), open_cache()
+    keys = [text_key(f"text {i}") for i in range(10)]
+
+    assert reader.get_many(keys[:1]) == [None]
+    writer.put_many(keys, [_vec(i) for i in range(10)])
+
+    found = reader.get_many(keys)
+    assert [v.tolist() for v in found] == [_vec(i) for i in range(10)]
+    assert reader.stats()["entries"] == 10
+
+
+def test_writer_waits_for_readers(open_cache):
+    reader, writer = open_cache(), open_cache()
+    done = threading.Event()
+    thread = threading.Thread(target=lambda: (writer.put_many([text_key("x")], [_vec(1)]), done.set()))
+
+    with reader._file_lock(exclusive=False):
+        thread.start()
+        assert not done.wait(0.2)
+    thread.join(5)
+
+    assert done.is_set()
+    assert reader.get_many([text_key("x")])[0].tolist() == _vec(1)
+
+
+def test_full_bucket_evicts_its_least_recently_used_entry(open_cache):
+    cache = open_cache(capacity=8)  # a single bucket
+    keys = [text_key(f"text {i}") for i in range(9)]
+    cache.put_many(keys[:8], [_vec(i) for i in range(8)])
+    for key in [keys[0]] + keys[2:8]:
+        cache.get_many([key])
+
+    cache.put_many(keys[8:], [_vec(8)])
+
+    found = cache.get_many(keys)
+    assert [v is None for v in found] == [False, True] + [False] * 7
+    assert cache.stats()["evictions"] == 1
+
+
+def test_changed_capacity_starts_over(open_cache):
+    key = text_key("text")
+    open_cache(capacity=64).put_many([key], [_vec(1)])
+
+    resized = open_cache(capacity=128)
+
+    assert resized.get_many([key]) == [None]
+    assert np.count_nonzero(resized._ticks) == 0
@@ -0,0 +1,65 @@
+# tests/test_hybrid_search.py
+
+import uuid
+
+from app.repositories.chunk_repository import ChunkRepository
+from app.services.lexical_index import BM25Index
+from app.services.search_service import SearchService
+from app.utils.config import settings
+from app.utils.hashing import chunk_content_hash
+from app.vectorstore.mmap_repo import MmapVectorRepository
+from app.vectorstore.schemas import ChunkVectorMeta
+
+
+class ConstantEmbedder:
+    def embed_text(self, text):
+        return [1.0, 0.0, 0.0, 0.0]
+
+    def embed_texts(self, texts):
+        return [self.embed_text(t) for t in texts]
+
+
+def _store(db, document_id, chunk_id, text):
+    ChunkRepository(db).bulk_insert([{
+        "id": uuid.UUID(chunk_id),
+        "document_id": uuid.UUID(document_id),
+        "chunk_index": 0,
+        "start_offset": 0,
+        "end_offset": len(text),
+        "text": text,
+        "content_hash": chunk_content_hash(text),
+        "embedding_id": chunk_id,
+    }])
+    db.commit()
+
+
+def test_vector_is_the_default_mode():
+    assert type(settings).model_fields["SEARCH_MODE"].default == "vector"
+
+
+def test_lexical_only_hit_has_no_distance(tmp_path, db):
+    document_id = str(uuid.uuid4())
+    embedded, lexical_only = str(uuid.uuid4()), str(uuid.uuid4())
+    _store(db, document_id, embedded, "quarterly revenue summary")
+    _store(db, document_id, lexical_only, "invoice INV-20417 for consulting")
+
+    repo = MmapVectorRepository(persist_dir=str(tmp_path), collection_name="rag_chunks")
+    repo.upsert_chunks(
+        chunk_ids=[embedded],
+        embeddings=[[1.0, 0.0, 0.0, 0.0]],
+        documents=["quarterly revenue summary"],
+        metadatas=[ChunkVectorMeta(document_id=document_id, chunk_id=embedded, chunk_index=0)],
+    )
+    lexical_index = BM25Index()
+    lexical_index.add_chunks([
+        (embedded, document_id, "quarterly revenue summary"),
+        (lexical_only, document_id, "invoice INV-20417 for consulting"),
+    ])
+    service = SearchService(embedding_service=ConstantEmbedder(), vector_repo=repo, lexical_index=lexical_index)
+
+    hits = {h.chunk_id: h for h in service.search(query="INV-20417", top_k=5, document_id=document_id, mode="hybrid")}
+
+    assert hits[lexical_only].text == "invoice INV-20417 for consulting"
+    assert hits[lexical_only].distance is None
+    assert hits[lexical_only].score > 0
+    assert hits[embedded].distance is not None
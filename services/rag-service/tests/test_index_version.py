@@ -0,0 +1,87 @@
+# tests/test_index_version.py
+
+import uuid
+
+from app.db.models.chunk import Chunk
+from app.repositories.chunk_repository import ChunkRepository
+from app.vectorstore.index_version import IndexVersions
+
+
+def test_first_ingestion_after_empty_baseline_bumps_versions():
+    versions = IndexVersions()
+    versions.observe({})
+    before_global, before_doc = versions.get(), versions.get("d1")
+
+    assert versions.observe({"d1": (3, "t")}) == 1
+    assert versions.get() > before_global
+    assert versions.get("d1") > before_doc
+
+
+def test_first_observe_invalidates_results_cached_before_it():
+    versions = IndexVersions()
+    cached_at = (versions.get(), versions.get("d1"))
+
+    versions.observe({"d1": (3, "t")})
+
+    assert (versions.get(), versions.get("d1")) != cached_at
+
+
+def test_unchanged_signatures_keep_versions():
+    versions = IndexVersions()
+    versions.observe({"d1": (3, "t")})
+    current = (versions.get(), versions.get("d1"))
+
+    assert versions.observe({"d1": (3, "t")}) == 0
+    assert (versions.get(), versions.get("d1")) == current
+
+
+def _chunks(document_id, n):
+    rows = []
+    for i in range(n):
+        chunk_id = uuid.uuid4()
+        rows.append({
+            "id": chunk_id,
+            "document_id": document_id,
+            "chunk_index": i,
+            "start_offset": i * 10,
+            "end_offset": i * 10 + 10,
+            "text": f"chunk {i}",
+            "content_hash": f"h{i}",
+            "embedding_id": str(chunk_id),
+        })
+    return rows
+
+
+def test_signature_changes_on_in_place_rewrite(db):
+    document_id = uuid.uuid4()
+    repo = ChunkRepository(db)
+    rows = _chunks(document_id, 3)
+    repo.bulk_insert(rows)
+    db.commit()
+    before = repo.document_signatures()[document_id]
+
+    # Same chunk count, only the offsets move (as in a re-index that shifts text).
+    repo.bulk_update_positions([{"id": rows[1]["id"], "start_offset": 12, "end_offset": 22}])
+    db.commit()
+    after = repo.document_signatures()[document_id]
+
+    assert before[0] == after[0] == 3
+    assert before != after
+
+
+def test_signature_changes_on_reembed_without_position_change(db):
+    document_id = uuid.uuid4()
+    repo = ChunkRepository(db)
+    rows = _chunks(document_id, 2)
+    repo.bulk_insert(rows)
+    db.commit()
+    # SQLite timestamps have one-second resolution: clear the insert stamp so the rewrite shows.
+    db.execute(Chunk.__table__.update().values(updated_at=None).where(Chunk.document_id == document_id))
+    db.commit()
+    before = repo.document_signatures()[document_id]
+
+    # A re-embedded chunk is rewritten with its unchanged position.
+    repo.bulk_update_positions([{"id": rows[0]["id"], "start_offset": 0, "end_offset": 10}])
+    db.commit()
+
+    assert repo.document_signatures()[document_id] != before
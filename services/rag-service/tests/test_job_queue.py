@@ -0,0 +1,141 @@
+# tests/test_job_queue.py
+
+import threading
+import uuid
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from app.constants.status import JobStatus
+from app.db.session import QueueSessionLocal
+from app.repositories.ingestion_job_repository import IngestionJobRepository
+from app.services.job_queue_service import (
+    claim_job,
+    complete_job,
+    enqueue_document,
+    enqueue_documents,
+    extend_job_lease,
+    fail_job,
+)
+from app.utils.config import settings
+from app.workers import ingestion_worker
+
+
+@pytest.fixture
+def stage():
+    # Each test gets its own stage, so jobs left by other tests are never claimed.
+    return f"test-{uuid.uuid4().hex[:12]}"
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(settings, "JOB_RETRY_BACKOFF_SECONDS", 0.0)
+    monkeypatch.setattr(settings, "JOB_VISIBILITY_TIMEOUT_SECONDS", 600)
+
+
+def _job(job_id):
+    db = QueueSessionLocal()
+    try:
+        job = IngestionJobRepository(db).get_by_id(job_id)
+        return job.status, job.attempts, job.locked_by
+    finally:
+        db.close()
+
+
+def test_enqueued_job_is_claimed_once(stage):
+    document_id = uuid.uuid4()
+    enqueued = enqueue_document(document_id, lang="fr", stage=stage)
+
+    job = claim_job(stage, "worker-a")
+
+    assert str(job.id) == enqueued["job_id"]
+    assert (job.document_id, job.attempts, job.payload) == (document_id, 1, {"lang": "fr"})
+    assert _job(job.id) == (JobStatus.RUNNING, 1, "worker-a")
+    assert claim_job(stage, "worker-b") is None
+
+
+def test_jobs_are_claimed_oldest_first(stage):
+    document_ids = [uuid.uuid4() for _ in range(3)]
+    enqueue_documents(document_ids, stage=stage)
+
+    claimed = [claim_job(stage, "worker-a") for _ in range(3)]
+
+    assert sorted(j.document_id for j in claimed) == sorted(document_ids)
+    assert claim_job(stage, "worker-a") is None
+
+
+def test_complete_requires_the_lease(stage):
+    enqueue_document(uuid.uuid4(), stage=stage)
+    job = claim_job(stage, "worker-a")
+
+    assert complete_job(job.id, "worker-b") is False
+    assert complete_job(job.id, "worker-a") is True
+    assert _job(job.id)[0] == JobStatus.SUCCEEDED
+    assert claim_job(stage, "worker-a") is None
+
+
+def test_failed_attempt_is_retried_until_exhausted(stage, monkeypatch):
+    monkeypatch.setattr(settings, "JOB_MAX_ATTEMPTS", 2)
+    enqueue_document(uuid.uuid4(), stage=stage)
+
+    first = claim_job(stage, "worker-a")
+    assert fail_job(first, "worker-a", "boom") is False
+    assert _job(first.id)[:2] == (JobStatus.PENDING, 1)
+
+    second = claim_job(stage, "worker-b")
+    assert (second.id, second.attempts) == (first.id, 2)
+    assert fail_job(second, "worker-b", "boom again") is True
+    assert _job(first.id)[:2] == (JobStatus.FAILED, 2)
+    assert claim_job(stage, "worker-a") is None
+
+
+def test_expired_lease_is_claimed_by_another_worker(stage, monkeypatch):
+    enqueue_document(uuid.uuid4(), stage=stage)
+    monkeypatch.setattr(settings, "JOB_VISIBILITY_TIMEOUT_SECONDS", -1)
+    stale = claim_job(stage, "worker-a")
+
+    taken = claim_job(stage, "worker-b")
+
+    assert (taken.id, taken.attempts) == (stale.id, 2)
+    # The first worker lost its lease: it can neither renew nor complete the job.
+    assert extend_job_lease(stale.id, "worker-a") is False
+    assert complete_job(stale.id, "worker-a") is False
+    assert _job(stale.id) == (JobStatus.RUNNING, 2, "worker-b")
+
+
+def test_expired_lease_on_last_attempt_fails_the_job(stage, monkeypatch):
+    monkeypatch.setattr(settings, "JOB_MAX_ATTEMPTS", 1)
+    monkeypatch.setattr(settings, "JOB_VISIBILITY_TIMEOUT_SECONDS", -1)
+    enqueue_document(uuid.uuid4(), stage=stage)
+    job = claim_job(stage, "worker-a")
+
+    assert claim_job(stage, "worker-b") is None
+    assert _job(job.id)[:2] == (JobStatus.FAILED, 1)
+
+
+def test_slot_keeps_running_after_a_queue_error(stage, monkeypatch):
+    # complete_job hits a dropped connection once; the slot must log it and keep claiming.
+    monkeypatch.setattr(settings, "JOB_POLL_INTERVAL_SECONDS", 0.01)
+    monkeypatch.setitem(ingestion_worker.STAGE_HANDLERS, stage, lambda job: None)
+    enqueue_documents([uuid.uuid4(), uuid.uuid4()], stage=stage)
+    completed = []
+    done = threading.Event()
+
+    def flaky_complete(job_id, worker_id):
+        if not completed:
+            completed.append(None)
+            raise OperationalError("UPDATE", {}, Exception("connection dropped"))
+        completed.append(job_id)
+        done.set()
+        return complete_job(job_id, worker_id)
+
+    monkeypatch.setattr(ingestion_worker, "complete_job", flaky_complete)
+    worker = ingestion_worker.IngestionWorker(stage_concurrency={stage: 1}, worker_id="worker-a")
+    worker.start()
+    try:
+        assert done.wait(10)
+    finally:
+        worker.stop()
+        worker.join()
+
+    assert _job(completed[1]) == (JobStatus.SUCCEEDED, 1, "worker-a")
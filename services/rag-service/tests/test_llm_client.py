@@ -0,0 +1,254 @@
+# tests/test_llm_client.py
+
+import asyncio
+import time
+
+import pytest
+
+from app.services.llm_client import CircuitBreaker, CircuitOpenError, LLMClient, LLMTimeoutError
+from app.services.llm_service import FakeBackendError, FakeLLMService
+
+CHUNKS = ["context piece"]
+
+
+class ScriptedLLM(FakeLLMService):
+    """
+    FakeLLMService whose next calls follow a script (an exception is raised, a float is
+    slept) before it falls back to the fake's own latency and failure injection.
+    Tracks how many calls run at once.
+    """
+
+    def __init__(self, script=(), **kwargs):
+        super().__init__(**kwargs)
+        self.script = list(script)
+        self.active = 0
+        self.peak = 0
+
+    def _step(self):
+        return self.script.pop(0) if self.script else None
+
+    async def generate_answer(self, query, chunks, timeout=None):
+        self.calls += 1
+        step = self._step()
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            if isinstance(step, BaseException):
+                raise step
+            delay = step if step is not None else self._delay()
+            if delay:
+                await asyncio.sleep(delay)
+            if step is None:
+                self._maybe_fail()
+            return self._fake_text(query, chunks)
+        finally:
+            self.active -= 1
+
+    async def stream_answer(self, query, chunks, timeout=None):
+        self.calls += 1
+        step = self._step()
+        if isinstance(step, BaseException):
+            raise step
+        for word in self._fake_text(query, chunks).split(" "):
+            yield word
+
+
+def _client(backend, **kwargs):
+    kwargs.setdefault("retry_base_seconds", 0.0)
+    return LLMClient(backend, **kwargs)
+
+
+def _ask(client, query="q"):
+    return asyncio.run(client.generate_answer(query, CHUNKS))
+
+
+def _stream(client, query="q"):
+    async def collect():
+        pieces = []
+        try:
+            async for piece in client.stream_answer(query, CHUNKS):
+                pieces.append(piece)
+        except Exception as e:
+            return pieces, e
+        return pieces, None
+    return asyncio.run(collect())
+
+
+def test_transient_errors_are_retried():
+    backend = ScriptedLLM([FakeBackendError("503"), FakeBackendError("503")])
+    client = _client(backend, max_retries=2)
+
+    assert _ask(client) == backend._fake_text("q", CHUNKS)
+    assert backend.calls == 3
+    assert client.retries == 2
+
+
+def test_gives_up_after_max_retries():
+    backend = ScriptedLLM([FakeBackendError("503")] * 3)
+    client = _client(backend, max_retries=1)
+
+    with pytest.raises(FakeBackendError):
+        _ask(client)
+    assert backend.calls == 2
+
+
+def test_permanent_errors_are_not_retried_and_do_not_trip_the_breaker():
+    backend = ScriptedLLM([ValueError("bad request")] * 3)
+    client = _client(backend, max_retries=3, breaker=CircuitBreaker(failure_threshold=1))
+
+    with pytest.raises(ValueError):
+        _ask(client)
+    assert backend.calls == 1
+    assert client.breaker.state == "closed"
+
+
+def test_slow_call_times_out():
+    client = _client(ScriptedLLM([1.0]), timeout_seconds=0.05, max_retries=0)
+
+    with pytest.raises(LLMTimeoutError):
+        _ask(client)
+    assert client.timeouts == 1
+
+
+def test_deadline_bounds_all_retries():
+    backend = ScriptedLLM([1.0] * 20)
+    client = _client(backend, timeout_seconds=0.05, deadline_seconds=0.2, max_retries=20)
+
+    started = time.monotonic()
+    with pytest.raises(LLMTimeoutError):
+        _ask(client)
+    assert time.monotonic() - started < 0.5
+    assert backend.calls < 20
+
+
+def test_breaker_opens_and_fails_fast():
+    backend = ScriptedLLM(failure_rate=1.0)
+    client = _client(backend, max_retries=0, breaker=CircuitBreaker(failure_threshold=2, reset_seconds=60))
+
+    for _ in range(2):
+        with pytest.raises(FakeBackendError):
+            _ask(client)
+    with pytest.raises(CircuitOpenError):
+        _ask(client)
+    assert backend.calls == 2
+    assert client.rejected == 1
+    assert client.breaker.state == "open"
+
+
+def test_half_open_breaker_lets_one_trial_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0.0)
+    breaker.record_failure()
+
+    assert breaker.state == "half_open"
+    assert breaker.allow() is True
+    assert breaker.allow() is False
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_failed_trial_reopens_the_breaker():
+    backend = ScriptedLLM([FakeBackendError("503"), FakeBackendError("503")])
+    client = _client(backend, max_retries=0, breaker=CircuitBreaker(failure_threshold=1, reset_seconds=0.05))
+
+    with pytest.raises(FakeBackendError):
+        _ask(client)
+    time.sleep(0.06)
+    with pytest.raises(FakeBackendError):
+        _ask(client)
+    assert client.breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        _ask(client)
+
+    time.sleep(0.06)
+    _ask(client)
+    assert client.breaker.state == "closed"
+
+
+def test_hedge_answers_a_slow_call():
+    backend = ScriptedLLM(delay_seconds=0.01)
+    client = _client(backend, hedge=True, hedge_min_samples=5, hedge_quantile=0.5)
+
+    async def run():
+        for _ in range(5):
+            await client.generate_answer("q", CHUNKS)
+        backend.script = [2.0]
+        started = time.monotonic()
+        await client.generate_answer("q", CHUNKS)
+        return time.monotonic() - started
+
+    assert asyncio.run(run()) < 1.0
+    assert (client.hedges, client.hedge_wins) == (1, 1)
+
+
+def test_concurrency_is_capped():
+    backend = ScriptedLLM(delay_seconds=0.01)
+    client = _client(backend, max_concurrency=3)
+
+    async def run():
+        return await asyncio.gather(*(client.generate_answer(f"q{i}", CHUNKS) for i in range(20)))
+
+    assert len(asyncio.run(run())) == 20
+    assert backend.peak == 3
+    assert client.in_flight == 0
+
+
+def test_stream_is_retried_before_its_first_piece():
+    backend = ScriptedLLM([FakeBackendError("503")])
+    client = _client(backend, max_retries=1)
+
+    pieces, error = _stream(client)
+
+    assert error is None
+    assert "".join(pieces) == "".join(backend._fake_text("q", CHUNKS).split(" "))
+    assert backend.calls == 2
+
+
+def test_stream_is_not_retried_after_its_first_piece():
+    class BreaksMidStream(ScriptedLLM):
+        async def stream_answer(self, query, chunks, timeout=None):
+            self.calls += 1
+            yield "partial"
+            raise FakeBackendError("connection reset")
+
+    backend = BreaksMidStream()
+    client = _client(backend, max_retries=3)
+
+    pieces, error = _stream(client)
+
+    assert pieces == ["partial"]
+    assert isinstance(error, FakeBackendError)
+    assert backend.calls == 1
+
+
+def test_client_under_load_with_fake_backend():
+    # 20% failures and a 5% latency tail 20x the median, 200 concurrent callers
+    backend = ScriptedLLM(delay_seconds=0.005, failure_rate=0.2, slow_rate=0.05, slow_factor=20, seed=7)
+    client = LLMClient(
+        backend,
+        max_concurrency=8,
+        timeout_seconds=0.05,
+        deadline_seconds=5.0,
+        max_retries=4,
+        retry_base_seconds=0.002,
+        retry_max_seconds=0.02,
+        hedge=True,
+        hedge_quantile=0.9,
+        hedge_min_samples=20,
+        breaker=CircuitBreaker(failure_threshold=50, reset_seconds=1.0),
+    )
+
+    async def run():
+        return await asyncio.gather(
+            *(client.generate_answer(f"q{i}", CHUNKS) for i in range(200)),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(run())
+
+    errors = [r for r in results if isinstance(r, BaseException)]
+    assert all(isinstance(e, (FakeBackendError, LLMTimeoutError)) for e in errors)
+    assert len(errors) <= 4
+    assert backend.peak <= 8
+    assert client.in_flight == 0
+    assert client.retries > 0
+    assert client.breaker.state == "closed"
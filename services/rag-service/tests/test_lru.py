@@ -0,0 +1,33 @@
+# tests/test_lru.py
+
+from app.utils.lru import LRUCache
+
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_stats_count_hits_and_misses():
+    cache = LRUCache(4)
+    cache.put("a", 1)
+    cache.get("a")
+    cache.get("x")
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+
+def test_zero_capacity_stores_nothing():
+    cache = LRUCache(0)
+    cache.put("a", 1)
+
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,185 @@
+# tests/test_mmap_repo.py
+
+import json
+import os
+
+import numpy as np
+import pytest
+
+from app.vectorstore.mmap_repo import MANIFEST, MmapVectorRepository
+from app.vectorstore.schemas import ChunkVectorMeta
+
+DIM = 16
+
+
+def _repo(tmp_path, **kwargs):
+    return MmapVectorRepository(persist_dir=str(tmp_path), collection_name="test", **kwargs)
+
+
+def _upsert(repo, doc_id, vectors, user_id=None, prefix=None):
+    ids = [f"{prefix or doc_id}-c{i}" for i in range(len(vectors))]
+    repo.upsert_chunks(
+        chunk_ids=ids,
+        embeddings=vectors.tolist(),
+        documents=[f"text {cid}" for cid in ids],
+        metadatas=[
+            ChunkVectorMeta(document_id=doc_id, user_id=user_id, chunk_id=cid, chunk_index=i)
+            for i, cid in enumerate(ids)
+        ],
+    )
+    return ids
+
+
+def _corpus(repo, documents=4, chunks=25, seed=0):
+    rng = np.random.default_rng(seed)
+    ids, vectors = [], []
+    for d in range(documents):
+        block = rng.normal(size=(chunks, DIM)).astype(np.float32)
+        ids += _upsert(repo, f"d{d}", block)
+        vectors.append(block)
+    return ids, np.concatenate(vectors)
+
+
+def _brute_force(ids, vectors, query, top_k):
+    normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = normed @ (query / np.linalg.norm(query))
+    return [ids[i] for i in np.argsort(-scores)[:top_k]]
+
+
+def _query_ids(repo, query, top_k=5, **kwargs):
+    return [h.id for h in repo.query(query_embedding=query.tolist(), top_k=top_k, **kwargs)]
+
+
+def _data_files(tmp_path):
+    return sorted(f for f in os.listdir(tmp_path / "test") if f.startswith("vectors."))
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float16", "int8"])
+def test_query_matches_brute_force(tmp_path, dtype):
+    repo = _repo(tmp_path, dtype=dtype)
+    ids, vectors = _corpus(repo)
+    queries = np.random.default_rng(1).normal(size=(5, DIM)).astype(np.float32)
+
+    assert repo.count() == len(ids)
+    for q in queries:
+        assert _query_ids(repo, q) == _brute_force(ids, vectors, q, 5)
+        assert _query_ids(repo, q, document_id="d2") == _brute_force(ids[50:75], vectors[50:75], q, 5)
+
+
+def test_hits_carry_documents_and_metadata(tmp_path):
+    repo = _repo(tmp_path)
+    ids, vectors = _corpus(repo, documents=1, chunks=3)
+
+    hit = repo.query(query_embedding=vectors[1].tolist(), top_k=1)[0]
+
+    assert hit.id == ids[1]
+    assert hit.document == f"text {ids[1]}"
+    assert hit.metadata["document_id"] == "d0"
+    assert hit.metadata["chunk_index"] == 1
+    assert hit.distance == pytest.approx(0.0, abs=1e-5)
+
+
+def test_upsert_replaces_existing_chunks(tmp_path):
+    repo = _repo(tmp_path)
+    rng = np.random.default_rng(0)
+    _upsert(repo, "d0", rng.normal(size=(3, DIM)).astype(np.float32))
+    replacement = rng.normal(size=(3, DIM)).astype(np.float32)
+
+    ids = _upsert(repo, "d0", replacement)
+
+    assert repo.count() == 3
+    for cid, vec in zip(ids, replacement):
+        assert _query_ids(repo, vec, top_k=1) == [cid]
+
+
+def test_upsert_rejects_other_dimensions(tmp_path):
+    repo = _repo(tmp_path)
+    _upsert(repo, "d0", np.ones((1, DIM), dtype=np.float32))
+
+    with pytest.raises(ValueError):
+        _upsert(repo, "d1", np.ones((1, DIM + 1), dtype=np.float32))
+
+
+def test_delete_by_ids(tmp_path):
+    repo = _repo(tmp_path)
+    ids, vectors = _corpus(repo, documents=2, chunks=5)
+
+    repo.delete_by_ids(ids[:2])
+
+    assert repo.count() == len(ids) - 2
+    assert repo.existing_ids(ids[:4]) == set(ids[2:4])
+    assert ids[0] not in _query_ids(repo, vectors[0], top_k=len(ids))
+
+
+def test_delete_by_document(tmp_path):
+    repo = _repo(tmp_path)
+    ids, vectors = _corpus(repo, documents=2, chunks=5)
+
+    repo.delete_by_document("d0")
+
+    assert repo.count() == 5
+    assert _query_ids(repo, vectors[0], document_id="d0") == []
+    assert set(_query_ids(repo, vectors[0], top_k=10)) == set(ids[5:])
+
+
+def test_user_filter(tmp_path):
+    repo = _repo(tmp_path)
+    rng = np.random.default_rng(0)
+    a_ids = _upsert(repo, "da", rng.normal(size=(3, DIM)).astype(np.float32), user_id="a")
+    _upsert(repo, "db", rng.normal(size=(3, DIM)).astype(np.float32), user_id="b")
+    q = rng.normal(size=DIM).astype(np.float32)
+
+    assert set(_query_ids(repo, q, top_k=10, user_id="a")) == set(a_ids)
+    assert _query_ids(repo, q, document_id="db", user_id="a") == []
+    assert repo.get_hits(chunk_ids=["db-c0"], query_embedding=q.tolist(), user_id="a") == []
+
+
+def test_compaction_reclaims_rewritten_rows(tmp_path):
+    repo = _repo(tmp_path, compact_min_rows=10)
+    rng = np.random.default_rng(0)
+    for _ in range(5):
+        vectors = rng.normal(size=(8, DIM)).astype(np.float32)
+        ids = _upsert(repo, "d0", vectors)
+
+    with open(tmp_path / "test" / MANIFEST, encoding="utf-8") as f:
+        manifest = json.load(f)
+    assert manifest["generation"] > 0
+    assert manifest["rows"] <= 8 + max(8, 10)
+    assert _data_files(tmp_path) == [manifest["data_file"]]
+    assert _query_ids(repo, vectors[3], top_k=1) == [ids[3]]
+
+
+@pytest.mark.parametrize("dtype", ["float32", "int8"])
+def test_recalibrate_forces_compaction(tmp_path, dtype):
+    repo = _repo(tmp_path, dtype=dtype)
+    ids, vectors = _corpus(repo)
+    repo.delete_by_document("d0")
+    q = vectors[30]
+
+    repo.recalibrate()
+
+    assert _data_files(tmp_path) == ["vectors.1.bin"]
+    assert repo.count() == len(ids) - 25
+    assert _query_ids(repo, q) == _brute_force(ids[25:], vectors[25:], q, 5)
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float16", "int8"])
+def test_reopen_sees_persisted_data(tmp_path, dtype):
+    repo = _repo(tmp_path, dtype=dtype)
+    ids, vectors = _corpus(repo)
+    repo.delete_by_ids(ids[:3])
+    q = vectors[10]
+
+    reopened = _repo(tmp_path, dtype=dtype)
+
+    assert reopened.count() == repo.count()
+    assert _query_ids(reopened, q) == _query_ids(repo, q)
+
+
+def test_other_instance_writes_are_visible(tmp_path):
+    reader = _repo(tmp_path)
+    writer = _repo(tmp_path)
+    ids = _upsert(writer, "d0", np.eye(DIM, dtype=np.float32)[:3])
+
+    assert reader.count() == 3
+    assert _query_ids(reader, np.eye(DIM, dtype=np.float32)[2], top_k=1) == [ids[2]]
@@ -0,0 +1,28 @@
+# tests/test_model_registry.py
+
+import asyncio
+
+from app.services.model_registry import ModelRegistry
+
+
+def test_close_does_not_start_a_batcher():
+    registry = ModelRegistry()
+
+    asyncio.run(registry.close())
+
+    assert registry._embedding_batcher is None
+
+
+def test_close_stops_the_running_batcher():
+    closed = []
+
+    class Batcher:
+        async def close(self):
+            closed.append(True)
+
+    registry = ModelRegistry()
+    registry._embedding_batcher = Batcher()
+
+    asyncio.run(registry.close())
+
+    assert closed == [True] and registry._embedding_batcher is None
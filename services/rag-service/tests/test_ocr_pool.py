@@ -0,0 +1,51 @@
+# tests/test_ocr_pool.py
+
+from concurrent.futures import Future
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import ocr
+from app.constants.status import OCRStatus
+from app.services.ocr_pool import OCRJob, get_api_ocr_pool
+from app.utils.config import settings
+
+
+def _done(pages):
+    f = Future()
+    f.set_result(pages)
+    return f
+
+
+def test_finished_job_returns_pages_in_order():
+    job = OCRJob("doc.pdf", "en", [
+        _done([(1, [{"text": "one"}])]),
+        _done([(2, [{"text": "two"}])]),
+    ])
+
+    data = job.to_dict(include_result=True)
+
+    assert data["status"] == OCRStatus.SUCCESS
+    assert [line["text"] for line in data["result"]] == ["one", "two"]
+
+
+def test_cancelled_shard_fails_the_job():
+    cancelled = Future()
+    cancelled.cancel()
+    job = OCRJob("doc.pdf", "en", [_done([(1, [{"text": "one"}])]), cancelled])
+
+    data = job.to_dict(include_result=True)
+
+    assert data["status"] == OCRStatus.FAILED
+    assert "cancelled" in data["error_message"]
+    assert data["shards_done"] == 1
+    assert "result" not in data
+
+
+def test_api_pool_is_off_by_default(monkeypatch):
+    monkeypatch.setattr(settings, "OCR_API_POOL_WORKERS", type(settings).model_fields["OCR_API_POOL_WORKERS"].default)
+    app = FastAPI()
+    app.include_router(ocr.router)
+
+    assert get_api_ocr_pool() is None
+    assert TestClient(app).post("/ocr", json={"file_key": "x.pdf"}).status_code == 503
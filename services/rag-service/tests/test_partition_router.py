@@ -0,0 +1,72 @@
+# tests/test_partition_router.py
+
+import numpy as np
+import pytest
+
+from app.vectorstore.mmap_repo import MmapVectorRepository
+from app.vectorstore.partition_router import PartitionedVectorRepository
+from app.vectorstore.schemas import ChunkVectorMeta
+
+DIM = 8
+
+
+@pytest.fixture
+def router(tmp_path):
+    repos = {}
+
+    def repo_for(collection_name):
+        if collection_name not in repos:
+            repos[collection_name] = MmapVectorRepository(persist_dir=str(tmp_path), collection_name=collection_name)
+        return repos[collection_name]
+
+    return PartitionedVectorRepository(repo_for=repo_for, persist_dir=str(tmp_path), base_collection="rag_chunks")
+
+
+def _upsert(repo, doc_id, user_id, text, vector):
+    cid = f"{doc_id}-c0"
+    repo.upsert_chunks(
+        chunk_ids=[cid],
+        embeddings=[vector],
+        documents=[text],
+        metadatas=[ChunkVectorMeta(document_id=doc_id, user_id=user_id, chunk_id=cid, chunk_index=0)],
+    )
+    return cid
+
+
+def _documents(repo, **kwargs):
+    return [h.document for h in repo.query(query_embedding=[1.0] * DIM, top_k=5, **kwargs)]
+
+
+@pytest.mark.parametrize("large", [False, True])
+def test_cross_user_document_query_returns_nothing(router, large):
+    router.assign("doc-b", "user-b", large=large)
+    _upsert(router, "doc-b", "user-b", "secret of B", [1.0] * DIM)
+
+    assert _documents(router, document_id="doc-b", user_id="user-a") == []
+    assert _documents(router, document_id="doc-b", user_id="user-b") == ["secret of B"]
+
+
+def test_partition_query_filters_on_owner(router):
+    # A route written for one owner must not expose rows carrying another owner.
+    router.assign("doc-b", "user-a")
+    _upsert(router, "doc-b", "user-b", "secret of B", [1.0] * DIM)
+
+    assert _documents(router, document_id="doc-b", user_id="user-a") == []
+    assert _documents(router, user_id="user-a") == []
+
+
+def test_user_scope_spans_own_partitions_and_base(router):
+    _upsert(router, "doc-a", "user-a", "a routed", [1.0] * DIM)
+    _upsert(router, "doc-b", "user-b", "b routed", [1.0] * DIM)
+    # Indexed before partitioning: only the owner metadata scopes it
+    _upsert(router.repo_for("rag_chunks"), "doc-legacy", "user-a", "a legacy", [0.5] * DIM)
+
+    assert sorted(_documents(router, user_id="user-a")) == ["a legacy", "a routed"]
+    assert sorted(_documents(router)) == ["a legacy", "a routed", "b routed"]
+
+
+def test_get_hits_respects_owner(router):
+    cid = _upsert(router, "doc-b", "user-b", "secret of B", [1.0] * DIM)
+
+    assert router.get_hits(chunk_ids=[cid], query_embedding=[1.0] * DIM, user_id="user-a") == []
+    assert [h.id for h in router.get_hits(chunk_ids=[cid], query_embedding=[1.0] * DIM, user_id="user-b")] == [cid]
@@ -0,0 +1,57 @@
+# tests/test_schema_upgrade.py
+
+import uuid
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import Session
+
+from app.db.schema_upgrade import upgrade_schema
+from app.repositories.chunk_repository import ChunkRepository
+
+# chunks / documents as created from docs/db_schema.md before content hashing and updated_at
+OLD_SCHEMA = [
+    """CREATE TABLE documents (
+        id CHAR(32) PRIMARY KEY, user_id CHAR(32) NOT NULL, filename VARCHAR(255) NOT NULL,
+        file_path TEXT NOT NULL, status VARCHAR(50) NOT NULL, source VARCHAR(50) NOT NULL
+    )""",
+    """CREATE TABLE chunks (
+        id CHAR(32) PRIMARY KEY, document_id CHAR(32) NOT NULL, chunk_index INT NOT NULL,
+        start_offset INT, end_offset INT, token_count INT, text TEXT,
+        embedding_id VARCHAR(255) NOT NULL, created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )""",
+]
+
+
+def _columns(engine, table):
+    return {c["name"] for c in inspect(engine).get_columns(table)}
+
+
+def test_old_database_gets_the_new_columns(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/old.db")
+    document_id, chunk_id = uuid.uuid4().hex, uuid.uuid4().hex
+    with engine.begin() as conn:
+        for ddl in OLD_SCHEMA:
+            conn.execute(text(ddl))
+        conn.execute(
+            text("INSERT INTO chunks (id, document_id, chunk_index, start_offset, end_offset, text, embedding_id) "
+                 "VALUES (:id, :doc, 0, 0, 5, 'hello', :id)"),
+            {"id": chunk_id, "doc": document_id},
+        )
+
+    assert sorted(upgrade_schema(engine)) == ["chunks.content_hash", "chunks.updated_at", "documents.content_hash"]
+
+    assert {"content_hash", "updated_at"} <= _columns(engine, "chunks")
+    assert "content_hash" in _columns(engine, "documents")
+    assert {"ix_chunks_content_hash"} <= {i["name"] for i in inspect(engine).get_indexes("chunks")}
+    with Session(engine) as db:
+        signatures = ChunkRepository(db).document_signatures()
+    assert [count for count, *_ in signatures.values()] == [1]
+    # A second run (another process starting) has nothing left to do
+    assert upgrade_schema(engine) == []
+
+
+def test_missing_tables_are_left_alone(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/empty.db")
+
+    assert upgrade_schema(engine) == []
+    assert inspect(engine).get_table_names() == []
@@ -0,0 +1,77 @@
+# tests/test_search_batch.py
+
+import asyncio
+import threading
+from concurrent.futures import CancelledError
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import search
+from app.services.search_service import SearchService
+from app.utils.config import settings
+
+
+class DisconnectingRequest:
+    """Stands in for the starlette Request of a client that goes away once `gone` is set."""
+
+    def __init__(self, gone: threading.Event):
+        self.gone = gone
+
+    async def is_disconnected(self):
+        return self.gone.is_set()
+
+
+@pytest.fixture(autouse=True)
+def no_packing(monkeypatch):
+    monkeypatch.setattr(settings, "CONTEXT_PACKING_ENABLED", False)
+    monkeypatch.setattr(settings, "SEARCH_DISCONNECT_POLL_SECONDS", 0.01)
+
+
+def test_batch_runs_apart_from_the_interactive_executors(monkeypatch):
+    threads = []
+
+    def search_many(queries, **kwargs):
+        threads.append(threading.current_thread().name)
+        return [[] for _ in queries]
+
+    monkeypatch.setattr(search.search_service, "search_many", search_many)
+    app = FastAPI()
+    app.include_router(search.router)
+
+    response = TestClient(app).post("/search/batch", json={"queries": ["q1", "q2"]})
+
+    assert response.status_code == 200
+    assert len(threads) == 1 and threads[0].startswith("batch")
+
+
+def test_disconnect_cancels_a_running_batch(monkeypatch):
+    started = threading.Event()
+    stopped = threading.Event()
+
+    def search_many(queries, cancelled, **kwargs):
+        started.set()
+        if cancelled.wait(5):
+            stopped.set()
+        return [[] for _ in queries]
+
+    monkeypatch.setattr(search.search_service, "search_many", search_many)
+
+    response = asyncio.run(search.search_batch(search.BatchSearchRequest(queries=["q"]), DisconnectingRequest(started)))
+
+    assert response.status_code == 499
+    assert stopped.wait(5)
+
+
+def test_search_many_stops_once_cancelled():
+    class FailingEmbedder:
+        def embed_texts(self, texts):
+            raise AssertionError("a cancelled batch must not be embedded")
+
+    service = SearchService(embedding_service=FailingEmbedder(), vector_repo=None)
+    cancelled = threading.Event()
+    cancelled.set()
+
+    with pytest.raises(CancelledError):
+        service.search_many(queries=["q"], cancelled=cancelled)
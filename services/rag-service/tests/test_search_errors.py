@@ -0,0 +1,105 @@
+# tests/test_search_errors.py
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import search
+from app.services.answer_cache import AnswerCache, AnswerService
+from app.services.llm_client import CircuitOpenError, LLMTimeoutError
+from app.services.llm_service import EmptyResponseError, FakeBackendError, FakeLLMService
+from app.services.search_service import SearchHit
+from app.utils.config import settings
+
+HIT = SearchHit(
+    chunk_id="c0",
+    distance=0.1,
+    text="context piece",
+    document_id="d1",
+    chunk_index=0,
+    start_offset=None,
+    end_offset=None,
+    metadata={},
+)
+
+ERRORS = [
+    (CircuitOpenError("LLM circuit breaker is open"), 503),
+    (FakeBackendError("ServiceUnavailable"), 503),
+    (LLMTimeoutError("LLM call exceeded 1.0s"), 504),
+    (EmptyResponseError("blocked"), 502),
+    (RuntimeError("bug"), 500),
+]
+
+
+class FailingLLM(FakeLLMService):
+    def __init__(self, error):
+        super().__init__()
+        self.error = error
+
+    async def generate_answer(self, query, chunks, timeout=None):
+        self.calls += 1
+        raise self.error
+
+    async def stream_answer(self, query, chunks, timeout=None):
+        self.calls += 1
+        raise self.error
+        yield
+
+
+@pytest.fixture
+def fail_with(monkeypatch):
+    async def asearch(**kwargs):
+        return [HIT]
+
+    def install(error):
+        llm = FailingLLM(error)
+        monkeypatch.setattr(search.search_service, "asearch", asearch)
+        monkeypatch.setattr(search.search_service, "search_many", lambda queries, **kwargs: [[HIT] for _ in queries])
+        monkeypatch.setattr(search, "answer_service", AnswerService(llm, AnswerCache()))
+        return llm
+
+    monkeypatch.setattr(settings, "CONTEXT_PACKING_ENABLED", False)
+    return install
+
+
+def _client():
+    app = FastAPI()
+    app.include_router(search.router)
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("error, status", ERRORS)
+def test_search_maps_llm_errors_to_status(fail_with, error, status):
+    fail_with(error)
+
+    response = _client().post("/search", json={"query": "q"})
+
+    assert response.status_code == status
+
+
+@pytest.mark.parametrize("error, status", ERRORS)
+def test_batch_search_maps_llm_errors_to_status(fail_with, error, status):
+    fail_with(error)
+
+    response = _client().post("/search/batch", json={"queries": ["q1", "q2"], "generate_answers": True})
+
+    assert response.status_code == status
+
+
+def test_batch_search_without_answers_does_not_call_the_llm(fail_with):
+    llm = fail_with(CircuitOpenError("open"))
+
+    response = _client().post("/search/batch", json={"queries": ["q1"]})
+
+    assert response.status_code == 200
+    assert llm.calls == 0
+
+
+@pytest.mark.parametrize("error, status", ERRORS)
+def test_stream_error_event_carries_status(fail_with, error, status):
+    fail_with(error)
+
+    body = _client().post("/search/stream", json={"query": "q"}).text
+
+    assert body.strip().split("\n\n")[-1].startswith("event: error")
+    assert f'"status": {status}' in body
@@ -0,0 +1,75 @@
+# tests/test_search_scope.py
+
+import json
+import uuid
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import search
+from app.services.chunk_hydration import SqlHydrator
+from app.services.search_service import SearchService
+from app.utils.config import settings
+from app.vectorstore.mmap_repo import MmapVectorRepository
+from app.vectorstore.partition_router import PartitionedVectorRepository
+from app.vectorstore.schemas import ChunkVectorMeta
+
+USER_A = uuid.UUID("00000000-0000-0000-0000-00000000000a")
+USER_B = uuid.UUID("00000000-0000-0000-0000-00000000000b")
+DOC_A = str(uuid.uuid4())
+DOC_B = str(uuid.uuid4())
+
+
+class ConstantEmbedder:
+    def embed_text(self, text):
+        return [1.0, 0.0, 0.0, 0.0]
+
+    def embed_texts(self, texts):
+        return [self.embed_text(t) for t in texts]
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    def repo_for(collection_name):
+        return MmapVectorRepository(persist_dir=str(tmp_path), collection_name=collection_name)
+
+    router = PartitionedVectorRepository(repo_for=repo_for, persist_dir=str(tmp_path), base_collection="rag_chunks")
+    for doc_id, user_id, text in [(DOC_A, USER_A, "note of A"), (DOC_B, USER_B, "secret of B")]:
+        chunk_id = str(uuid.uuid4())
+        router.upsert_chunks(
+            chunk_ids=[chunk_id],
+            embeddings=[[1.0, 0.0, 0.0, 0.0]],
+            documents=[text],
+            metadatas=[ChunkVectorMeta(document_id=doc_id, user_id=str(user_id), chunk_id=chunk_id, chunk_index=0)],
+        )
+
+    service = SearchService(embedding_service=ConstantEmbedder(), vector_repo=router, hydrator=SqlHydrator())
+    monkeypatch.setattr(search, "search_service", service)
+    monkeypatch.setattr(search, "get_current_user", lambda: USER_A)
+    monkeypatch.setattr(settings, "CONTEXT_PACKING_ENABLED", False)
+    app = FastAPI()
+    app.include_router(search.router)
+    return TestClient(app)
+
+
+def _stream_hits(client, body):
+    text = client.post("/search/stream", json=body).text
+    first = text.split("\n\n")[0]
+    assert first.startswith("event: hits")
+    return [h["text"] for h in json.loads(first.split("data: ", 1)[1])]
+
+
+@pytest.mark.parametrize("body, expected", [
+    ({"query": "q", "mode": "vector"}, ["note of A"]),
+    # A user_id in the body is not a scope any more: it is ignored
+    ({"query": "q", "mode": "vector", "user_id": str(USER_B)}, ["note of A"]),
+    ({"query": "q", "mode": "vector", "document_id": DOC_B}, []),
+])
+def test_caller_cannot_read_other_users_chunks(client, body, expected):
+    assert _stream_hits(client, body) == expected
+
+    batch = client.post("/search/batch", json={**body, "queries": [body["query"]]})
+    assert batch.status_code == 200
+    assert "secret of B" not in batch.text
+
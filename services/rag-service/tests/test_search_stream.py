@@ -0,0 +1,166 @@
+# tests/test_search_stream.py
+
+import asyncio
+import json
+import threading
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import search
+from app.services.answer_cache import AnswerCache, AnswerService
+from app.services.llm_service import FakeLLMService
+from app.services.search_service import SearchHit
+from app.utils.cancellation import ClosingStreamingResponse
+from app.utils.config import settings
+
+HITS = [
+    SearchHit(
+        chunk_id=f"c{i}",
+        distance=0.1 * i,
+        text=f"context piece {i}",
+        document_id="d1",
+        chunk_index=i,
+        start_offset=None,
+        end_offset=None,
+        metadata={},
+    )
+    for i in range(2)
+]
+
+
+class TrackedFakeLLM(FakeLLMService):
+    """FakeLLMService that records whether each answer stream was closed."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.closed = 0
+
+    async def stream_answer(self, query, chunks, timeout=None):
+        try:
+            async for piece in super().stream_answer(query, chunks, timeout):
+                yield piece
+        finally:
+            self.closed += 1
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    async def asearch(**kwargs):
+        return list(HITS)
+
+    llm = TrackedFakeLLM()
+    monkeypatch.setattr(search.search_service, "asearch", asearch)
+    monkeypatch.setattr(search, "answer_service", AnswerService(llm, AnswerCache()))
+    monkeypatch.setattr(settings, "CONTEXT_PACKING_ENABLED", False)
+    return llm
+
+
+def _events(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def _client():
+    app = FastAPI()
+    app.include_router(search.router)
+    return TestClient(app)
+
+
+def test_stream_sends_hits_then_tokens_then_done(llm):
+    response = _client().post("/search/stream", json={"query": "what is it?"})
+
+    events = _events(response.text)
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert events[0][0] == "hits"
+    assert [h["chunk_id"] for h in events[0][1]] == ["c0", "c1"]
+    assert {name for name, _ in events[1:-1]} == {"token"}
+    assert "".join(data["text"] for _, data in events[1:-1]) == llm._fake_text("what is it?", ["a", "b"])
+    assert events[-1][0] == "done" and events[-1][1]["cached"] is False
+
+
+def test_repeated_stream_is_served_from_answer_cache(llm):
+    client = _client()
+    first = _events(client.post("/search/stream", json={"query": "what is it?"}).text)
+    second = _events(client.post("/search/stream", json={"query": "what is it?"}).text)
+
+    assert second[-1][1]["cached"] is True
+    assert [e for e in second if e[0] == "token"] == [("token", {"text": "".join(d["text"] for n, d in first if n == "token")})]
+    assert llm.calls == 1
+
+
+def test_failed_generation_sends_error_event_and_is_not_cached(llm):
+    llm.failure_rate = 1.0
+    client = _client()
+    events = _events(client.post("/search/stream", json={"query": "q"}).text)
+
+    assert events[-1][0] == "error" and events[-1][1]["status"] == 503
+    llm.failure_rate = 0.0
+    assert _events(client.post("/search/stream", json={"query": "q"}).text)[-1][1]["cached"] is False
+
+
+def test_closing_the_event_stream_closes_the_llm_stream(llm):
+    async def first_token():
+        events = search._search_events(search.SearchRequest(query="q"))
+        assert (await events.__anext__()).startswith("event: hits")
+        assert (await events.__anext__()).startswith("event: token")
+        await events.aclose()
+
+    asyncio.run(first_token())
+
+    assert llm.closed == 1
+    assert search.answer_service.lookup("q", ["c0", "c1"]) is None
+
+
+def test_disconnect_closes_the_body_generator():
+    closed = asyncio.Event()
+
+    async def body():
+        try:
+            while True:
+                yield "event: token\ndata: {}\n\n"
+        finally:
+            closed.set()
+
+    async def run():
+        sent = 0
+        blocked = asyncio.Event()
+
+        async def send(message):
+            nonlocal sent
+            sent += 1
+            if sent > 2:
+                blocked.set()
+                await asyncio.Event().wait()  # a client that stopped reading
+
+        task = asyncio.ensure_future(ClosingStreamingResponse(body()).stream_response(send))
+        await blocked.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return closed.is_set()
+
+    assert asyncio.run(run())
+
+
+def test_context_packing_runs_off_the_event_loop(llm, monkeypatch):
+    threads = []
+
+    class RecordingPacker:
+        def pack_texts(self, hits):
+            threads.append(threading.current_thread().name)
+            return [hit.text for hit in hits]
+
+    monkeypatch.setattr(settings, "CONTEXT_PACKING_ENABLED", True)
+    monkeypatch.setattr(search, "get_context_packer", RecordingPacker)
+    client = _client()
+
+    assert client.post("/search", json={"query": "q1"}).status_code == 200
+    assert _events(client.post("/search/stream", json={"query": "q2"}).text)[-1][0] == "done"
+
+    assert len(threads) == 2
+    assert all(name.startswith("context") for name in threads)
@@ -0,0 +1,226 @@
+# tests/test_upload.py
+
+import asyncio
+import hashlib
+import io
+import os
+import time
+import uuid
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI, HTTPException, UploadFile
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import OperationalError
+from starlette.datastructures import Headers
+
+from app.api import upload
+from app.constants.status import DocumentStatus
+from app.db.models.document import Document
+from app.db.session import get_db
+from app.repositories.document_repository import DocumentRepository
+from app.services import upload_service
+from app.utils.config import API_ROUTES, settings
+
+
+@pytest.fixture(autouse=True)
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload_service, "UPLOAD_DIR", tmp_path)
+    monkeypatch.setattr(upload_service, "INCOMING_DIR", tmp_path / ".incoming")
+    (tmp_path / ".incoming").mkdir()
+    # Several blocks per file, so the read / write overlap is exercised
+    monkeypatch.setattr(settings, "UPLOAD_CHUNK_BYTES", 7)
+    return tmp_path
+
+
+def _file(data: bytes, filename: str = "report.PDF", content_type: str = "application/pdf") -> UploadFile:
+    return UploadFile(file=io.BytesIO(data), filename=filename, headers=Headers({"content-type": content_type}))
+
+
+class BrokenUpload(UploadFile):
+    """Upload whose client goes away after the first block."""
+
+    def __init__(self):
+        super().__init__(file=io.BytesIO(b"x" * 100), filename="broken.txt")
+        self.reads = 0
+
+    async def read(self, size: int = -1) -> bytes:
+        self.reads += 1
+        if self.reads > 1:
+            raise ConnectionResetError("client disconnected")
+        return await super().read(size)
+
+
+def _stored_files(upload_dir):
+    return sorted(p.name for p in upload_dir.iterdir() if p.is_file() and not p.name.startswith("."))
+
+
+def _user_documents(db, user_id):
+    return db.query(Document.id).filter(Document.user_id == user_id).all()
+
+
+def test_upload_is_streamed_to_its_content_addressed_path(upload_dir):
+    data = b"%PDF-1.4 " + bytes(range(256)) * 3
+    digest = hashlib.sha256(data).hexdigest()
+
+    stored = asyncio.run(upload_service.store_upload(_file(data)))
+
+    assert stored.content_hash == digest
+    assert stored.file_size_bytes == len(data)
+    assert stored.file_path == str(upload_dir / f"{digest}.pdf")
+    assert (upload_dir / f"{digest}.pdf").read_bytes() == data
+    assert stored.created is True
+    assert list((upload_dir / ".incoming").iterdir()) == []
+
+
+def test_identical_content_is_stored_once(upload_dir):
+    first = asyncio.run(upload_service.store_upload(_file(b"same bytes", "a.pdf")))
+    second = asyncio.run(upload_service.store_upload(_file(b"same bytes", "b.pdf")))
+
+    assert first.file_path == second.file_path
+    assert (first.created, second.created) == (True, False)
+    assert _stored_files(upload_dir) == [f"{first.content_hash}.pdf"]
+    assert list((upload_dir / ".incoming").iterdir()) == []
+
+
+def test_batch_endpoint_stores_files_and_enqueues_jobs(upload_dir, db, monkeypatch):
+    enqueued = []
+
+    def enqueue_documents(document_ids, lang):
+        enqueued.extend(document_ids)
+        return [{"job_id": f"job-{i}"} for i in range(len(document_ids))]
+
+    monkeypatch.setattr(upload, "enqueue_documents", enqueue_documents)
+    app = FastAPI()
+    app.include_router(upload.router)
+    app.dependency_overrides[get_db] = lambda: db
+
+    response = TestClient(app).post(
+        API_ROUTES["UPLOAD_DOCUMENTS"],
+        files=[("files", ("a.txt", b"first file", "text/plain")), ("files", ("b.txt", b"second file", "text/plain"))],
+    )
+
+    assert response.status_code == 200
+    documents = response.json()["documents"]
+    assert [d["filename"] for d in documents] == ["a.txt", "b.txt"]
+    assert [d["job_id"] for d in documents] == ["job-0", "job-1"]
+    assert [d["file_key"] for d in documents] == [
+        f"{hashlib.sha256(b'first file').hexdigest()}.txt",
+        f"{hashlib.sha256(b'second file').hexdigest()}.txt",
+    ]
+    assert sorted(d["file_key"] for d in documents) == _stored_files(upload_dir)
+    assert [str(x) for x in enqueued] == [d["document_id"] for d in documents]
+    paths = dict(db.query(Document.id, Document.file_path).filter(Document.id.in_(enqueued)).all())
+    assert [paths[x] for x in enqueued] == [str(upload_dir / d["file_key"]) for d in documents]
+
+
+def test_failed_enqueue_marks_the_documents_failed(upload_dir, db, monkeypatch):
+    def enqueue_documents(document_ids, lang):
+        raise OperationalError("INSERT", {}, Exception("queue is down"))
+
+    monkeypatch.setattr(upload, "enqueue_documents", enqueue_documents)
+    app = FastAPI()
+    app.include_router(upload.router)
+    app.dependency_overrides[get_db] = lambda: db
+    user_id = uuid.uuid4()
+    monkeypatch.setattr(upload, "get_current_user", lambda: user_id)
+
+    response = TestClient(app).post(
+        API_ROUTES["UPLOAD_DOCUMENTS"],
+        files=[("files", ("a.txt", b"never queued", "text/plain"))],
+    )
+
+    assert response.status_code == 503
+    rows = db.query(Document.status, Document.error_message).filter(Document.user_id == user_id).all()
+    assert [status for status, _ in rows] == [DocumentStatus.FAILED]
+    assert "queue is down" in rows[0][1]
+
+
+def test_failed_batch_leaves_its_files_to_the_sweep(upload_dir, db):
+    user_id = uuid.uuid4()
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(upload_service.save_uploaded_files([_file(b"good file"), BrokenUpload()], db, user_id, "upload"))
+
+    assert error.value.status_code == 500
+    assert _user_documents(db, user_id) == []
+    assert list((upload_dir / ".incoming").iterdir()) == []
+    # Another upload may have deduplicated to the published file: it stays for the grace period.
+    assert _stored_files(upload_dir) == [f"{hashlib.sha256(b'good file').hexdigest()}.pdf"]
+    assert upload_service.sweep_orphaned_files() == 0
+    assert upload_service.sweep_orphaned_files(grace_seconds=0) == 1
+    assert _stored_files(upload_dir) == []
+
+
+def test_sweep_keeps_files_documents_use(upload_dir, db):
+    kept = asyncio.run(upload_service.save_uploaded_files([_file(b"shared content")], db, uuid.uuid4(), "upload"))[0]
+
+    with pytest.raises(HTTPException):
+        asyncio.run(upload_service.save_uploaded_files([_file(b"shared content"), _file(b"orphan"), BrokenUpload()], db, uuid.uuid4(), "upload"))
+
+    assert upload_service.sweep_orphaned_files(grace_seconds=0) == 1
+    assert _stored_files(upload_dir) == [kept["file_key"]]
+
+
+def test_deduplicating_to_a_file_restarts_its_grace_period(upload_dir):
+    stored = asyncio.run(upload_service.store_upload(_file(b"in flight")))
+    hour_ago = time.time() - 3600
+    os.utime(stored.file_path, (hour_ago, hour_ago))
+
+    # A second upload of the same content, whose document is not committed yet
+    asyncio.run(upload_service.store_upload(_file(b"in flight")))
+
+    assert upload_service.sweep_orphaned_files(grace_seconds=60) == 0
+    assert _stored_files(upload_dir) == [Path(stored.file_path).name]
+
+
+def test_sweep_ignores_files_that_are_not_content_addressed(upload_dir):
+    (upload_dir / "legacy-report.pdf").write_bytes(b"uploaded before content addressing")
+
+    assert upload_service.sweep_orphaned_files(grace_seconds=0) == 0
+    assert _stored_files(upload_dir) == ["legacy-report.pdf"]
+
+
+def test_cancelled_upload_leaves_no_partial_file(upload_dir):
+    class StalledUpload(UploadFile):
+        def __init__(self):
+            super().__init__(file=io.BytesIO(b"x" * 100), filename="stalled.txt")
+            self.reads = 0
+
+        async def read(self, size: int = -1) -> bytes:
+            self.reads += 1
+            if self.reads > 1:
+                await asyncio.Event().wait()  # a client that stopped sending
+            return await super().read(size)
+
+    upload = StalledUpload()
+
+    async def run():
+        task = asyncio.ensure_future(upload_service.store_upload(upload))
+        while upload.reads < 2:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+
+    assert list((upload_dir / ".incoming").iterdir()) == []
+    assert _stored_files(upload_dir) == []
+    assert upload.file.closed
+
+
+def test_failed_insert_leaves_no_documents(upload_dir, db, monkeypatch):
+    def create_documents(self, rows):
+        raise OperationalError("INSERT", {}, Exception("database is down"))
+
+    monkeypatch.setattr(DocumentRepository, "create_documents", create_documents)
+    user_id = uuid.uuid4()
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(upload_service.save_uploaded_files([_file(b"one"), _file(b"two")], db, user_id, "upload"))
+
+    assert error.value.detail.startswith("Database operation failed")
+    assert _user_documents(db, user_id) == []
+    assert upload_service.sweep_orphaned_files(grace_seconds=0) == 2
+    assert _stored_files(upload_dir) == []